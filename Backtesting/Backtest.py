@@ -0,0 +1,161 @@
+import logging
+
+import numpy as np
+
+
+def performance(daily_equity, initial_equity):
+    """
+    Args:
+        daily_equity (np.ndarray): portfolio value at the end of every day
+        initial_equity (float): portfolio value before the first day
+
+    Returns:
+        metrics (dict):
+            total_return_pct --> return over the whole backtest in percent
+            max_drawdown_pct --> largest peak to trough decline in percent (negative)
+            sharpe --> annualized sharpe ratio of the daily returns (risk free rate 0)
+            days --> number of days
+    """
+    equity = np.r_[initial_equity, daily_equity]
+    returns = equity[1:] / equity[:-1] - 1
+    peaks = np.maximum.accumulate(equity)
+    std = returns.std() if len(returns) > 1 else 0.0
+    return {'total_return_pct': (equity[-1] / equity[0] - 1) * 100,
+            'max_drawdown_pct': ((equity / peaks - 1).min()) * 100,
+            'sharpe': returns.mean() / std * np.sqrt(252) if std > 0 else 0.0,
+            'days': len(daily_equity)}
+
+
+class Backtest:
+    """
+    Event-driven backtest replaying a Panel through a Strategy
+
+    For every candle the SimulatedBroker of the strategy first fills pending orders and triggers bracket
+    exits, then Strategy.on_bar is called and the portfolio value is recorded.
+
+    Args:
+        strategy (Strategy): strategy constructed with a SimulatedBroker
+        panel (Panel): candles of all symbols used by the strategy
+    """
+
+    def __init__(self, strategy, panel):
+        self.strategy = strategy
+        self.panel = panel
+
+    def run(self):
+        """
+        Returns:
+            result (dict): performance metrics plus
+                equity --> portfolio value after every candle
+                daily_equity --> portfolio value at the end of every day
+                trades --> fills as (ts, symbol, qty, price, reason)
+        """
+        broker, panel = self.strategy.broker, self.panel
+        initial_equity = broker.get_account_portfolio_value()
+        equity = np.empty(len(panel))
+        for t in range(len(panel)):
+            broker.on_bar(panel, t)
+            self.strategy.on_bar(panel, t)
+            equity[t] = broker.get_account_portfolio_value()
+
+        daily_equity = equity[panel.last_of_day]
+        result = performance(daily_equity, initial_equity)
+        result.update({'equity': equity, 'daily_equity': daily_equity, 'trades': broker.trades})
+        return result
+
+
+def _day_matrix(values, day_index, slot, in_session, days, slots):
+    matrix = np.full((days, slots), np.nan)
+    matrix[day_index[in_session], slot[in_session]] = values[in_session]
+    return matrix
+
+
+def _last_valid(matrix):
+    valid = ~np.isnan(matrix)
+    last = matrix.shape[1] - 1 - np.argmax(valid[:, ::-1], axis=1)
+    return np.where(valid.any(axis=1), matrix[np.arange(len(matrix)), last], np.nan)
+
+
+def market_direction_vectorized(panel, signal_symbol, weights, trade_minute=11 * 60, threshold_pct=0.0,
+                                take_profit_pct=1.05, stop_loss_pct=0.95, risk_pct=1.0, cash=100000.0,
+                                session_start=9 * 60 + 30, session_end=16 * 60):
+    """
+    Vectorized fast path of the Market strategy (Strategies.Market.on_bar) over whole price arrays
+
+    Every day the change of signal_symbol at trade_minute vs. the previous close decides the side (buy if above
+    threshold_pct, sell otherwise). All symbols are entered at the open of the next candle, exited at take profit
+    or stop loss (stop loss first if both are hit within one candle) or at the last close of the day.
+    Unlike the event-driven Backtest, positions are sized as fractions of the equity (no whole shares).
+
+    Args:
+        panel (Panel):
+        signal_symbol (str): symbol deciding the side, e.g. 'SPY'
+        weights (dict): symbol --> fraction of risk_pct * equity to allocate
+        trade_minute (int): minute of the day (New York) at which the decision is made
+        threshold_pct (float): change in percent above which the market is considered positive
+        take_profit_pct (float): e.g. 1.05 --> 5%
+        stop_loss_pct (float): e.g. 0.95 --> 5%
+        risk_pct (float): fraction of the equity to allocate per day
+        cash (float): starting equity
+        session_start (int): minute of the day of the session start
+        session_end (int): minute of the day of the session end
+
+    Returns:
+        result (dict): performance metrics plus daily_equity and daily_returns
+
+    Raises:
+        Exception: if there is no candle ending at trade_minute or none after it within the session
+    """
+    frequency = panel.frequency
+    slots = (session_end - session_start) // frequency
+    slot = (panel.minute - session_start) // frequency
+    in_session = (panel.minute >= session_start) & (panel.minute < session_end)
+    days, day_index = np.unique(panel.day, return_inverse=True)
+    day_index = day_index.reshape(-1)
+
+    def matrix(field, symbol):
+        values = getattr(panel, field)[:, panel.index[symbol]]
+        return _day_matrix(values, day_index, slot, in_session, len(days), slots)
+
+    decision = (trade_minute - session_start) // frequency - 1  # slot of the candle ending at trade_minute
+    if not 0 <= decision < slots - 1:
+        # the decision needs a candle before and the entry a candle after trade_minute within the session
+        logging.critical("trade_minute " + str(trade_minute) + " for " + str(frequency) + "min candles of the "
+                         "session " + str(session_start) + " - " + str(session_end))
+        raise Exception('trade_minute outside of the session found')
+    signal_close = matrix('close', signal_symbol)
+    previous_close = np.r_[np.nan, _last_valid(signal_close)[:-1]]
+    change_pct = (signal_close[:, decision] / previous_close - 1) * 100
+    direction = np.where(np.isnan(change_pct), 0.0, np.where(change_pct > threshold_pct, 1.0, -1.0))
+
+    rows = np.arange(len(days))
+    after_entry = np.arange(slots) >= decision + 1
+    long = direction[:, None] > 0
+    daily_returns = np.zeros(len(days))
+    for symbol, weight in weights.items():
+        opens, highs, lows = matrix('open', symbol), matrix('high', symbol), matrix('low', symbol)
+        entry = opens[:, decision + 1]
+        take_profit = np.where(direction > 0, entry * take_profit_pct, entry * (2 - take_profit_pct))[:, None]
+        stop_loss = np.where(direction > 0, entry * stop_loss_pct, entry * (2 - stop_loss_pct))[:, None]
+
+        with np.errstate(invalid='ignore'):
+            stop_hit = np.where(long, lows <= stop_loss, highs >= stop_loss) & after_entry
+            take_profit_hit = np.where(long, highs >= take_profit, lows <= take_profit) & after_entry
+        hit = stop_hit | take_profit_hit
+        first = np.argmax(hit, axis=1)
+        first_open = opens[rows, first]
+        exit_stop = np.where(direction > 0, np.fmin(first_open, stop_loss[:, 0]),
+                             np.fmax(first_open, stop_loss[:, 0]))
+        exit_take_profit = np.where(direction > 0, np.fmax(first_open, take_profit[:, 0]),
+                                    np.fmin(first_open, take_profit[:, 0]))
+        exit_price = np.where(hit.any(axis=1),
+                              np.where(stop_hit[rows, first], exit_stop, exit_take_profit),
+                              _last_valid(matrix('close', symbol)))
+
+        returns = direction * (exit_price / entry - 1)
+        daily_returns += weight * risk_pct * np.where(np.isfinite(returns), returns, 0.0)
+
+    daily_equity = cash * np.cumprod(1 + daily_returns)
+    result = performance(daily_equity, cash)
+    result.update({'daily_equity': daily_equity, 'daily_returns': daily_returns})
+    return result
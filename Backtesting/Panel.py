@@ -0,0 +1,132 @@
+import json
+import os
+
+import numpy as np
+
+from Data_Providers.Candles import NEW_YORK, utc_offsets
+
+
+class Panel:
+    """
+    Candles of several symbols aligned on a common time axis
+
+        ts (T,): candle start as seconds since epoch
+        open, high, low, close, volume (T, N): float arrays, NaN where a symbol has no candle
+        day (T,): trading day of the candle as days since epoch (New York)
+        minute (T,): minute of the day of the candle start (New York), e.g. 570 for 09:30
+        day_start (T,): row of the first candle of the same day
+        last_of_day (T,): True for the last candle of a day
+        frequency: candle length in minutes
+
+    Args:
+        symbols (list): N symbols, columns of the price arrays
+        ts (np.ndarray): T timestamps, sorted
+        fields (dict): 'open', 'high', 'low', 'close', 'volume' --> (T, N) arrays
+        frequency (int): candle length in minutes, None to take the smallest distance between two candles
+        timezone (pytz.timezone): timezone of day and minute
+    """
+
+    FIELDS = ('open', 'high', 'low', 'close', 'volume')
+
+    def __init__(self, symbols, ts, fields, frequency=None, timezone=NEW_YORK):
+        self.symbols = list(symbols)
+        self.index = {symbol: j for j, symbol in enumerate(self.symbols)}
+        self.ts = np.asarray(ts, dtype='<i8')
+        if frequency is None:
+            steps = np.diff(self.ts)
+            frequency = int(steps[steps > 0].min() // 60) if np.any(steps > 0) else 1
+        self.frequency = frequency
+        for field in self.FIELDS:
+            setattr(self, field, fields[field])
+
+        local = self.ts + utc_offsets(self.ts, timezone)
+        self.day = local // 86400
+        self.minute = (local % 86400) // 60
+        new_day = np.r_[True, self.day[1:] != self.day[:-1]]
+        self.day_start = np.maximum.accumulate(np.where(new_day, np.arange(len(self.ts)), 0))
+        self.last_of_day = np.r_[new_day[1:], True]
+
+    def __len__(self):
+        return len(self.ts)
+
+    @classmethod
+    def from_candles(cls, candles, frequency=None, timezone=NEW_YORK):
+        """
+        Aligns the candles of several symbols on the union of their timestamps
+
+        Args:
+            candles (dict): symbol --> CANDLE_DTYPE array sorted by ts
+            frequency (int): candle length in minutes, None to infer it
+
+        Returns:
+            panel (Panel):
+        """
+        symbols = list(candles)
+        parts = [candles[symbol]['ts'] for symbol in symbols]
+        ts = np.unique(np.concatenate(parts)) if parts else np.empty(0, dtype='<i8')
+        fields = {field: np.full((len(ts), len(symbols)), np.nan) for field in cls.FIELDS}
+        for j, symbol in enumerate(symbols):
+            rows = np.searchsorted(ts, candles[symbol]['ts'])
+            for field in cls.FIELDS:
+                fields[field][rows, j] = candles[symbol][field]
+        return cls(symbols, ts, fields, frequency=frequency, timezone=timezone)
+
+    ARRAYS = ('ts', 'day', 'minute', 'day_start', 'last_of_day') + FIELDS
+
+    def save(self, path):
+        """
+        Writes all arrays as .npy files to the directory path, see load
+        """
+        os.makedirs(path, exist_ok=True)
+        for name in self.ARRAYS:
+            np.save(os.path.join(path, name + '.npy'), getattr(self, name))
+        with open(os.path.join(path, 'panel.json'), 'w') as f:
+            json.dump({'symbols': self.symbols, 'frequency': self.frequency}, f)
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        """
+        Args:
+            path (str): directory written by save
+            mmap_mode (str): 'r' to memory-map the arrays read-only, i.e. processes loading the same
+                directory share the pages of the operating system instead of holding copies
+
+        Returns:
+            panel (Panel):
+        """
+        with open(os.path.join(path, 'panel.json')) as f:
+            meta = json.load(f)
+        panel = cls.__new__(cls)
+        panel.symbols = meta['symbols']
+        panel.index = {symbol: j for j, symbol in enumerate(panel.symbols)}
+        panel.frequency = meta['frequency']
+        for name in cls.ARRAYS:
+            setattr(panel, name, np.load(os.path.join(path, name + '.npy'), mmap_mode=mmap_mode))
+        return panel
+
+    def previous_close(self, t, j):
+        """
+        Returns:
+            close (float): last close of symbol j before the day of row t, NaN if there is none
+        """
+        i = self.day_start[t] - 1
+        while i >= 0 and np.isnan(self.close[i, j]):
+            i -= 1
+        return self.close[i, j] if i >= 0 else np.nan
+
+
+def load_panel(store, provider, frequency, symbols, start=None, end=None):
+    """
+    Args:
+        store (CandleStore):
+        provider (str): data provider name
+        frequency (int): candle length in minutes
+        symbols (list):
+        start (str): first day 'YYYY-MM-DD' (inclusive), None for the first stored day
+        end (str): last day 'YYYY-MM-DD' (inclusive), None for the last stored day
+
+    Returns:
+        panel (Panel):
+    """
+    return Panel.from_candles({symbol: store.read(provider, frequency, symbol, start, end) for symbol in symbols},
+                              frequency=frequency)
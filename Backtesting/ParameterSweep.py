@@ -0,0 +1,134 @@
+import csv
+import itertools
+import logging
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from Backtesting.Backtest import market_direction_vectorized
+from Backtesting.Panel import Panel
+
+_panel = None  # panel of the worker process, see _init_worker
+
+
+def grid(**values):
+    """
+    Cartesian product of parameter values
+
+        grid(take_profit_pct=[1.01, 1.02], stop_loss_pct=[0.98, 0.99])
+        --> [{'take_profit_pct': 1.01, 'stop_loss_pct': 0.98}, {'take_profit_pct': 1.01, 'stop_loss_pct': 0.99}, ...]
+
+    Returns:
+        points (list): one dict of keyword arguments per parameter combination
+    """
+    names = list(values)
+    return [dict(zip(names, combination)) for combination in itertools.product(*[values[name] for name in names])]
+
+
+def _init_worker(path):
+    global _panel
+    _panel = Panel.load(path, mmap_mode='r')
+
+
+def _run_point(args):
+    backtest, fixed, params = args
+    kwargs = dict(fixed)
+    kwargs.update(params)
+    try:
+        result = backtest(_panel, **kwargs)
+    except Exception as e:
+        logging.warning("backtest failed for " + str(params) + ": " + str(e))
+        return None
+    row = dict(params)
+    row.update({key: value.item() if isinstance(value, np.generic) else value
+                for key, value in result.items() if np.isscalar(value)})
+    return row
+
+
+class ParameterSweep:
+    """
+    Runs a backtest for every point of a parameter grid on a process pool
+
+    The panel is written once as .npy files and memory-mapped read-only by every worker, i.e. the candle arrays
+    are neither pickled per task nor copied per process. backtest has to be a module level function
+    backtest(panel, **kwargs) returning a dict, its scalar values become the columns of the results table.
+    With the default market_direction_vectorized the entry delay of Broker.wait_to_trade is swept via
+    trade_minute (9:30 + time_delay_min, e.g. 11 * 60 for 90 minutes).
+    On Windows the sweep has to be started below if __name__ == '__main__'.
+
+        sweep = ParameterSweep(panel, fixed={'signal_symbol': 'QQQ', 'weights': {'QQQ': 1.0}})
+        rows = sweep.run(grid(take_profit_pct=[1.01, 1.02, 1.05], stop_loss_pct=[0.95, 0.98, 0.99]),
+                         filename='sweep.csv')
+
+    Args:
+        panel (Panel):
+        backtest (function): backtest(panel, **fixed, **point) --> dict of metrics
+        fixed (dict): keyword arguments passed to every backtest
+        max_workers (int): number of processes, defaults to the number of cores
+        path (str): directory for the memory-mapped panel, defaults to a temporary directory removed after run
+        report_interval (float): seconds between two progress log entries
+    """
+
+    def __init__(self, panel, backtest=market_direction_vectorized, fixed=None, max_workers=None, path=None,
+                 report_interval=30):
+        self.panel = panel
+        self.backtest = backtest
+        self.fixed = fixed or {}
+        self.max_workers = max_workers or os.cpu_count()
+        self.path = path
+        self.report_interval = report_interval
+
+    def run(self, points, rank_by=('sharpe', 'total_return_pct'), filename=None):
+        """
+        Args:
+            points (list): dicts of keyword arguments, see grid
+            rank_by (tuple): metrics to sort the results by (descending), later ones break ties
+            filename (str): csv file to write the ranked results table to, None to skip
+
+        Returns:
+            rows (list): one dict per successful backtest (parameters and metrics), best first
+        """
+        path = self.path or tempfile.mkdtemp(prefix='panel_')
+        self.panel.save(path)
+        tasks = [(self.backtest, self.fixed, point) for point in points]
+        chunksize = max(1, len(tasks) // (self.max_workers * 8))
+
+        rows = []
+        started = reported = time.monotonic()
+        try:
+            with ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker,
+                                     initargs=(path,)) as executor:
+                for done, row in enumerate(executor.map(_run_point, tasks, chunksize=chunksize), 1):
+                    if row is not None:
+                        rows.append(row)
+                    if time.monotonic() - reported >= self.report_interval:
+                        reported = time.monotonic()
+                        logging.info("sweep: " + str(done) + "/" + str(len(tasks)) + " backtests, " +
+                                     str(round(done / (reported - started), 2)) + "/s")
+        finally:
+            if self.path is None:
+                shutil.rmtree(path, ignore_errors=True)
+
+        rows.sort(key=lambda row: tuple(row.get(metric, -np.inf) for metric in rank_by), reverse=True)
+        logging.info("sweep: " + str(len(rows)) + "/" + str(len(tasks)) + " backtests finished in " +
+                     str(round(time.monotonic() - started, 1)) + "s")
+        if filename is not None:
+            self.write(rows, filename)
+        return rows
+
+    @staticmethod
+    def write(rows, filename):
+        """
+        Writes the results table as csv, one column per parameter and metric
+        """
+        columns = []
+        for row in rows:
+            columns.extend(column for column in row if column not in columns)
+        with open(filename, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows(rows)
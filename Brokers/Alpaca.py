@@ -1,9 +1,10 @@
-import alpaca_trade_api as tradeapi
 import time
 import logging
+import os
 
+from Brokers.AssetCache import AssetCache
 from Brokers.Broker import Broker
-from Strategies.Strategy import Strategy
+from Brokers.OrderGateway import OrderGateway, OrderResult
 import config
 
 
@@ -13,9 +14,41 @@ import config
 
 class Alpaca(Broker):
 
-    def __init__(self, strategy=Strategy()):
+    def __init__(self, strategy=None):
+        """
+        No request is sent and no client is created before the first call which needs it
+        """
         super().__init__()
-        self.api = self.alpaca_api
+        self.assets_instance = None
+        self.gateway_instance = None
+
+    @property
+    def api(self):
+        return self.alpaca_api
+
+    @property
+    def assets(self):
+        """
+        AssetCache of all active assets, downloaded or loaded from Data/alpaca_assets.json on first use
+        """
+        if self.assets_instance is None:
+            self.assets_instance = AssetCache(self.api, filename=os.path.join(
+                os.path.dirname(os.path.abspath(__file__)), '..', 'Data', 'alpaca_assets.json'))
+        return self.assets_instance
+
+    @property
+    def gateway(self):
+        if self.gateway_instance is None:
+            self.gateway_instance = OrderGateway(self.api, asset_cache=self.assets)
+        return self.gateway_instance
+
+    def close(self):
+        """
+        Shuts the thread pool of the order gateway down, if it was started
+        """
+        if self.gateway_instance is not None:
+            self.gateway_instance.close()
+            self.gateway_instance = None
 
     def check_symbols(self, symbols=[]):
         """
@@ -23,62 +56,62 @@ class Alpaca(Broker):
             A list of stock symbols
 
         return:
-            A list with valid symbols for the brocker
+            A list with valid symbols for the brocker, see AssetCache.valid
         """
+        return self.assets.valid(symbols)
 
-        for symbol in symbols:
-            try:
-                asset = self.api.get_asset(symbol)
-                # print(asset)
-            except Exception as e:
-                symbols.remove(symbol)
-                logging.warning(e)
+    def order_request(self, symbol, qty, latest_price, take_profit_pct, side='buy', type='market',
+                      time_in_force='day', stop_loss_pct=None):
+        """
+        https://docs.alpaca.markets/trading-on-alpaca/orders/#bracket-orders
 
-        return symbols
+        Bracket order around latest_price. Only side = 'buy' is submitted, sell (short) orders are not
+        supported yet.
 
-    def order_asset(self, symbol, qty, latest_price, take_profit_pct, side='buy', type='market', time_in_force='day'):
+        Returns:
+            order (dict): keyword arguments of submit_order, None if the order is not submitted
+        """
+        if side != 'buy':
+            logging.warning("order not submitted, side not supported: " + symbol + " " + str(side))
+            return None
+        order = dict(symbol=symbol, qty=qty, side=side, type=type, time_in_force=time_in_force)
+        if take_profit_pct is not None or stop_loss_pct is not None:
+            order['order_class'] = 'bracket'
+            if take_profit_pct is not None:
+                order['take_profit'] = dict(limit_price=str(round(latest_price * take_profit_pct, 2)))
+            if stop_loss_pct is not None:
+                order['stop_loss'] = dict(stop_price=str(round(latest_price * stop_loss_pct, 2)))
+        return order
+
+    def order_asset(self, symbol, qty, latest_price, take_profit_pct, side='buy', type='market', time_in_force='day',
+                    stop_loss_pct=None):
         """
         https://docs.alpaca.markets/api-documentation/api-v2/orders/
 
-        https://docs.alpaca.markets/trading-on-alpaca/orders/#bracket-orders
-
-        TODO take_profit
-        TODO stop_loss
-        
-        account shorting_enabled: true --> side = 'sell' possible
+        Returns:
+            order (Order): None if the order was rejected or not submitted (side = 'sell')
         """
-
-        try:
-            # check if symbol is available
-            asset = self.api.get_asset(symbol)
-            if not asset.tradable:
-                raise Exception("asset is not tradeable " + symbol)
-        except Exception as e:
-            logging.warning(e)
+        request = self.order_request(symbol, qty, latest_price, take_profit_pct, side=side, type=type,
+                                     time_in_force=time_in_force, stop_loss_pct=stop_loss_pct)
+        if request is None:
             return None
+        return self.gateway.submit(request).order
 
-        if side == 'buy':
-            response = self.api.submit_order(
-                symbol=symbol,
-                qty=qty,
-                side=side,
-                type=type,
-                time_in_force=time_in_force,
-                order_class='bracket',
-                take_profit=dict(
-                    limit_price=latest_price * take_profit_pct,
-                ),
-                stop_loss=dict(
-                    stop_price='295.5',
-                    limit_price='295.5',
-                )
-            )
-        elif side == 'sell':
-            response = None
-        else:
-            response = None
+    def order_assets(self, orders):
+        """
+        Submits a basket of orders concurrently, see OrderGateway.submit_basket
 
-        return response
+        Args:
+            orders (list): dicts of keyword arguments of order_asset
+
+        Returns:
+            results (list): OrderResult (symbol, order, error, latency in seconds) per order
+        """
+        requests = [self.order_request(**order) for order in orders]
+        submitted = iter(self.gateway.submit_basket([request for request in requests if request is not None]))
+        return [next(submitted) if request is not None else
+                OrderResult(order['symbol'], None, "side not supported: " + str(order.get('side')), 0.0)
+                for order, request in zip(orders, requests)]
 
     def check_account_tradeable(self):
         """
@@ -88,7 +121,7 @@ class Alpaca(Broker):
             True if account is okay, i.e. able to trade
             False if something is not okay, i.e. not able to trade
         """
-        account = self.api.get_account()
+        account = self.gateway.get_account()
         if account.status == 'ACTIVE' and account.account_blocked == False and account.trading_blocked == False:
             return True
         else:
@@ -102,7 +135,7 @@ class Alpaca(Broker):
 
         Cash balance
         """
-        return float(self.api.get_account().cash)
+        return float(self.gateway.get_account().cash)
 
     def get_account_portfolio_value(self):
         """
@@ -110,11 +143,17 @@ class Alpaca(Broker):
 
         Cash + long_market_value + short_market_value
         """
-        return float(self.api.get_account().equity)
+        return float(self.gateway.get_account().equity)
 
     def check_asset_shortable(self, asset):
         """
+        input:
+            symbol or Alpaca asset
+
         return:
             True if asset can be shorted
             False if not
         """
+        if isinstance(asset, str):
+            asset = self.gateway.get_asset(asset)
+        return asset is not None and asset.shortable
@@ -0,0 +1,107 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+from datetime import date
+
+# tradability of an Alpaca asset, attribute names as in alpaca_trade_api.entity.Asset
+AssetInfo = namedtuple('AssetInfo', ['symbol', 'exchange', 'status', 'tradable', 'shortable', 'easy_to_borrow'])
+
+
+class AssetCache:
+    """
+    Local index of all active Alpaca assets, downloaded with a single request and refreshed daily
+
+    The index is kept in a dict (symbol --> AssetInfo) and in a JSON file, so a new process validates symbols
+    without any request as long as the file is from today. Thread-safe.
+
+    Args:
+        api (alpaca_trade_api.REST):
+        filename (str): JSON file of the index, None to keep it in memory only
+        max_age (float): seconds after which the index is downloaded again (in any case on a new day)
+    """
+
+    def __init__(self, api, filename=None, max_age=86400):
+        self.api = api
+        self.filename = filename
+        self.max_age = max_age
+        self.assets = None
+        self.updated = 0.0
+        self.lock = threading.Lock()
+
+    def _expired(self):
+        return self.assets is None or time.time() - self.updated > self.max_age or \
+               date.fromtimestamp(self.updated) != date.today()
+
+    def _load(self):
+        if self.filename is None or not os.path.exists(self.filename):
+            return
+        try:
+            with open(self.filename) as f:
+                content = json.load(f)
+            self.assets = {asset[0]: AssetInfo(*asset) for asset in content['assets']}
+            self.updated = content['updated']
+        except (ValueError, KeyError, TypeError) as e:
+            logging.warning("asset cache " + self.filename + ": " + str(e))
+
+    def _save(self):
+        if self.filename is None:
+            return
+        directory = os.path.dirname(self.filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = self.filename + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'updated': self.updated, 'assets': [list(asset) for asset in self.assets.values()]}, f)
+        os.replace(tmp, self.filename)
+
+    def refresh(self):
+        """
+        Downloads the list of all active assets
+        """
+        assets = self.api.list_assets(status='active')
+        self.assets = {asset.symbol: AssetInfo(asset.symbol, asset.exchange, asset.status, bool(asset.tradable),
+                                               bool(getattr(asset, 'shortable', False)),
+                                               bool(getattr(asset, 'easy_to_borrow', False)))
+                       for asset in assets}
+        self.updated = time.time()
+        self._save()
+        logging.info(str(len(self.assets)) + " assets cached")
+
+    def index(self):
+        """
+        Returns:
+            assets (dict): symbol --> AssetInfo, loaded from the file or downloaded if outdated
+        """
+        with self.lock:
+            if self._expired():
+                self._load()
+            if self._expired():
+                self.refresh()
+            return self.assets
+
+    def get(self, symbol):
+        """
+        Returns:
+            asset (AssetInfo): None if the symbol is not an active asset
+        """
+        return self.index().get(symbol)
+
+    def valid(self, symbols):
+        """
+        Args:
+            symbols (list):
+
+        Returns:
+            symbols (list): symbols which are active and tradable, in the given order (the input is not changed)
+        """
+        assets = self.index()
+        valid, invalid = [], []
+        for symbol in symbols:
+            asset = assets.get(symbol)
+            (valid if asset is not None and asset.tradable else invalid).append(symbol)
+        if invalid:
+            logging.warning("assets not tradable: " + ", ".join(invalid))
+        return valid
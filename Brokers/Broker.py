@@ -1,9 +1,9 @@
-import alpaca_trade_api as tradeapi
 from datetime import timedelta
-import time
 import logging
+import threading
 
 import config
+from Brokers.MarketScheduler import sleep_until
 
 # https://docs.alpaca.markets/api-documentation/api-v2/
 # https://github.com/alpacahq/Momentum-Trading-Example/blob/master/algo.py
@@ -16,13 +16,27 @@ class Broker:
         self.APCA_API_SECRET_KEY = config.APCA_API_SECRET_KEY
         self.APCA_API_BASE_URL = config.APCA_API_BASE_URL
 
-        self.alpaca_api = tradeapi.REST(
-            self.APCA_API_KEY_ID, self.APCA_API_SECRET_KEY, self.APCA_API_BASE_URL, 'v2')
+        self.alpaca_api_instance = None
+        self.alpaca_api_lock = threading.Lock()
+
+    @property
+    def alpaca_api(self):
+        """
+        Alpaca REST client, alpaca_trade_api (and with it pandas) is imported on first use
+        """
+        with self.alpaca_api_lock:
+            if self.alpaca_api_instance is None:
+                import alpaca_trade_api as tradeapi
+                self.alpaca_api_instance = tradeapi.REST(
+                    self.APCA_API_KEY_ID, self.APCA_API_SECRET_KEY, self.APCA_API_BASE_URL, 'v2')
+            return self.alpaca_api_instance
 
     def wait_to_trade(self, time_delay_min=90):
         """
         time_delay_min: time to wait in addition to the market_open
                         default = 90 --> market_open 09:30 --> start of trading 11:00
+
+        Blocks the calling thread, use MarketScheduler to run several strategies in one process
         """
         logging.info("wait_to_trade start")
 
@@ -33,22 +47,29 @@ class Broker:
             logging.info("wait_to_trade end")
             return
         
-        # get time to wait before the market opens
-        time_to_wait_market_open = clock.next_open - clock.timestamp
         # add some time, do not start trading exactly at market open
-        time_to_wait = time_to_wait_market_open + \
-            timedelta(minutes=time_delay_min)
-        # convert into seconds
-        time_to_wait_seconds = int(time_to_wait.total_seconds()) + 1
-        # sleep until time to start trading
+        start_of_trading = clock.next_open + timedelta(minutes=time_delay_min)
+        # sleep until time to start trading, in chunks corrected against the system clock
         logging.info("going to sleep")
-        time.sleep(time_to_wait_seconds)
+        sleep_until(start_of_trading.timestamp())
 
         logging.info("wait_to_trade end")
 
     def order_asset(self, symbol, qty, side):
         pass
 
+    def order_assets(self, orders):
+        """
+        Submits a basket of orders, one after the other unless a broker overrides it
+
+        Args:
+            orders (list): dicts of keyword arguments of order_asset
+
+        Returns:
+            results (list): result of order_asset per order
+        """
+        return [self.order_asset(**order) for order in orders]
+
     def check_account_tradeable(self):
         pass
 
@@ -0,0 +1,154 @@
+import asyncio
+import inspect
+import logging
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta, date
+
+from Data_Export.RangePlanner import TradingCalendar
+from Data_Providers.Candles import NEW_YORK
+
+# trading session, open and close as seconds since epoch
+Session = namedtuple('Session', ['day', 'open', 'close'])
+
+
+def sleep_until(ts, max_chunk=60.0):
+    """
+    Blocks until the epoch ts, sleeping in chunks and recomputing the remaining time after each of them,
+    so clock adjustments and oversleeping of long sleeps do not add up
+    """
+    remaining = ts - time.time()
+    while remaining > 0:
+        time.sleep(min(remaining, max_chunk))
+        remaining = ts - time.time()
+
+
+async def sleep_until_async(ts, max_chunk=60.0):
+    """
+    Like sleep_until, but waits without blocking the event loop
+    """
+    remaining = ts - time.time()
+    while remaining > 0:
+        await asyncio.sleep(min(remaining, max_chunk))
+        remaining = ts - time.time()
+
+
+def _epoch(day, hh_mm):
+    t = datetime.strptime(hh_mm[:5], '%H:%M').time()
+    return NEW_YORK.localize(datetime.combine(day, t)).timestamp()
+
+
+class MarketScheduler:
+    """
+    Fires callbacks at times relative to the trading sessions, for many strategies on one event loop
+
+        scheduler = MarketScheduler(api=alpaca.api)
+        scheduler.at_open(90, market.run)          # 11:00 New York
+        scheduler.before_close(5, market.close)    # 15:55 New York, 12:55 on early close days
+        asyncio.run(scheduler.run())
+
+    The calendar is loaded once (Alpaca calendar incl. early closes, otherwise the regular holiday rules
+    plus e.g. Polygon.polygon_get_market_holidays and 09:30-16:00). Between two events the scheduler sleeps
+    in chunks that are recomputed from the system clock, the API is not polled. Coroutine callbacks run as
+    tasks, other callbacks in the default executor, so a slow strategy does not delay the others.
+    Callbacks get the Session as only argument.
+
+    Args:
+        api (alpaca_trade_api.REST): None to use the regular calendar
+        holidays (list): additional closed days ('YYYY-MM-DD'), used without api
+        days (int): number of calendar days to load ahead
+    """
+
+    def __init__(self, api=None, holidays=(), days=30):
+        self.api = api
+        self.holidays = holidays
+        self.days = days
+        self.events = []  # (offset in seconds, 'open' or 'close', callback, name)
+        self.sessions = None
+
+    def at_open(self, minutes, callback, name=None):
+        """
+        Fires callback minutes after the open of every session
+        """
+        self.events.append((minutes * 60, 'open', callback, name or getattr(callback, '__qualname__', str(callback))))
+
+    def before_close(self, minutes, callback, name=None):
+        """
+        Fires callback minutes before the close of every session
+        """
+        self.events.append((-minutes * 60, 'close', callback, name or getattr(callback, '__qualname__', str(callback))))
+
+    def load_calendar(self, start=None):
+        """
+        Returns:
+            sessions (list): Session of every trading day from start (default today) on
+        """
+        start = start or date.today()
+        end = start + timedelta(days=self.days)
+        sessions = []
+        if self.api is not None:
+            for entry in self.api.get_calendar(start=start.strftime('%Y-%m-%d'), end=end.strftime('%Y-%m-%d')):
+                raw = getattr(entry, '_raw', None) or {'date': str(entry.date)[:10], 'open': str(entry.open),
+                                                        'close': str(entry.close)}
+                day = datetime.strptime(raw['date'][:10], '%Y-%m-%d').date()
+                sessions.append(Session(day, _epoch(day, raw['open']), _epoch(day, raw['close'])))
+        else:
+            for day in TradingCalendar(extra_holidays=self.holidays).trading_days(start, end):
+                sessions.append(Session(day, _epoch(day, '09:30'), _epoch(day, '16:00')))
+        self.sessions = sessions
+        logging.info(str(len(sessions)) + " sessions loaded until " + end.strftime('%Y-%m-%d'))
+        return sessions
+
+    def schedule(self, now=None):
+        """
+        Returns:
+            schedule (list): (ts, name, callback, session) of all future events of the loaded sessions, sorted
+        """
+        now = time.time() if now is None else now
+        schedule = []
+        for session in self.sessions:
+            for offset, anchor, callback, name in self.events:
+                ts = (session.open if anchor == 'open' else session.close) + offset
+                if ts >= now:
+                    schedule.append((ts, name, callback, session))
+        schedule.sort(key=lambda event: event[0])
+        return schedule
+
+    async def _fire(self, name, callback, session):
+        started = time.time()
+        try:
+            if inspect.iscoroutinefunction(callback):
+                await callback(session)
+            else:
+                await asyncio.get_event_loop().run_in_executor(None, callback, session)
+        except Exception:
+            logging.exception(name + " failed")
+        logging.info(name + " finished after " + str(round(time.time() - started, 3)) + "s")
+
+    async def run(self, until=None):
+        """
+        Runs the schedule, reloading the calendar when the loaded sessions are used up
+
+        Args:
+            until (float): stop after this epoch, None to run forever
+        """
+        tasks = []
+        while until is None or time.time() < until:
+            if self.sessions is None or not self.schedule():
+                last = self.sessions[-1].day + timedelta(days=1) if self.sessions else None
+                self.load_calendar(last)
+                if not self.schedule():
+                    await sleep_until_async(time.time() + 3600)
+                    continue
+            for ts, name, callback, session in self.schedule():
+                if until is not None and ts > until:
+                    break
+                await sleep_until_async(ts)
+                logging.info(name + " late by " + str(round(time.time() - ts, 3)) + "s")
+                tasks.append(asyncio.ensure_future(self._fire(name, callback, session)))
+                tasks = [task for task in tasks if not task.done()]
+            else:
+                continue
+            break
+        if tasks:
+            await asyncio.gather(*tasks)
@@ -0,0 +1,153 @@
+import numpy as np
+
+# order types
+MARKET, LIMIT, STOP = 0, 1, 2
+ORDER_TYPES = {'market': MARKET, 'limit': LIMIT, 'stop': STOP}
+
+# order status
+PENDING, OPEN, FILLED, CANCELED = 0, 1, 2, 3  # PENDING: bracket leg waiting for the fill of its parent
+STATUS = {PENDING: 'pending', OPEN: 'open', FILLED: 'filled', CANCELED: 'canceled'}
+
+ORDER_DTYPE = np.dtype([
+    ('id', '<i8'),
+    ('column', '<i4'),  # column of the symbol in the panel
+    ('qty', '<f8'),  # negative for sell
+    ('type', 'i1'),
+    ('limit', '<f8'),  # limit price (LIMIT)
+    ('stop', '<f8'),  # stop price (STOP)
+    ('offset_pct', '<f8'),  # bracket leg: price relative to the fill price of the parent, e.g. 1.05
+    ('parent', '<i8'),  # bracket leg: id of the entry order, 0 if none
+    ('oco', '<i8'),  # one-cancels-other group, 0 if none
+    ('status', 'i1'),
+    ('day', '<i8'),  # trading day the order was placed on
+    ('gtc', '?'),  # good till canceled, otherwise the order expires at the end of the day
+    ('fill_price', '<f8'),
+])
+
+
+class OrderBook:
+    """
+    Compact order book of a SimulatedBroker: one row per order in a structured array (ORDER_DTYPE)
+
+    Open orders are matched against a candle with array operations over all of them at once, rows of
+    filled and canceled orders are moved out of the array (compact) once they make up half of it.
+
+    Args:
+        capacity (int): initial number of rows
+    """
+
+    def __init__(self, capacity=64):
+        self.orders = np.zeros(capacity, dtype=ORDER_DTYPE)
+        self.size = 0
+        self.open = 0  # number of PENDING or OPEN orders
+        self.next_id = 1
+        self.closed = {}  # id --> row of orders removed by compact
+
+    def add(self, column, qty, type=MARKET, limit=np.nan, stop=np.nan, offset_pct=np.nan, parent=0, oco=0,
+            status=OPEN, day=-1, gtc=False):
+        """
+        Returns:
+            id (int): id of the new order
+        """
+        if self.size == len(self.orders):
+            self.orders = np.resize(self.orders, 2 * len(self.orders))
+        order_id = self.next_id
+        self.next_id += 1
+        self.orders[self.size] = (order_id, column, qty, type, limit, stop, offset_pct, parent, oco, status, day, gtc,
+                                  np.nan)
+        self.size += 1
+        self.open += 1
+        return order_id
+
+    def live(self):
+        return self.orders[:self.size]
+
+    def row(self, order_id):
+        """
+        Returns:
+            row (int): row of the order, None if it is not (anymore) in the book
+        """
+        row = np.searchsorted(self.orders['id'][:self.size], order_id)  # ids are increasing
+        if row < self.size and self.orders['id'][row] == order_id:
+            return int(row)
+        return None
+
+    def get(self, order_id):
+        """
+        Returns:
+            order (np.void): ORDER_DTYPE record, None if unknown
+        """
+        row = self.row(order_id)
+        if row is not None:
+            return self.orders[row].copy()
+        return self.closed.get(order_id)
+
+    def set_status(self, rows, status):
+        rows = np.atleast_1d(rows)
+        if status in (FILLED, CANCELED):
+            self.open -= int(np.count_nonzero(self.orders['status'][rows] <= OPEN))
+        self.orders['status'][rows] = status
+
+    def cancel(self, mask):
+        """
+        Cancels all PENDING or OPEN orders selected by mask (bool array over the live rows)
+
+        Returns:
+            rows (np.ndarray): rows of the canceled orders
+        """
+        rows = np.flatnonzero(mask & (self.live()['status'] <= OPEN))
+        self.set_status(rows, CANCELED)
+        return rows
+
+    def match(self, opens, highs, lows, rows=None):
+        """
+        Fill prices of the open orders against one candle (before slippage)
+
+            MARKET --> open
+            LIMIT --> limit or the open if it is better, if the candle reached the limit
+            STOP --> stop or the open if it is worse (gap), if the candle reached the stop
+
+        Args:
+            opens, highs, lows (np.ndarray): prices of the candle per column, NaN if a symbol has none
+            rows (np.ndarray): only consider these rows, None for all
+
+        Returns:
+            rows (np.ndarray): rows of the triggered orders, stop orders first
+            prices (np.ndarray): fill prices
+        """
+        if rows is None:
+            rows = np.flatnonzero(self.live()['status'] == OPEN)
+        else:
+            rows = rows[self.orders['status'][rows] == OPEN]
+        if not len(rows):
+            return rows, np.empty(0)
+
+        orders = self.orders[rows]
+        columns = orders['column']
+        open_, high, low = opens[columns], highs[columns], lows[columns]
+        buy = orders['qty'] > 0
+        limit, stop = orders['limit'], orders['stop']
+
+        with np.errstate(invalid='ignore'):
+            price = np.where(orders['type'] == MARKET, open_,
+                    np.where(orders['type'] == LIMIT,
+                             np.where(buy, np.where(low <= limit, np.fmin(open_, limit), np.nan),
+                                      np.where(high >= limit, np.fmax(open_, limit), np.nan)),
+                             np.where(buy, np.where(high >= stop, np.fmax(open_, stop), np.nan),
+                                      np.where(low <= stop, np.fmin(open_, stop), np.nan))))
+        triggered = np.flatnonzero(~np.isnan(price) & ~np.isnan(open_))
+        # conservative: if both legs of an OCO group are hit within one candle, the stop is filled
+        triggered = triggered[np.argsort(orders['type'][triggered] != STOP, kind='stable')]
+        return rows[triggered], price[triggered]
+
+    def compact(self):
+        """
+        Moves filled and canceled orders out of the array
+        """
+        live = self.live()
+        done = live['status'] > OPEN
+        for order in live[done]:
+            self.closed[int(order['id'])] = order.copy()
+        kept = live[~done]
+        self.orders[:len(kept)] = kept
+        self.size = len(kept)
@@ -0,0 +1,159 @@
+import logging
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from Data_Providers.ResponseCache import ResponseCache, MemoryCache
+
+# result of a submitted order, order is the Alpaca order (None if it failed), latency in seconds
+OrderResult = namedtuple('OrderResult', ['symbol', 'order', 'error', 'latency'])
+
+
+class OrderGateway:
+    """
+    Submits baskets of orders to Alpaca concurrently and caches the account and asset state
+
+    The orders of a basket are submitted in parallel by a pool of threads which is kept alive between
+    baskets, i.e. a basket takes about one round trip instead of one per order. Asset tradability/
+    shortability and the account are cached with short TTLs, the account cache is dropped after every
+    basket. Call warm_up with the symbols before the time of the entry so that only the orders themselves
+    are sent at that time. close (or leaving a with block) shuts the pool down.
+
+    Args:
+        api (alpaca_trade_api.REST):
+        max_workers (int): max. concurrent requests
+        asset_ttl (float): seconds to cache an asset
+        account_ttl (float): seconds to cache the account
+        asset_cache (AssetCache): index of all assets, otherwise assets are requested (and cached) one by one
+    """
+
+    def __init__(self, api, max_workers=32, asset_ttl=3600, account_ttl=2.0, asset_cache=None):
+        self.api = api
+        self.asset_cache = asset_cache
+        self.max_workers = max_workers
+        self.asset_ttl = asset_ttl
+        self.account_ttl = account_ttl
+        self.cache = ResponseCache([MemoryCache()])
+        self.account = None
+        self.account_fetched = 0.0
+        self.account_lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def get_asset(self, symbol):
+        """
+        Returns:
+            asset (Asset): cached Alpaca asset, None if the symbol is unknown
+        """
+        if self.asset_cache is not None:
+            return self.asset_cache.get(symbol)
+
+        def fetch():
+            try:
+                return self.api.get_asset(symbol)
+            except Exception as e:
+                logging.warning(symbol + ": " + str(e))
+                return None
+
+        return self.cache.get_or_fetch('alpaca/assets', {'symbol': symbol}, fetch, ttl=self.asset_ttl)
+
+    def get_assets(self, symbols):
+        """
+        Returns:
+            assets (dict): symbol --> asset or None, fetched concurrently
+        """
+        return dict(zip(symbols, self.executor.map(self.get_asset, symbols)))
+
+    def get_account(self):
+        """
+        Returns:
+            account (Account): cached Alpaca account
+        """
+        with self.account_lock:
+            if self.account is None or time.monotonic() - self.account_fetched > self.account_ttl:
+                self.account = self.api.get_account()
+                self.account_fetched = time.monotonic()
+            return self.account
+
+    def invalidate_account(self):
+        with self.account_lock:
+            self.account = None
+
+    def warm_up(self, symbols, timeout=5.0):
+        """
+        Fills the asset and account caches and starts all threads of the pool
+
+        Args:
+            timeout (float): max. seconds to wait for the threads
+        """
+        self.get_assets(symbols)
+        self.get_account()
+        # every task waits for all the others, i.e. the pool has to start one thread per task
+        barrier = threading.Barrier(self.max_workers)
+
+        def wait():
+            try:
+                barrier.wait(timeout)
+            except threading.BrokenBarrierError:
+                pass
+
+        list(self.executor.map(lambda _: wait(), range(self.max_workers)))
+
+    def close(self):
+        """
+        Shuts the pool down after the submitted requests are done
+        """
+        self.executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def check_order(self, order):
+        """
+        Returns:
+            error (str): reason why the order can not be submitted, None if it can
+        """
+        asset = self.get_asset(order['symbol'])
+        if asset is None or not asset.tradable:
+            return "asset is not tradeable " + order['symbol']
+        return None
+
+    def submit(self, order):
+        """
+        Args:
+            order (dict): keyword arguments of alpaca_trade_api.REST.submit_order
+
+        Returns:
+            result (OrderResult):
+        """
+        error = self.check_order(order)
+        if error is not None:
+            logging.warning(error)
+            return OrderResult(order['symbol'], None, error, 0.0)
+        started = time.perf_counter()
+        try:
+            response = self.api.submit_order(**order)
+            return OrderResult(order['symbol'], response, None, time.perf_counter() - started)
+        except Exception as e:
+            logging.warning(order['symbol'] + ": " + str(e))
+            return OrderResult(order['symbol'], None, str(e), time.perf_counter() - started)
+
+    def submit_basket(self, orders):
+        """
+        Submits all orders concurrently (at most max_workers at once)
+
+        Args:
+            orders (list): dicts of keyword arguments of alpaca_trade_api.REST.submit_order
+
+        Returns:
+            results (list): OrderResult per order, in the order of orders
+        """
+        started = time.perf_counter()
+        results = list(self.executor.map(self.submit, orders))
+        self.invalidate_account()
+        logging.info(str(len(orders)) + " orders submitted in " + str(round(time.perf_counter() - started, 3)) +
+                     "s, max. latency " + str(round(max([result.latency for result in results] or [0.0]), 3)) + "s")
+        return results
@@ -0,0 +1,250 @@
+import logging
+
+import numpy as np
+
+from Brokers.Broker import Broker
+from Brokers.OrderBook import OrderBook, ORDER_TYPES, MARKET, LIMIT, STOP, PENDING, OPEN, FILLED, STATUS
+
+
+class SimulatedBroker(Broker):
+    """
+    Broker replaying stored candles instead of trading via an api, used by Backtesting.Backtest
+
+    Orders placed while candle t is processed are matched against the following candles of their symbol by an
+    in-process matching engine (Brokers.OrderBook):
+        market --> filled at the open
+        limit --> filled at the limit (or a better open) once the candle reaches it
+        stop --> filled at the stop (or a worse open after a gap) once the candle reaches it
+        bracket --> entry order with a take profit (limit) and a stop loss (stop) leg, the legs become active
+                    when the entry is filled and cancel each other (OCO)
+    If both legs of an OCO group are reached within the same candle the stop is assumed to be filled first.
+    Market and stop fills are moved against the order by slippage_pct, every fill pays a commission.
+    Orders with time_in_force='day' expire at the end of the day they were placed on.
+    Short positions (negative qty) book the proceeds as cash.
+
+    Args:
+        cash (float): starting cash
+        slippage_pct (float): e.g. 0.0005 --> market and stop orders are filled 0.05% worse than the price
+        commission_per_share (float): commission per share and fill
+        min_commission (float): min. commission per fill
+    """
+
+    def __init__(self, cash=100000.0, slippage_pct=0.0, commission_per_share=0.0, min_commission=0.0):
+        # no api client, i.e. Broker.__init__ is not called
+        self.cash = float(cash)
+        self.slippage_pct = slippage_pct
+        self.commission_per_share = commission_per_share
+        self.min_commission = min_commission
+        self.book = OrderBook()
+        self.trades = []  # (ts, symbol, qty, price, reason)
+        self.commissions = 0.0
+        self.panel = None
+        self.t = None
+        self.qty = None  # position per panel column, negative if short
+        self.last = None  # last close per panel column
+
+    def wait_to_trade(self, time_delay_min=90):
+        pass
+
+    def check_symbols(self, symbols=[]):
+        return list(symbols)
+
+    def check_account_tradeable(self):
+        return True
+
+    def get_account_cash(self):
+        return self.cash
+
+    def get_account_portfolio_value(self):
+        if self.qty is None:
+            return self.cash
+        held = self.qty != 0
+        return self.cash + float(np.dot(self.qty[held], self.last[held]))
+
+    @property
+    def positions(self):
+        """
+        Returns:
+            positions (dict): symbol --> qty (negative if short) of all open positions
+        """
+        if self.qty is None:
+            return {}
+        return {self.panel.symbols[j]: self.qty[j] for j in np.flatnonzero(self.qty)}
+
+    def get_position(self, symbol):
+        if self.qty is None:
+            return 0.0
+        return self.qty[self.panel.index[symbol]]
+
+    def _column(self, symbol):
+        if self.panel is None:
+            logging.critical("no candle processed yet")
+            raise Exception('SimulatedBroker.on_bar has to be called before orders can be placed')
+        return self.panel.index[symbol]
+
+    def _day(self):
+        return int(self.panel.day[self.t])
+
+    def order_asset(self, symbol, qty, latest_price=None, take_profit_pct=None, side='buy', type='market',
+                    time_in_force='day', stop_loss_pct=None, limit_price=None, stop_price=None):
+        """
+        Args:
+            symbol (str):
+            qty (int): number of shares, > 0
+            latest_price (float): unused, fills happen at the following candles
+            take_profit_pct (float): e.g. 1.05 --> take profit leg 5% above the fill price (below for sell)
+            side (str): 'buy' or 'sell'
+            type (str): 'market', 'limit' or 'stop'
+            time_in_force (str): 'day' or 'gtc'
+            stop_loss_pct (float): e.g. 0.95 --> stop loss leg 5% below the fill price (above for sell)
+            limit_price (float): limit price of a limit order
+            stop_price (float): stop price of a stop order
+
+        Returns:
+            id (int): id of the (entry) order, None if rejected
+        """
+        order_type = ORDER_TYPES.get(type)
+        if qty <= 0 or order_type is None or side not in ('buy', 'sell') \
+                or (order_type == LIMIT and limit_price is None) or (order_type == STOP and stop_price is None):
+            logging.warning("order rejected: " + symbol + " " + str(qty) + " " + side + " " + type)
+            return None
+
+        column = self._column(symbol)
+        qty = qty if side == 'buy' else -qty
+        day, gtc = self._day(), time_in_force == 'gtc'
+        order_id = self.book.add(column, qty, type=order_type,
+                                 limit=np.nan if limit_price is None else limit_price,
+                                 stop=np.nan if stop_price is None else stop_price, day=day, gtc=gtc)
+
+        # bracket legs
+        short = qty < 0
+        if take_profit_pct is not None:
+            self.book.add(column, -qty, type=LIMIT, offset_pct=2 - take_profit_pct if short else take_profit_pct,
+                          parent=order_id, oco=order_id, status=PENDING, day=day, gtc=gtc)
+        if stop_loss_pct is not None:
+            self.book.add(column, -qty, type=STOP, offset_pct=2 - stop_loss_pct if short else stop_loss_pct,
+                          parent=order_id, oco=order_id, status=PENDING, day=day, gtc=gtc)
+        return order_id
+
+    def order_oco(self, symbol, qty, side, limit_price, stop_price, time_in_force='gtc'):
+        """
+        One-cancels-other pair, e.g. to exit an existing position at a take profit or a stop loss
+
+        Returns:
+            ids (tuple): ids of the limit and the stop order
+        """
+        column = self._column(symbol)
+        qty = qty if side == 'buy' else -qty
+        day, gtc = self._day(), time_in_force == 'gtc'
+        limit_id = self.book.add(column, qty, type=LIMIT, limit=limit_price, day=day, gtc=gtc)
+        self.book.orders['oco'][self.book.row(limit_id)] = limit_id
+        stop_id = self.book.add(column, qty, type=STOP, stop=stop_price, oco=limit_id, day=day, gtc=gtc)
+        return limit_id, stop_id
+
+    def get_order(self, order_id):
+        """
+        Returns:
+            order (dict): symbol, qty, type, status, fill_price, None if unknown
+        """
+        order = self.book.get(order_id)
+        if order is None:
+            return None
+        return {'id': int(order['id']), 'symbol': self.panel.symbols[order['column']], 'qty': float(order['qty']),
+                'type': [name for name, value in ORDER_TYPES.items() if value == order['type']][0],
+                'status': STATUS[int(order['status'])], 'fill_price': float(order['fill_price'])}
+
+    def cancel_order(self, order_id):
+        row = self.book.row(order_id)
+        if row is not None:
+            live = self.book.live()
+            self.book.cancel((live['id'] == order_id) | (live['parent'] == order_id))
+
+    def cancel_all_orders(self, symbol=None):
+        live = self.book.live()
+        if symbol is None:
+            self.book.cancel(np.ones(len(live), dtype=bool))
+        else:
+            self.book.cancel(live['column'] == self._column(symbol))
+
+    def close_position(self, symbol, reason='close'):
+        """
+        Cancels the open orders of the symbol and closes its position at the close of the current candle
+        """
+        column = self._column(symbol)
+        self.book.cancel(self.book.live()['column'] == column)
+        qty = self.qty[column]
+        if qty != 0:
+            self._fill(column, -qty, self._slipped(self.last[column], -qty), reason)
+
+    def close_all_positions(self, reason='close'):
+        if self.qty is None:
+            return
+        self.cancel_all_orders()
+        for column in np.flatnonzero(self.qty):
+            qty = self.qty[column]
+            self._fill(column, -qty, self._slipped(self.last[column], -qty), reason)
+
+    def _slipped(self, price, qty):
+        return price * (1 + self.slippage_pct) if qty > 0 else price * (1 - self.slippage_pct)
+
+    def _fill(self, column, qty, price, reason):
+        commission = max(self.min_commission, abs(qty) * self.commission_per_share) if qty else 0.0
+        self.cash -= qty * price + commission
+        self.commissions += commission
+        self.qty[column] += qty
+        self.trades.append((int(self.panel.ts[self.t]), self.panel.symbols[column], qty, price, reason))
+
+    def _bind(self, panel):
+        self.panel = panel
+        self.qty = np.zeros(len(panel.symbols))
+        self.last = np.full(len(panel.symbols), np.nan)
+
+    def on_bar(self, panel, t):
+        """
+        Processes candle t of the panel: expires day orders, matches open orders, updates the prices
+        """
+        if panel is not self.panel:
+            self._bind(panel)
+        self.t = t
+        book = self.book
+
+        if book.open and panel.day_start[t] == t:
+            live = book.live()
+            book.cancel(~live['gtc'] & (live['day'] < panel.day[t]))
+
+        rows = None
+        while book.open:
+            rows, prices = book.match(panel.open[t], panel.high[t], panel.low[t], rows)
+            activated = []
+            for row, price in zip(rows, prices):
+                order = book.orders[row]
+                if order['status'] != OPEN:  # canceled by an OCO sibling filled within this candle
+                    continue
+                column, qty, order_type = order['column'], order['qty'], order['type']
+                if order_type != LIMIT:
+                    price = self._slipped(price, qty)
+                order['fill_price'] = price
+                book.set_status(row, FILLED)
+                reason = 'entry' if order['parent'] == 0 and order['oco'] == 0 else \
+                    ('take_profit' if order_type == LIMIT else 'stop_loss')
+                self._fill(column, qty, price, reason)
+
+                live = book.live()
+                if order['oco']:
+                    book.cancel((live['oco'] == order['oco']) & (live['id'] != order['id']))
+                legs = np.flatnonzero((live['parent'] == order['id']) & (live['status'] == PENDING))
+                if len(legs):
+                    # legs are priced relative to the fill and may be hit by the same candle
+                    levels = price * live['offset_pct'][legs]
+                    live['limit'][legs] = np.where(live['type'][legs] == LIMIT, levels, np.nan)
+                    live['stop'][legs] = np.where(live['type'][legs] == STOP, levels, np.nan)
+                    live['status'][legs] = OPEN
+                    activated.append(legs)
+            if not activated:
+                break
+            rows = np.concatenate(activated)
+
+        closes = panel.close[t]
+        self.last = np.where(np.isnan(closes), self.last, closes)
+        if book.size > 64 and book.open < book.size // 2:
+            book.compact()
@@ -0,0 +1,135 @@
+import logging
+import queue
+import threading
+import time
+from collections import namedtuple
+
+# one history request of a single symbol
+#   start/end: range as expected by the data provider (seconds since epoch or datetime)
+#   first_day/last_day: trading days covered by the range ('YYYY-MM-DD')
+ExportTask = namedtuple('ExportTask', ['data_provider_name', 'symbol', 'frequency', 'start', 'end',
+                                       'first_day', 'last_day'])
+
+
+class ExportEngine:
+    """
+    Fans history requests out over a bounded pool of worker threads
+
+    Every request first takes a token from the rate limiter of the data provider, so the workers run
+    as fast as the documented quota allows instead of sleeping a fixed time after every call.
+    The achieved request rate and the queue depth are available while the export runs and are
+    logged every report_interval seconds.
+
+    Args:
+        fetch (function): fetch(task) --> result of the request, None if there is no data
+        rate_limiter (RateLimiter): limiter shared by all workers
+        max_workers (int): number of worker threads
+        max_queue (int): max. number of tasks waiting for a worker, producers block if reached
+        max_retries (int): number of retries of a failed request (exponential backoff)
+        report_interval (float): seconds between two progress log messages
+    """
+
+    def __init__(self, fetch, rate_limiter, max_workers=4, max_queue=100, max_retries=3, report_interval=30):
+        self.fetch = fetch
+        self.rate_limiter = rate_limiter
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.report_interval = report_interval
+
+        self.tasks = queue.Queue(maxsize=max_queue)
+        self.lock = threading.Lock()
+        self.done = 0
+        self.failed = []
+        self.running = threading.Event()
+
+    @property
+    def queue_depth(self):
+        """
+        Returns:
+            depth (int): number of tasks waiting for a worker
+        """
+        return self.tasks.qsize()
+
+    @property
+    def request_rate(self):
+        """
+        Returns:
+            rate (float): achieved requests per minute
+        """
+        return self.rate_limiter.request_rate
+
+    def run(self, tasks, sink):
+        """
+        Executes all tasks and hands the results to the sink
+
+        Args:
+            tasks (iterable): ExportTask objects
+            sink (object): called from the worker threads, has to be thread-safe
+                sink.write(task, result) --> request succeeded, result None if there is no data
+                sink.fail(task, exception) --> request failed after all retries or sink.write raised
+
+        Returns:
+            failed (list): tasks which failed after all retries
+        """
+        self.running.set()
+        workers = [threading.Thread(target=self._work, args=(sink,), daemon=True) for _ in range(self.max_workers)]
+        for worker in workers:
+            worker.start()
+        reporter = threading.Thread(target=self._report, daemon=True)
+        reporter.start()
+
+        for task in tasks:
+            self.tasks.put(task)
+        for _ in workers:
+            self.tasks.put(None)
+        for worker in workers:
+            worker.join()
+
+        self.running.clear()
+        self.log_progress()
+        return self.failed
+
+    def log_progress(self):
+        logging.info("export: %d requests done, %d failed, %d queued, %.1f requests/min",
+                     self.done, len(self.failed), self.queue_depth, self.request_rate)
+
+    def _report(self):
+        while self.running.is_set():
+            time.sleep(self.report_interval)
+            if self.running.is_set():
+                self.log_progress()
+
+    def _work(self, sink):
+        while True:
+            task = self.tasks.get()
+            if task is None:
+                return
+            try:
+                result = self._fetch(task)
+                sink.write(task, result)
+            except Exception as e:
+                # fetch failed after all retries or the sink could not write the result
+                logging.warning("export failed: " + str(task) + " " + str(e))
+                with self.lock:
+                    self.failed.append(task)
+                try:
+                    sink.fail(task, e)
+                except Exception:
+                    logging.exception("export sink failed: " + str(task))
+            with self.lock:
+                self.done += 1
+
+    def _fetch(self, task):
+        attempt = 0
+        while True:
+            self.rate_limiter.acquire()
+            try:
+                return self.fetch(task)
+            except Exception as e:
+                if attempt >= self.max_retries:
+                    raise
+                backoff = 2 ** attempt
+                logging.warning("export retry in " + str(backoff) + "s: " + str(task) + " " + str(e))
+                time.sleep(backoff)
+                attempt += 1
+
@@ -0,0 +1,142 @@
+import codecs
+import json
+import logging
+import math
+from contextlib import closing
+
+import numpy as np
+
+from Data_Export.RangePlanner import TradingCalendar
+from Data_Providers.Polygon import Polygon
+from Data_Providers.RateLimiter import RateLimiter
+from Data_Store.SnapshotStore import SNAPSHOT_DTYPE
+
+WHITESPACE = ' \t\r\n,'
+
+
+def iter_json_array(chunks, key='results'):
+    """
+    Incrementally parses the elements of the array under key of a JSON document arriving in chunks
+
+    Only the current chunk and at most one incomplete element are held in memory, never the whole document.
+
+    Args:
+        chunks (iterable): bytes of the document
+        key (str): name of the array, e.g. 'results'
+
+    Yields:
+        element: parsed element of the array
+    """
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder('utf-8')()
+    marker = '"' + key + '"'
+    buffer, position, inside = '', 0, False
+    for chunk in chunks:
+        buffer = buffer[position:] + text.decode(chunk)
+        position = 0
+        if not inside:
+            start = buffer.find(marker)
+            bracket = buffer.find('[', start + len(marker)) if start >= 0 else -1
+            if bracket < 0:
+                # keep enough to find a marker split over two chunks
+                position = max(0, len(buffer) - len(marker)) if start < 0 else start
+                continue
+            inside, position = True, bracket + 1
+        while True:
+            while position < len(buffer) and buffer[position] in WHITESPACE:
+                position += 1
+            if position == len(buffer):
+                break
+            if buffer[position] == ']':
+                return
+            try:
+                element, position = decoder.raw_decode(buffer, position)
+            except ValueError:
+                break  # incomplete element, wait for the next chunk
+            yield element
+
+
+def grouped_snapshot(results, capacity=16384):
+    """
+    Converts the elements of a Polygon grouped aggregates response into a SNAPSHOT_DTYPE array
+
+    Args:
+        results (iterable): dicts with T (symbol), t (ms since epoch), o, h, l, c, v, vw, n
+
+    Returns:
+        snapshot (np.ndarray): SNAPSHOT_DTYPE array in the order of the results
+    """
+    snapshot = np.empty(capacity, dtype=SNAPSHOT_DTYPE)
+    size = 0
+    for result in results:
+        if size == len(snapshot):
+            snapshot = np.resize(snapshot, 2 * len(snapshot))
+        symbol = result.get('T', '').encode()
+        if len(symbol) > SNAPSHOT_DTYPE['symbol'].itemsize:
+            continue
+        snapshot[size] = (symbol, result.get('t', 0) // 1000, result.get('o', math.nan), result.get('h', math.nan),
+                          result.get('l', math.nan), result.get('c', math.nan), result.get('v', 0.0),
+                          result.get('vw', math.nan), result.get('n', 0))
+        size += 1
+    return snapshot[:size]
+
+
+class GroupedDailyIngest:
+    """
+    Ingests the daily candles of all US stocks from Polygon grouped aggregates into a SnapshotStore
+
+    One request per trading day (instead of one per symbol), the response is streamed and parsed
+    element by element. Days already in the store are skipped, i.e. an interrupted ingestion resumes.
+
+    Args:
+        data_provider (Polygon): e.g. DataProvider
+        store (SnapshotStore):
+        calendar (TradingCalendar):
+        rate_limiter (RateLimiter): defaults to the documented Polygon rate limits
+    """
+
+    def __init__(self, data_provider, store, calendar=None, rate_limiter=None):
+        self.data_provider = data_provider
+        self.store = store
+        self.calendar = calendar if calendar is not None else TradingCalendar()
+        self.rate_limiter = rate_limiter if rate_limiter is not None else RateLimiter(Polygon.POLYGON_RATE_LIMITS)
+
+    def ingest_day(self, day):
+        """
+        Args:
+            day (str): 'YYYY-MM-DD'
+
+        Returns:
+            symbols (int): number of stored symbols, None if the request failed
+        """
+        self.rate_limiter.acquire()
+        chunks = self.data_provider.polygon_get_stream('/v2/aggs/grouped/locale/US/market/STOCKS/' + day)
+        if chunks is None:
+            logging.warning("grouped aggregates missing: " + day)
+            return None
+        # the parser stops at the end of the array, closing releases the connection of the rest of the body
+        with closing(chunks):
+            snapshot = grouped_snapshot(iter_json_array(chunks, 'results'))
+        if len(snapshot):
+            self.store.write(day, snapshot)
+        return len(snapshot)
+
+    def ingest(self, first, last, overwrite=False):
+        """
+        Args:
+            first (date): first day
+            last (date): last day (inclusive)
+            overwrite (bool): request days which are already stored again
+
+        Returns:
+            days (dict): 'YYYY-MM-DD' --> number of stored symbols (None if the request failed)
+        """
+        stored = set() if overwrite else set(self.store.days())
+        days = {}
+        for day in self.calendar.trading_days(first, last):
+            day = day.strftime('%Y-%m-%d')
+            if day in stored:
+                continue
+            days[day] = self.ingest_day(day)
+            logging.info("grouped aggregates " + day + ": " + str(days[day]) + " symbols")
+        return days
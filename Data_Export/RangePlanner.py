@@ -0,0 +1,171 @@
+from datetime import date, datetime, timedelta
+
+from Data_Export.ExportEngine import ExportTask
+
+
+def _easter(year):
+    # anonymous gregorian algorithm
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _nth_weekday(year, month, weekday, n):
+    # n-th (1 based) weekday of the month, n = -1 for the last one
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _observed(day):
+    # saturday holidays are observed on friday, sunday holidays on monday
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+def market_holidays(year):
+    """
+    Full-day NYSE/NASDAQ holidays of a year (regular rules, no special closings)
+
+    Returns:
+        holidays (set): date objects
+    """
+    holidays = {
+        _nth_weekday(year, 1, 0, 3),  # Martin Luther King Jr. Day
+        _nth_weekday(year, 2, 0, 3),  # Washington's Birthday
+        _easter(year) - timedelta(days=2),  # Good Friday
+        _nth_weekday(year, 5, 0, -1),  # Memorial Day
+        _observed(date(year, 7, 4)),  # Independence Day
+        _nth_weekday(year, 9, 0, 1),  # Labor Day
+        _nth_weekday(year, 11, 3, 4),  # Thanksgiving Day
+        _observed(date(year, 12, 25)),  # Christmas Day
+    }
+    # New Year's Day on a saturday is not observed on the friday before
+    new_year = _observed(date(year, 1, 1))
+    if new_year.year == year:
+        holidays.add(new_year)
+    if year >= 2022:
+        holidays.add(_observed(date(year, 6, 19)))  # Juneteenth
+    return holidays
+
+
+class TradingCalendar:
+    """
+    Trading days of the US stock market based on the regular holiday rules
+
+    Args:
+        extra_holidays (iterable): additional closed days as 'YYYY-MM-DD' or date,
+                                   e.g. from Polygon.polygon_get_market_holidays
+    """
+
+    def __init__(self, extra_holidays=()):
+        self.extra_holidays = set()
+        for day in extra_holidays:
+            if isinstance(day, str):
+                day = datetime.strptime(day, '%Y-%m-%d').date()
+            self.extra_holidays.add(day)
+        self.holidays = {}  # year --> set of holidays
+
+    def is_trading_day(self, day):
+        if day.weekday() >= 5 or day in self.extra_holidays:
+            return False
+        if day.year not in self.holidays:
+            self.holidays[day.year] = market_holidays(day.year)
+        return day not in self.holidays[day.year]
+
+    def trading_days(self, first, last):
+        """
+        Returns:
+            days (list): trading days between first and last (date, inclusive)
+        """
+        days = []
+        day = first
+        while day <= last:
+            if self.is_trading_day(day):
+                days.append(day)
+            day += timedelta(days=1)
+        return days
+
+
+class RangePlanner:
+    """
+    Splits a requested window into the largest ranges a data provider returns in a single call
+
+    Non-trading days are never requested on their own, they only appear inside a range between two
+    trading days. Candles of overlapping ranges are deduplicated by the CandleStore.
+
+    Args:
+        calendar (TradingCalendar):
+    """
+
+    # max. number of trading days of intraday candles returned by a single call
+    MAX_TRADING_DAYS_PER_REQUEST = {
+        'TDAmeritrade': {1: 10, 5: 10, 15: 10, 30: 10},
+        'Finnhub': {1: 20, 5: 20, 15: 20, 30: 20}
+    }
+
+    def __init__(self, calendar=None):
+        self.calendar = calendar if calendar is not None else TradingCalendar()
+
+    def max_days(self, data_provider_name, frequency):
+        return self.MAX_TRADING_DAYS_PER_REQUEST.get(data_provider_name, {}).get(frequency, 1)
+
+    def chunks(self, data_provider_name, frequency, first, last):
+        """
+        Args:
+            first (date): first day of the window
+            last (date): last day of the window
+
+        Returns:
+            chunks (list): (first trading day, last trading day) of every request
+        """
+        days = self.calendar.trading_days(first, last)
+        size = self.max_days(data_provider_name, frequency)
+        return [(days[i], days[min(i + size, len(days)) - 1]) for i in range(0, len(days), size)]
+
+    def tasks(self, data_provider_name, symbols, frequencies, first, last, make_range, manifest=None):
+        """
+        Plans the requests of an export, skipping all days already recorded in the manifest
+
+        Args:
+            data_provider_name (str):
+            symbols (list):
+            frequencies (list):
+            first (date): first day of the export
+            last (date): last day of the export
+            make_range (function): make_range(first day, last day) --> (start, end) as expected by the data provider
+            manifest (Manifest): already fetched days, None to fetch everything
+
+        Returns:
+            tasks (list): ExportTask objects ordered by frequency and symbol
+        """
+        tasks = []
+        for frequency in frequencies:
+            for symbol in symbols:
+                if manifest is None:
+                    gaps = [(first, last)]
+                else:
+                    gaps = [(datetime.strptime(gap_first, '%Y-%m-%d').date(),
+                             datetime.strptime(gap_last, '%Y-%m-%d').date())
+                            for gap_first, gap_last in manifest.missing(data_provider_name, frequency, symbol,
+                                                                        first.strftime('%Y-%m-%d'),
+                                                                        last.strftime('%Y-%m-%d'))]
+                for gap_first, gap_last in gaps:
+                    for chunk_first, chunk_last in self.chunks(data_provider_name, frequency, gap_first, gap_last):
+                        start, end = make_range(chunk_first, chunk_last)
+                        tasks.append(ExportTask(data_provider_name, symbol, frequency, start, end,
+                                                chunk_first.strftime('%Y-%m-%d'), chunk_last.strftime('%Y-%m-%d')))
+        return tasks
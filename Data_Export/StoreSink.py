@@ -0,0 +1,30 @@
+import logging
+
+from Data_Store.CandleStore import today
+
+
+class StoreSink:
+    """
+    Writes the results of an export into the CandleStore
+
+    Requests are written as soon as they finish, the store partitions and sorts them by trading day
+    and records the fetch day of every partition.
+    If a manifest is given, the days of every successful request are recorded in it afterwards
+    (also if the data provider confirmed that there is no data), so a rerun skips them. Failed requests
+    (the fetch raised) end in fail and are never recorded, i.e. a rerun requests them again.
+    """
+
+    def __init__(self, store, manifest=None):
+        self.store = store
+        self.manifest = manifest
+
+    def write(self, task, candles):
+        if candles is not None and len(candles):
+            days = self.store.write(task.data_provider_name, task.frequency, task.symbol, candles, fetched=today())
+            logging.info(task.symbol + " " + str(task.frequency) + "min: " + ", ".join(days))
+        if self.manifest is not None:
+            self.manifest.add(task.data_provider_name, task.frequency, task.symbol, task.first_day, task.last_day)
+
+    def fail(self, task, exception):
+        logging.warning("missing data: " + task.data_provider_name + " " + task.symbol + " " +
+                        str(task.frequency) + "min " + task.first_day + " - " + task.last_day)
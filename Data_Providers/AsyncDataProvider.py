@@ -0,0 +1,177 @@
+import asyncio
+import logging
+import random
+from datetime import datetime
+
+import aiohttp
+
+import config
+from Data_Providers.DataProvider import DataProvider
+from Data_Providers.RateLimiter import RateLimiter
+
+
+class AsyncDataProvider:
+    """
+    asyncio counterpart of DataProvider for fan-out retrieval of many symbols at once
+
+        async with AsyncDataProvider() as data_provider:
+            quotes = await data_provider.get_quotes(symbols)
+
+    All requests of a data provider share a semaphore (max. concurrent requests) and a RateLimiter built from
+    its documented rate limits, requests answered with 429 or 5xx are retried with jittered backoff.
+    Higher limits of paid subscriptions can be passed via rate_limits.
+
+    Args:
+        max_concurrency (dict): data provider name --> max. concurrent requests, overrides MAX_CONCURRENCY
+        rate_limits (dict): data provider name --> [(calls, period in seconds), ...], overrides the documented limits
+        max_retries (int): max. number of retries per request
+        timeout (float): timeout of a request in seconds
+    """
+
+    FINNHUB_URL = 'https://finnhub.io/api/v1'
+    TDAMERITRADE_URL = 'https://api.tdameritrade.com/v1'
+    RETRY_STATUS = (429, 500, 502, 503, 504)
+    MAX_CONCURRENCY = {'Finnhub': 10, 'TDAmeritrade': 4, 'Polygon': 1}
+
+    def __init__(self, finnhub_token=config.FINNHUB_TOKEN, tda_api_key=config.TDA_API_KEY,
+                 polygon_token=config.POLYGON_TOKEN, polygon_base_url=config.POLYGON_BASE_URL,
+                 max_concurrency=None, rate_limits=None, max_retries=3, timeout=10):
+        self.finnhub_token = finnhub_token
+        self.tda_apikey = tda_api_key
+        self.polygon_token = polygon_token
+        self.polygon_base_url = polygon_base_url
+        self.max_concurrency = dict(self.MAX_CONCURRENCY, **(max_concurrency or {}))
+        self.max_retries = max_retries
+        self.timeout = timeout
+
+        rate_limits = rate_limits or {}
+        self.rate_limiters = {name: RateLimiter(rate_limits.get(name, DataProvider.rate_limits(name)))
+                              for name in self.MAX_CONCURRENCY}
+        self.semaphores = None
+        self.session = None
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def open(self):
+        # semaphores have to be created within the running event loop
+        self.semaphores = {name: asyncio.Semaphore(limit) for name, limit in self.max_concurrency.items()}
+        connector = aiohttp.TCPConnector(limit=sum(self.max_concurrency.values()))
+        self.session = aiohttp.ClientSession(connector=connector,
+                                             timeout=aiohttp.ClientTimeout(total=self.timeout))
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def _get(self, data_provider_name, url, params):
+        """
+        Returns:
+            response (dict or list): parsed json, None if the request failed
+        """
+        async with self.semaphores[data_provider_name]:
+            for attempt in range(self.max_retries + 1):
+                await self.rate_limiters[data_provider_name].acquire_async()
+                try:
+                    async with self.session.get(url, params=params) as response:
+                        if response.status == 200:
+                            return await response.json()
+                        status = response.status
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    status = e
+                if (isinstance(status, int) and status not in self.RETRY_STATUS) or attempt == self.max_retries:
+                    logging.warning(data_provider_name + ": " + str(status) + " " + url)
+                    return None
+                await asyncio.sleep(random.uniform(0, 2 ** attempt))
+
+    async def get_quote(self, symbol):
+        """
+        see Finnhub.finnhub_get_quote
+
+        Returns:
+            quote (dict): None if the request failed
+        """
+        quote = await self._get('Finnhub', self.FINNHUB_URL + '/quote',
+                                {'symbol': symbol, 'token': self.finnhub_token})
+        if quote is not None:
+            quote['datetime_utc'] = datetime.fromtimestamp(quote['t']).strftime('%Y-%m-%d %H:%M:%S')
+        return quote
+
+    async def get_quotes(self, symbols):
+        """
+        Args:
+            symbols (list):
+
+        Returns:
+            quotes (dict): symbol --> quote (see get_quote)
+        """
+        quotes = await asyncio.gather(*[self.get_quote(symbol) for symbol in symbols])
+        return dict(zip(symbols, quotes))
+
+    async def get_symbol_candles(self, symbol, _from, _to, frequency=1, data_provider_name='Finnhub'):
+        """
+        Args:
+            symbol (str): single symbol/stock
+            _from (int): start as seconds since epoch
+            _to (int): end as seconds since epoch
+            frequency (int): candle length in minutes
+            data_provider_name (str): 'Finnhub' or 'TDAmeritrade'
+
+        Returns:
+            candles (np.ndarray): CANDLE_DTYPE array, None if there is no data. Same basis as
+                DataProvider.get_candles (see Adjustments.PROVIDER_BASIS): Finnhub raw, TDAmeritrade split adjusted
+        """
+        if data_provider_name == 'Finnhub':
+            response = await self._get('Finnhub', self.FINNHUB_URL + '/stock/candle',
+                                       {'symbol': symbol, 'resolution': str(frequency), 'from': str(int(_from)),
+                                        'to': str(int(_to)), 'adjusted': 'false', 'token': self.finnhub_token})
+            if response is None or response.get('s') != 'ok':
+                return None
+            return DataProvider.map_finnhub_candles(response)
+
+        if data_provider_name == 'TDAmeritrade':
+            response = await self._get('TDAmeritrade',
+                                       self.TDAMERITRADE_URL + '/marketdata/' + symbol + '/pricehistory',
+                                       {'apikey': self.tda_apikey, 'frequencyType': 'minute',
+                                        'frequency': str(frequency), 'startDate': str(int(_from) * 1000),
+                                        'endDate': str(int(_to) * 1000), 'needExtendedHoursData': 'false'})
+            if response is None or response.get('empty', True):
+                return None
+            return DataProvider.map_tdameritrade_candles(response)
+
+        logging.critical(data_provider_name)
+        raise Exception('Unknown data provider found')
+
+    async def get_candles(self, symbols, _from, _to, frequency=1, data_provider_name='Finnhub'):
+        """
+        Candles of many symbols for the same range, see get_symbol_candles
+
+        Returns:
+            candles (dict): symbol --> CANDLE_DTYPE array or None
+        """
+        candles = await asyncio.gather(*[self.get_symbol_candles(symbol, _from, _to, frequency, data_provider_name)
+                                         for symbol in symbols])
+        return dict(zip(symbols, candles))
+
+    async def get_index_symbols(self, symbol='^NDX'):
+        """
+        see Finnhub.finnhub_get_index_symbols
+        """
+        response = await self._get('Finnhub', self.FINNHUB_URL + '/index/constituents',
+                                   {'symbol': symbol, 'token': self.finnhub_token})
+        return None if response is None else response['constituents']
+
+    async def get_market_status(self, exchange='NASDAQ'):
+        """
+        see Polygon.polygon_get_market_status
+        """
+        response = await self._get('Polygon', self.polygon_base_url + '/v1/marketstatus/now',
+                                   {'apiKey': self.polygon_token})
+        if response is None:
+            return None
+        return str(response['exchanges'][exchange.lower()])
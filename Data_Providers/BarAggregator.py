@@ -0,0 +1,190 @@
+from datetime import datetime
+
+import numpy as np
+
+from Data_Providers.Candles import CANDLE_DTYPE, NEW_YORK, utc_offsets
+
+
+def _minute_of_day(hh_mm):
+    t = datetime.strptime(hh_mm, '%H:%M')
+    return t.hour * 60 + t.minute
+
+
+def resample(candles, frequency, session_start='09:30', session_end='16:00', timezone=NEW_YORK):
+    """
+    Resamples candles (e.g. 1 minute) into frequency minute candles in one vectorized pass
+
+    Candles are aligned to the session start in local time (09:30, 09:45, ... for 15 minutes), candles
+    outside the session are dropped and no candle spans two sessions.
+
+    Args:
+        candles (np.ndarray): CANDLE_DTYPE array sorted by ts, ts is the start of the candle
+        frequency (int): length of the resulting candles in minutes
+        session_start (str): 'HH:MM' local time
+        session_end (str): 'HH:MM' local time
+        timezone (pytz.timezone):
+
+    Returns:
+        candles (np.ndarray): CANDLE_DTYPE array, ts is the start of the candle
+    """
+    open_minute, close_minute = _minute_of_day(session_start), _minute_of_day(session_end)
+    ts = np.asarray(candles['ts'], dtype='<i8')
+    local = ts + utc_offsets(ts, timezone)
+    minute = (local % 86400) // 60
+    in_session = (minute >= open_minute) & (minute < close_minute)
+    candles, ts, local, minute = candles[in_session], ts[in_session], local[in_session], minute[in_session]
+    if len(candles) == 0:
+        return np.empty(0, dtype=CANDLE_DTYPE)
+
+    key = (local // 86400) * 1440 + open_minute + ((minute - open_minute) // frequency) * frequency
+    starts = np.flatnonzero(np.r_[True, key[1:] != key[:-1]])
+    ends = np.r_[starts[1:], len(key)] - 1
+
+    bars = np.empty(len(starts), dtype=CANDLE_DTYPE)
+    # shift the first timestamp of every bucket back to the bucket start
+    bars['ts'] = ts[starts] - (local[starts] - key[starts] * 60)
+    bars['open'] = candles['open'][starts]
+    bars['high'] = np.maximum.reduceat(candles['high'], starts)
+    bars['low'] = np.minimum.reduceat(candles['low'], starts)
+    bars['close'] = candles['close'][ends]
+    bars['volume'] = np.add.reduceat(candles['volume'], starts)
+    return bars
+
+
+def resample_stored(store, provider, symbol, frequencies=(5, 15, 30), start=None, end=None, source_frequency=1):
+    """
+    Derives higher frequency candles from stored candles day by day and writes them into the store
+
+    Args:
+        store (CandleStore):
+        provider (str): data provider name
+        symbol (str): single symbol/stock
+        frequencies (iterable): frequencies in minutes to derive
+        start (str): first day 'YYYY-MM-DD' (inclusive), None for the first stored day
+        end (str): last day 'YYYY-MM-DD' (inclusive), None for the last stored day
+        source_frequency (int): stored frequency to derive from
+
+    Returns:
+        days (int): number of resampled days
+    """
+    count = 0
+    for day, candles in store.iter_days(provider, source_frequency, symbol, start, end):
+        # derived candles have the adjustment of their source
+        fetched = store.fetched(provider, source_frequency, symbol, day)
+        for frequency in frequencies:
+            store.write(provider, frequency, symbol, resample(candles, frequency), fetched=fetched)
+        count += 1
+    return count
+
+
+class BarAggregator:
+    """
+    Incrementally builds candles of several frequencies from a live trade or 1 minute candle stream
+
+    Candles are aligned to the session start in local time (US/Eastern by default), updates outside the
+    session are ignored and no candle spans two sessions. A candle is emitted as soon as an update of a
+    later candle arrives, close_due(now) emits candles whose time is over without waiting for the next
+    update. Updates of an already emitted candle arrive too late and are dropped. Live:
+        stream.add_listener(aggregator.add_trade)
+
+    Args:
+        frequencies (iterable): candle lengths in minutes
+        on_bar (function): on_bar(symbol, frequency, candle) with candle as (ts, open, high, low, close, volume),
+                           None to collect the candles in self.completed
+        session_start (str): 'HH:MM' local time
+        session_end (str): 'HH:MM' local time
+        timezone (pytz.timezone):
+    """
+
+    def __init__(self, frequencies=(1, 5, 15, 30), on_bar=None, session_start='09:30', session_end='16:00',
+                 timezone=NEW_YORK):
+        self.frequencies = tuple(frequencies)
+        self.on_bar = on_bar
+        self.open_minute = _minute_of_day(session_start)
+        self.close_minute = _minute_of_day(session_end)
+        self.timezone = timezone
+
+        self.completed = []
+        self.bars = {}  # (symbol, frequency) --> [key, ts, open, high, low, close, volume]
+        self.emitted = {}  # (symbol, frequency) --> key of the last emitted candle
+        self.offsets = {}  # hour since epoch --> utc offset in seconds
+
+    def _offset(self, ts):
+        hour = ts // 3600
+        offset = self.offsets.get(hour)
+        if offset is None:
+            offset = int(utc_offsets(np.array([hour * 3600]), self.timezone)[0])
+            self.offsets[hour] = offset
+        return offset
+
+    def add_trade(self, trade):
+        """
+        Args:
+            trade (Trade): trade of FinnhubStream
+        """
+        self.add(trade.symbol, trade.ts, trade.price, trade.price, trade.price, trade.price, trade.volume)
+
+    def add_candle(self, symbol, candle):
+        """
+        Args:
+            symbol (str):
+            candle: CANDLE_DTYPE record or (ts, open, high, low, close, volume), ts is the start of the candle
+        """
+        ts, open_, high, low, close, volume = candle
+        self.add(symbol, ts, open_, high, low, close, volume)
+
+    def add(self, symbol, ts, open_, high, low, close, volume):
+        ts = int(ts)
+        local = ts + self._offset(ts)
+        minute = (local % 86400) // 60
+        if minute < self.open_minute or minute >= self.close_minute:
+            return
+        day = (local // 86400) * 1440
+
+        for frequency in self.frequencies:
+            key = day + self.open_minute + ((minute - self.open_minute) // frequency) * frequency
+            if key <= self.emitted.get((symbol, frequency), -1):
+                continue  # late update of an already emitted candle, e.g. after close_due
+            bar = self.bars.get((symbol, frequency))
+            if bar is not None and bar[0] == key:
+                if high > bar[3]:
+                    bar[3] = high
+                if low < bar[4]:
+                    bar[4] = low
+                bar[5] = close
+                bar[6] += volume
+                continue
+            if bar is not None:
+                if key < bar[0]:
+                    continue  # late update of an earlier candle, candles are emitted in order
+                self._emit(symbol, frequency, bar)
+            self.bars[(symbol, frequency)] = [key, ts - (local - key * 60), open_, high, low, close, volume]
+
+    def close_due(self, now):
+        """
+        Emits all candles which ended before now
+
+        Args:
+            now (float): seconds since epoch
+        """
+        for (symbol, frequency), bar in list(self.bars.items()):
+            length = min(frequency, self.close_minute - bar[0] % 1440)
+            if bar[1] + length * 60 <= now:
+                self._emit(symbol, frequency, bar)
+                del self.bars[(symbol, frequency)]
+
+    def flush(self):
+        """
+        Emits all open candles, e.g. at the end of a batch
+        """
+        for (symbol, frequency), bar in list(self.bars.items()):
+            self._emit(symbol, frequency, bar)
+        self.bars.clear()
+
+    def _emit(self, symbol, frequency, bar):
+        self.emitted[(symbol, frequency)] = bar[0]
+        candle = (bar[1], bar[2], bar[3], bar[4], bar[5], bar[6])
+        if self.on_bar is None:
+            self.completed.append((symbol, frequency, candle))
+        else:
+            self.on_bar(symbol, frequency, candle)
@@ -0,0 +1,162 @@
+from datetime import datetime
+
+import numpy as np
+import pytz
+
+# typed candle record: epoch in seconds (UTC) + OHLCV
+CANDLE_DTYPE = np.dtype([('ts', '<i8'),
+                         ('open', '<f8'),
+                         ('high', '<f8'),
+                         ('low', '<f8'),
+                         ('close', '<f8'),
+                         ('volume', '<f8')])
+
+UTC = pytz.timezone('UTC')
+NEW_YORK = pytz.timezone('US/Eastern')
+ZURICH = pytz.timezone('Europe/Zurich')
+
+# timezone name --> {hour since epoch: UTC offset in seconds}, filled by utc_offsets
+_offsets = {}
+
+
+def utc_offsets(ts, timezone):
+    """
+    UTC offset of the timezone at every timestamp
+
+    DST transitions happen on full hours, so the offset is looked up once per distinct hour
+    instead of once per candle, and every hour only once per process.
+
+    Args:
+        ts (np.ndarray): seconds since epoch
+        timezone (pytz.timezone):
+
+    Returns:
+        offsets (np.ndarray): offsets in seconds, same shape as ts
+    """
+    ts = np.asarray(ts, dtype='<i8')
+    hours, inverse = np.unique(ts // 3600, return_inverse=True)
+    known = _offsets.setdefault(timezone.zone, {})
+    offsets = np.empty(len(hours), dtype='<i8')
+    for i, hour in enumerate(hours.tolist()):
+        offset = known.get(hour)
+        if offset is None:
+            offset = known[hour] = int(datetime.fromtimestamp(hour * 3600, timezone).utcoffset().total_seconds())
+        offsets[i] = offset
+    return offsets[inverse.reshape(-1)].reshape(ts.shape)
+
+
+def local_days(ts, timezone=NEW_YORK):
+    """
+    Returns:
+        days (np.ndarray): days since epoch of the local date of every timestamp
+    """
+    ts = np.asarray(ts, dtype='<i8')
+    return (ts + utc_offsets(ts, timezone)) // 86400
+
+
+def format_timestamps(ts, timezone):
+    """
+    Formats all timestamps at once as local time
+
+    Args:
+        ts (np.ndarray): seconds since epoch
+        timezone (pytz.timezone):
+
+    Returns:
+        timestamps (np.ndarray): strings 'YYYY-MM-DD HH:MM:SS'
+    """
+    return TimeView(ts).strings(timezone)
+
+
+class TimeView:
+    """
+    Local times of epoch timestamps, e.g. candles['ts'], rendered in bulk on first access and cached
+    per timezone. Candles only keep the epoch, every other representation is derived here when needed.
+
+        view = TimeView(candles['ts'])
+        view.minutes(NEW_YORK)  --> minute of the day in New York, e.g. for a session filter
+        view.strings(ZURICH)    --> 'YYYY-MM-DD HH:MM:SS' in Zurich
+
+    Args:
+        ts (np.ndarray): seconds since epoch
+    """
+
+    def __init__(self, ts):
+        self.ts = np.asarray(ts, dtype='<i8')
+        self.cache = {}
+
+    def _cached(self, name, timezone, compute):
+        key = (name, timezone.zone)
+        if key not in self.cache:
+            self.cache[key] = compute()
+        return self.cache[key]
+
+    def local(self, timezone=NEW_YORK):
+        """
+        Returns:
+            local (np.ndarray): local time as seconds since epoch
+        """
+        return self._cached('local', timezone, lambda: self.ts + utc_offsets(self.ts, timezone))
+
+    def days(self, timezone=NEW_YORK):
+        """
+        Returns:
+            days (np.ndarray): days since epoch of the local date
+        """
+        return self._cached('days', timezone, lambda: self.local(timezone) // 86400)
+
+    def minutes(self, timezone=NEW_YORK):
+        """
+        Returns:
+            minutes (np.ndarray): local minute of the day (0 - 1439)
+        """
+        return self._cached('minutes', timezone, lambda: self.local(timezone) % 86400 // 60)
+
+    def strings(self, timezone=NEW_YORK):
+        """
+        Returns:
+            timestamps (np.ndarray): strings 'YYYY-MM-DD HH:MM:SS'
+        """
+        return self._cached('strings', timezone, lambda: np.char.replace(
+            np.datetime_as_string(self.local(timezone).astype('datetime64[s]'), unit='s'), 'T', ' '))
+
+    def dates(self, timezone=NEW_YORK):
+        """
+        Returns:
+            dates (np.ndarray): strings 'YYYY-MM-DD'
+        """
+        return self._cached('dates', timezone, lambda: self.strings(timezone).astype('U10'))
+
+    def times(self, timezone=NEW_YORK):
+        """
+        Returns:
+            times (np.ndarray): strings 'HH:MM:SS'
+        """
+        return self._cached('times', timezone, lambda: np.array([s[11:] for s in self.strings(timezone).tolist()],
+                                                                dtype='U8'))
+
+
+def to_dicts(candles, symbol, frequency):
+    """
+    Expands a CANDLE_DTYPE array into one dict per candle, incl. formatted UTC/New York/Zurich times.
+    Only for exports which need the strings, keep the array otherwise (48 bytes per candle).
+
+    Returns:
+        candles (list): dicts with ts, ts_utc, ts_ny, ts_zurich, symbol, frequency, open, high, low, close, volume
+    """
+    view = TimeView(candles['ts'])
+    ts_utc = view.strings(UTC)
+    ts_ny = view.strings(NEW_YORK)
+    ts_zurich = view.strings(ZURICH)
+    return [{"ts": int(candle['ts']),
+             "ts_utc": str(utc),
+             "ts_ny": str(ny),
+             "ts_zurich": str(zurich),
+             "symbol": symbol,
+             "frequency": frequency,
+             "open": float(candle['open']),
+             "high": float(candle['high']),
+             "low": float(candle['low']),
+             "close": float(candle['close']),
+             "volume": float(candle['volume'])}
+            for candle, utc, ny, zurich in zip(candles, ts_utc, ts_ny, ts_zurich)]
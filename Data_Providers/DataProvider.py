@@ -1,10 +1,22 @@
-from datetime import datetime
-import pytz
+import logging
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
+
+import numpy as np
+from Data_Providers.Candles import CANDLE_DTYPE, to_dicts
+from Data_Providers.HttpSession import HttpSession
+from Data_Providers.ResponseCache import ResponseCache
 from Data_Providers.TDAmeritrade import TDAmeritrade
 from Data_Providers.FinnHub import Finnhub
 from Data_Providers.Polygon import Polygon
+from Data_Providers.RateLimiter import RateLimiter
 import pprint
 
+# latest price of a symbol, ts in seconds since epoch, age in seconds, source: 'stream', 'TDAmeritrade' or 'Finnhub'
+LatestPrice = namedtuple('LatestPrice', ['price', 'ts', 'age', 'source'])
+
 
 class DataProvider(TDAmeritrade, Finnhub, Polygon):
     """
@@ -16,50 +28,214 @@ class DataProvider(TDAmeritrade, Finnhub, Polygon):
         Polygon         https://polygon.io
     """
 
-    def __init__(self):
-        TDAmeritrade.__init__(self)
+    def __init__(self, response_cache=None, http_session=None):
+        """
+
+        Args:
+            response_cache (ResponseCache): cache shared by all data providers, default in-memory LRU
+            http_session (HttpSession): pooled session shared by the REST data providers
+        """
+        http_session = http_session if http_session is not None else HttpSession()
+        TDAmeritrade.__init__(self, http_session=http_session)
         Finnhub.__init__(self)
-        Polygon.__init__(self)
+        Polygon.__init__(self, http_session=http_session)
+        self.response_cache = response_cache if response_cache is not None else ResponseCache()
+        self.finnhub_rate_limiter = RateLimiter(Finnhub.FINNHUB_RATE_LIMITS)
 
     @staticmethod
-    def map_finnhub_response(response_finnhub, symbol, frequency):
+    def rate_limits(data_provider_name):
         """
 
         Args:
-            response_finnhub:
-            symbol:
-            frequency:
+            data_provider_name (str): 'TDAmeritrade', 'Finnhub' or 'Polygon'
+
+        Returns:
+            limits (list): documented rate limits of the data provider as (calls, period in seconds)
+        """
+        if data_provider_name == 'TDAmeritrade':
+            return TDAmeritrade.TDAMERITRADE_RATE_LIMITS
+        if data_provider_name == 'Finnhub':
+            return Finnhub.FINNHUB_RATE_LIMITS
+        if data_provider_name == 'Polygon':
+            return Polygon.POLYGON_RATE_LIMITS
+        logging.critical(data_provider_name)
+        raise Exception('Unknown data provider found')
+
+    def get_candles(self, data_provider_name, symbol, frequency, _from, _to):
+        """
+        Fetches the candles of a single symbol as typed array
+
+        Args:
+            data_provider_name (str): 'TDAmeritrade' or 'Finnhub'
+            symbol (str): single symbol/stock
+            frequency (int): candle length in minutes (1, 5, 15, 30)
+            _from: start as seconds since epoch (Finnhub) or datetime (TDAmeritrade)
+            _to: end as seconds since epoch (Finnhub) or datetime (TDAmeritrade)
+
+        Returns:
+            candles (np.ndarray): CANDLE_DTYPE array, None if the data provider returned no data.
+                Finnhub prices are unadjusted, TDAmeritrade returns split adjusted prices
+
+        Raises:
+            Exception: if the request failed, e.g. requests.HTTPError, so that ExportEngine retries it and does not
+                record the range as fetched
+        """
+        if data_provider_name == 'Finnhub':
+            # unadjusted, adjusted when read, see Data_Store.Adjustments
+            resp = self.finnhub_get_stock_candles(symbol=symbol, _from=_from, _to=_to, resolution=frequency,
+                                                  adjusted=False)
+            if resp is None:
+                return None
+            return self.map_finnhub_candles(resp)
+
+        if data_provider_name == 'TDAmeritrade':
+            if frequency not in self.TDAMERITRADE_MINUTE_FREQUENCIES:
+                logging.critical(frequency)
+                raise Exception('Unknown frequency found')
+            resp = self.tdameritrade_client_get_price_history(symbol=symbol,
+                                                              period_type=None,
+                                                              period=None,
+                                                              frequency_type='MINUTE',
+                                                              startDate=_from,
+                                                              endDate=_to,
+                                                              frequency=self.TDAMERITRADE_MINUTE_FREQUENCIES[frequency],
+                                                              raise_errors=True)
+            if resp is None:
+                return None
+            return self.map_tdameritrade_candles(resp)
+
+        logging.critical(data_provider_name)
+        raise Exception('Unknown data provider found')
+
+    def get_latest_prices(self, symbols, max_age=60.0, max_workers=8):
+        """
+        Latest prices of many symbols with as few requests as possible
+
+            1. trade table of the Finnhub trade websocket, if it is running (no request)
+            2. TDAmeritrade quotes of all symbols still missing or older than max_age (one request)
+            3. Finnhub quotes of the symbols still missing, concurrently within the Finnhub rate limits
+
+        Args:
+            symbols (list):
+            max_age (float): max. age in seconds of a price before the next source is asked
+            max_workers (int): max. concurrent Finnhub requests
 
         Returns:
+            prices (dict): symbol --> LatestPrice (the freshest one found), None if no source knows the symbol
+        """
+        now = time.time()
+        prices = {}
+
+        def add(symbol, price, ts, source):
+            if price and (symbol not in prices or ts > prices[symbol].ts):
+                prices[symbol] = LatestPrice(float(price), ts, max(0.0, now - ts), source)
+
+        def missing():
+            return [symbol for symbol in symbols if symbol not in prices or prices[symbol].age > max_age]
+
+        stream = self.finnhub_trade_stream
+        if stream is not None:
+            for symbol in symbols:
+                trade = stream.last_trade(symbol)
+                if trade is not None:
+                    add(symbol, trade.price, trade.ts, 'stream')
+
+        if missing():
+            quotes = self.tdameritrade_get_quotes(missing()) or {}
+            for symbol, quote in quotes.items():
+                add(symbol, quote.get('lastPrice'), quote.get('tradeTimeInLong', 0) / 1000, 'TDAmeritrade')
+
+        def finnhub_quote(symbol):
+            self.finnhub_rate_limiter.acquire()
+            try:
+                return symbol, self.finnhub_get_quote(symbol)
+            except Exception as e:
+                logging.warning(e)
+                return symbol, None
+
+        if missing():
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                for symbol, quote in executor.map(finnhub_quote, missing()):
+                    if quote is not None:
+                        add(symbol, quote.get('c'), quote.get('t', 0), 'Finnhub')
+
+        for symbol in missing():
+            logging.warning("latest price of " + symbol + " is " +
+                            ("missing" if symbol not in prices else str(round(prices[symbol].age)) + "s old"))
+        return {symbol: prices.get(symbol) for symbol in symbols}
 
+    def get_latest_price(self, symbols, max_age=60.0):
+        """
+        see get_latest_prices
+
+        Returns:
+            prices (dict): symbol --> latest price (float), None if unknown
+        """
+        return {symbol: None if price is None else price.price
+                for symbol, price in self.get_latest_prices(symbols, max_age=max_age).items()}
+
+    @staticmethod
+    def map_finnhub_candles(response_finnhub):
+        """
+        Converts a whole Finnhub candle response into a typed array in one pass
+
+        Args:
+            response_finnhub (dict of list): response of finnhub_get_stock_candles
+
+        Returns:
+            candles (np.ndarray): CANDLE_DTYPE array, ts in seconds since epoch
         """
         # check len of all response objects is equal
         assert len(response_finnhub['t']) == len(response_finnhub['o']) == len(response_finnhub['h']) \
-               == len(response_finnhub['c']) == len(response_finnhub['v'])
-
-        candles = []
-        for i in range(0, len(response_finnhub['t'])):
-            candle = {
-                "ts": response_finnhub['t'][i],
-                "ts_utc": datetime.fromtimestamp(response_finnhub['t'][i], pytz.timezone('UTC')).strftime(
-                    '%Y-%m-%d %H:%M:%S'),
-                "ts_ny": datetime.fromtimestamp(response_finnhub['t'][i], pytz.timezone('US/Eastern')).strftime(
-                    '%Y-%m-%d %H:%M:%S'),
-                "ts_zurich": datetime.fromtimestamp(response_finnhub['t'][i], pytz.timezone('Europe/Zurich')).strftime(
-                    '%Y-%m-%d %H:%M:%S'),
-                "symbol": symbol,
-                "frequency": frequency,
-                "open": response_finnhub['o'][i],
-                "high": response_finnhub['h'][i],
-                "close": response_finnhub['c'][i],
-                "volume": response_finnhub['v'][i]
-            }
-            candles.append(candle)
+               == len(response_finnhub['l']) == len(response_finnhub['c']) == len(response_finnhub['v'])
+
+        candles = np.empty(len(response_finnhub['t']), dtype=CANDLE_DTYPE)
+        candles['ts'] = response_finnhub['t']
+        candles['open'] = response_finnhub['o']
+        candles['high'] = response_finnhub['h']
+        candles['low'] = response_finnhub['l']
+        candles['close'] = response_finnhub['c']
+        candles['volume'] = response_finnhub['v']
         return candles
 
+    @staticmethod
+    def map_tdameritrade_candles(response_tdameritrade):
+        """
+        Converts a whole TDAmeritrade price history response into a typed array in one pass
+
+        Args:
+            response_tdameritrade (dict): response of tdameritrade_client_get_price_history
+
+        Returns:
+            candles (np.ndarray): CANDLE_DTYPE array, ts in seconds since epoch
+        """
+        elements = response_tdameritrade['candles']
+        candles = np.empty(len(elements), dtype=CANDLE_DTYPE)
+        # one column at a time, the response is a list of dicts
+        candles['ts'] = np.fromiter(map(itemgetter('datetime'), elements), dtype='<i8', count=len(elements)) // 1000
+        for column in ('open', 'high', 'low', 'close', 'volume'):
+            candles[column] = np.fromiter(map(itemgetter(column), elements), dtype='<f8', count=len(elements))
+        return candles
+
+    @staticmethod
+    def map_finnhub_response(response_finnhub, symbol, frequency):
+        """
+        Like map_finnhub_candles, but one dict per candle incl. formatted UTC/New York/Zurich times
+
+        Args:
+            response_finnhub:
+            symbol:
+            frequency:
+
+        Returns:
+            candles (list): see Candles.to_dicts
+        """
+        return to_dicts(DataProvider.map_finnhub_candles(response_finnhub), symbol=symbol, frequency=frequency)
+
     @staticmethod
     def map_tdameritrade_response(response_tdameritrade, symbol, frequency):
         """
+        Like map_tdameritrade_candles, but one dict per candle incl. formatted UTC/New York/Zurich times
 
         Args:
             response_tdameritrade:
@@ -67,25 +243,7 @@ class DataProvider(TDAmeritrade, Finnhub, Polygon):
             frequency:
 
         Returns:
-
+            candles (list): see Candles.to_dicts
         """
-        candles = []
-        for element in response_tdameritrade['candles']:
-            candle = {
-                "ts": element['datetime'],
-                "ts_utc": datetime.fromtimestamp(element['datetime'] / 1000, pytz.timezone('UTC')).strftime(
-                    '%Y-%m-%d %H:%M:%S'),
-                "ts_ny": datetime.fromtimestamp(element['datetime'] / 1000, pytz.timezone('US/Eastern')).strftime(
-                    '%Y-%m-%d %H:%M:%S'),
-                "ts_zurich": datetime.fromtimestamp(element['datetime'] / 1000,
-                                                    pytz.timezone('Europe/Zurich')).strftime(
-                    '%Y-%m-%d %H:%M:%S'),
-                "symbol": symbol,
-                "frequency": frequency,
-                "open": element['open'],
-                "high": element['high'],
-                "close": element['close'],
-                "volume": element['volume']
-            }
-            candles.append(candle)
-        return candles
+        return to_dicts(DataProvider.map_tdameritrade_candles(response_tdameritrade), symbol=symbol,
+                        frequency=frequency)
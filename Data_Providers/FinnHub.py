@@ -1,15 +1,17 @@
 import config
 import time
 from datetime import datetime
-from finnhub import Client, exceptions
-import websocket
 import json
 import requests
 import pytz
 import logging
+import threading
 
+from Data_Providers.FinnhubStream import FinnhubStream
+from Data_Providers.ResponseCache import CachedProvider, FOREVER
 
-class Finnhub:
+
+class Finnhub(CachedProvider):
     """
     https://finnhub.io/docs/api#introduction
 
@@ -17,11 +19,27 @@ class Finnhub:
         60 API calls/minute
         30 API calls/ second
         Exceed --> status code 429
+
+    The finnhub client is imported and created on first use
     """
 
+    # documented rate limits as (calls, period in seconds)
+    FINNHUB_RATE_LIMITS = [(60, 60), (30, 1)]
+
     def __init__(self, token=config.FINNHUB_TOKEN):
         self.finnhub_token = token
-        self.finnhub_client = Client(api_key=self.finnhub_token)
+        self.finnhub_client_instance = None
+        self.finnhub_client_lock = threading.Lock()
+        self.finnhub_trade_stream = None
+        self.finnhub_stream_lock = threading.Lock()
+
+    @property
+    def finnhub_client(self):
+        with self.finnhub_client_lock:
+            if self.finnhub_client_instance is None:
+                from finnhub import Client
+                self.finnhub_client_instance = Client(api_key=self.finnhub_token)
+            return self.finnhub_client_instance
 
     @staticmethod
     def finnhub_seconds_since_epoch(dt):
@@ -37,14 +55,27 @@ class Finnhub:
         seconds_passed_since_epoch = int((dt - epoch).total_seconds())
         return seconds_passed_since_epoch
 
-    def finnhub_get_last_trade(self, symbol):
+    def finnhub_stream(self):
+        """
+        Shared long-lived trade websocket, started on first use
+
+        Returns:
+            stream (FinnhubStream):
+        """
+        with self.finnhub_stream_lock:
+            if self.finnhub_trade_stream is None:
+                self.finnhub_trade_stream = FinnhubStream(self.finnhub_token).start()
+            return self.finnhub_trade_stream
+
+    def finnhub_get_last_trade(self, symbol, timeout=5.0):
         """
         last trade (real-time)
         https://finnhub.io/docs/api#websocket-trades
-        short-lived one-off send-receive websocket
+        served from the shared trade websocket, the symbol stays subscribed after the first call
 
         Args:
             symbol (str): single symbol/stock
+            timeout (float): max. seconds to wait for the first trade of a newly subscribed symbol
 
         Returns:
             trade_data (dict):
@@ -54,20 +85,16 @@ class Finnhub:
                 datetime_utc --> datetime representation of the timestamp
                 v --> volume of the single trade
         """
-        ws = websocket.create_connection("wss://ws.finnhub.io?token=" + self.finnhub_token)
-        ws.send(json.dumps({"type": "subscribe", "symbol": symbol}))
-        result = json.loads(ws.recv())
-
-        if 'type' in result:
-            if result['type'] == 'trade':
-                trade_data = result['data'][0]
-                trade_data['t'] = trade_data['t'] / 1000  # convert from timestamp in milliseconds to seconds
-                datetime_utc = datetime.fromtimestamp(trade_data['t']).strftime('%Y-%m-%d %H:%M:%S')
-                trade_data['datetime_utc'] = datetime_utc
-                ws.close()
-                return trade_data
-        ws.close()
-        return None
+        stream = self.finnhub_stream()
+        stream.subscribe(symbol)
+        trade = stream.wait_for_trade(symbol, timeout=timeout)
+        if trade is None:
+            return None
+        return {'p': trade.price,
+                's': trade.symbol,
+                't': trade.ts,
+                'datetime_utc': datetime.fromtimestamp(trade.ts).strftime('%Y-%m-%d %H:%M:%S'),
+                'v': trade.volume}
 
     def finnhub_get_quote(self, symbol):
         """
@@ -91,7 +118,7 @@ class Finnhub:
         quote['datetime_utc'] = datetime.fromtimestamp(quote['t']).strftime('%Y-%m-%d %H:%M:%S')
         return quote
 
-    def finnhub_get_stock_candles(self, symbol, _from, _to, resolution='D'):
+    def finnhub_get_stock_candles(self, symbol, _from, _to, resolution='D', adjusted=True):
         """
         https://finnhub.io/docs/api#stock-candles
 
@@ -100,6 +127,8 @@ class Finnhub:
             _from:
             _to:
             resolution (str): Supported resolution includes 1, 5, 15, 30, 60, D, W, M .
+            adjusted (bool): split/dividend adjusted prices, False for the raw prices kept in the CandleStore
+                             (see Data_Store.Adjustments)
 
         Returns:
             candles (dict of list):
@@ -112,9 +141,14 @@ class Finnhub:
                 s --> Status of the response. This field can either be ok or no_data.
         """
 
-        # adjusted price (in case of stock splits etc.)!
-        response = self.finnhub_client.stock_candles(symbol=symbol, resolution=resolution, _from=_from, to=_to,
-                                                     adjusted=True)
+        # unadjusted candles of closed sessions never change, adjusted ones only until the next split/dividend
+        closed = _to < time.time() - 3600
+        response = self.cached('finnhub/stock/candle',
+                               {'symbol': symbol, 'resolution': resolution, 'from': _from, 'to': _to,
+                                'adjusted': adjusted},
+                               lambda: self.finnhub_client.stock_candles(symbol=symbol, resolution=resolution,
+                                                                         _from=_from, to=_to, adjusted=adjusted),
+                               ttl=0 if not closed else 86400 if adjusted else FOREVER)
         if response['s'] != 'no_data' and response['s'] == 'ok':
             return response
         else:
@@ -136,6 +170,7 @@ class Finnhub:
     def finnhub_get_support_resistance(self, symbol, resolution='D'):
         """
         https://finnhub.io/docs/api#support-resistance
+        see Indicators.Indicators.support_resistance to compute the levels from stored candles instead
 
         Args:
             symbol (str): symbol/stock
@@ -145,11 +180,14 @@ class Finnhub:
             levels (list): Array of support and resistance levels.
 
         """
-        return self.finnhub_client.support_resistance(symbol=symbol, resolution=resolution)
+        return self.cached('finnhub/scan/support-resistance', {'symbol': symbol, 'resolution': resolution},
+                           lambda: self.finnhub_client.support_resistance(symbol=symbol, resolution=resolution),
+                           ttl=3600)
 
     def finnhub_get_aggregate_indicators(self, symbol, resolution='D'):
         """
         https://finnhub.io/docs/api#aggregate-indicator
+        see Indicators.Indicators.aggregate_signal to compute the signal from stored candles instead
 
         Args:
             symbol (str): symbol/stock
@@ -166,7 +204,9 @@ class Finnhub:
                 adx: ADX reading
                 trending: Whether market is trending or going sideway
         """
-        return self.finnhub_client.aggregate_indicator(symbol=symbol, resolution=resolution)
+        return self.cached('finnhub/scan/technical-indicator', {'symbol': symbol, 'resolution': resolution},
+                           lambda: self.finnhub_client.aggregate_indicator(symbol=symbol, resolution=resolution),
+                           ttl=900)
 
     def finnhub_get_index_symbols(self, symbol='^NDX'):
         """
@@ -178,4 +218,6 @@ class Finnhub:
         Returns:
             symbols (dict): all symbols of the specified index
         """
-        return self.finnhub_client.indices_const(symbol=symbol)['constituents']
+        return self.cached('finnhub/index/constituents', {'symbol': symbol},
+                           lambda: self.finnhub_client.indices_const(symbol=symbol),
+                           ttl=86400)['constituents']
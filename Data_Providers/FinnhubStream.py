@@ -0,0 +1,181 @@
+import json
+import logging
+import random
+import threading
+import time
+from collections import namedtuple
+
+import websocket
+
+# last trade of a symbol, ts in seconds since epoch
+Trade = namedtuple('Trade', ['symbol', 'price', 'volume', 'ts'])
+
+
+class FinnhubStream:
+    """
+    Long-lived Finnhub trade websocket shared by many symbols
+    https://finnhub.io/docs/api#websocket-trades
+
+    One background thread holds the connection, (re)subscribes all symbols and reconnects with
+    exponential backoff (plus jitter) if the connection drops or goes silent. The latest trade per symbol
+    is kept in a dict of immutable Trade tuples which is only ever updated by single assignments,
+    so readers never take a lock.
+
+    Args:
+        token (str): Finnhub api token
+        max_backoff (float): max. seconds between two reconnect attempts
+        stale_after (float): reconnect if nothing (not even a ping) was received for that many seconds
+    """
+
+    URL = "wss://ws.finnhub.io?token="
+
+    def __init__(self, token, max_backoff=60, stale_after=60):
+        self.token = token
+        self.max_backoff = max_backoff
+        self.stale_after = stale_after
+
+        self.trades = {}  # symbol --> Trade
+        self.symbols = set()
+        self.symbols_lock = threading.Lock()  # subscriptions vs. the resubscribe on (re)connect
+        self.listeners = []
+        self.ws = None
+        self.send_lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.connected = threading.Event()
+        self.thread = None
+
+    def start(self):
+        if self.thread is None or not self.thread.is_alive():
+            self.stopped.clear()
+            self.thread = threading.Thread(target=self._run, name='FinnhubStream', daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        ws = self.ws
+        if ws is not None:
+            ws.close()
+        if self.thread is not None:
+            self.thread.join()
+
+    def subscribe(self, symbols):
+        """
+        Args:
+            symbols (list or str): symbols to receive trades for, kept across reconnects
+        """
+        if isinstance(symbols, str):
+            symbols = [symbols]
+        with self.symbols_lock:
+            new = [symbol for symbol in symbols if symbol not in self.symbols]
+            self.symbols.update(new)
+            for symbol in new:
+                self._send({"type": "subscribe", "symbol": symbol})
+
+    def unsubscribe(self, symbols):
+        if isinstance(symbols, str):
+            symbols = [symbols]
+        with self.symbols_lock:
+            for symbol in symbols:
+                if symbol in self.symbols:
+                    self.symbols.discard(symbol)
+                    self._send({"type": "unsubscribe", "symbol": symbol})
+
+    def add_listener(self, callback):
+        """
+        Args:
+            callback (function): callback(trade) called on the stream thread for every received Trade
+        """
+        self.listeners.append(callback)
+
+    def last_trade(self, symbol):
+        """
+        Returns:
+            trade (Trade): latest trade of the symbol, None if none was received yet
+        """
+        return self.trades.get(symbol)
+
+    def last_prices(self, symbols):
+        """
+        Returns:
+            prices (dict): symbol --> latest price, None if no trade was received yet
+        """
+        trades = self.trades
+        return {symbol: trades[symbol].price if symbol in trades else None for symbol in symbols}
+
+    def wait_for_trade(self, symbol, timeout=5.0):
+        """
+        Returns:
+            trade (Trade): latest trade of the symbol, waiting up to timeout seconds for the first one
+        """
+        deadline = time.monotonic() + timeout
+        trade = self.trades.get(symbol)
+        while trade is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+            trade = self.trades.get(symbol)
+        return trade
+
+    def _send(self, message):
+        ws = self.ws
+        if ws is None or not self.connected.is_set():
+            return  # sent on (re)connect
+        try:
+            with self.send_lock:
+                ws.send(json.dumps(message))
+        except Exception as e:
+            logging.warning("FinnhubStream send failed: " + str(e))
+
+    def _run(self):
+        attempt = 0
+        while not self.stopped.is_set():
+            try:
+                self.ws = websocket.create_connection(self.URL + self.token, timeout=10)
+                self.ws.settimeout(1.0)
+                # a subscription either lands in this snapshot or is sent by subscribe once connected
+                with self.symbols_lock:
+                    self.connected.set()
+                    symbols = list(self.symbols)
+                    with self.send_lock:
+                        for symbol in symbols:
+                            self.ws.send(json.dumps({"type": "subscribe", "symbol": symbol}))
+                logging.info("FinnhubStream connected, " + str(len(symbols)) + " symbols")
+                attempt = 0
+                self._receive()
+            except Exception as e:
+                if not self.stopped.is_set():
+                    logging.warning("FinnhubStream disconnected: " + str(e))
+            finally:
+                self.connected.clear()
+                if self.ws is not None:
+                    self.ws.close()
+                    self.ws = None
+
+            if not self.stopped.is_set():
+                backoff = min(self.max_backoff, 2 ** attempt) * random.uniform(0.5, 1.0)
+                attempt += 1
+                self.stopped.wait(backoff)
+
+    def _receive(self):
+        last_message = time.monotonic()
+        while not self.stopped.is_set():
+            try:
+                message = self.ws.recv()
+            except websocket.WebSocketTimeoutException:
+                if time.monotonic() - last_message > self.stale_after:
+                    raise Exception("no message for " + str(self.stale_after) + "s")
+                continue
+            last_message = time.monotonic()
+            if not message:
+                raise Exception("connection closed")
+
+            result = json.loads(message)
+            if result.get('type') != 'trade':
+                continue
+            for element in result['data']:
+                # convert from timestamp in milliseconds to seconds
+                trade = Trade(element['s'], element['p'], element['v'], element['t'] / 1000)
+                previous = self.trades.get(trade.symbol)
+                if previous is None or previous.ts <= trade.ts:
+                    self.trades[trade.symbol] = trade
+                for callback in self.listeners:
+                    callback(trade)
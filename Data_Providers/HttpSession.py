@@ -0,0 +1,50 @@
+import random
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class JitteredRetry(Retry):
+    """
+    urllib3 Retry with full jitter, i.e. a random backoff between 0 and the exponential backoff
+    """
+
+    def get_backoff_time(self):
+        backoff = super().get_backoff_time()
+        return random.uniform(0, backoff) if backoff > 0 else 0
+
+
+class HttpSession(requests.Session):
+    """
+    Pooled keep-alive session shared by the REST data providers
+
+    Connections are reused across requests (no DNS/TCP/TLS setup per call), responses are gzip
+    compressed and requests answered with 429 or 5xx are retried with jittered exponential backoff,
+    honoring the Retry-After header. After the last retry the last response is returned as is.
+
+    Args:
+        pool_size (int): max. number of kept-alive connections per host, should be >= the number of threads
+        retries (int): max. number of retries per request
+        backoff_factor (float): backoff of the n-th retry is random(0, backoff_factor * 2 ** (n - 1)) seconds
+        timeout (float): default timeout of a request in seconds
+    """
+
+    RETRY_STATUS = (429, 500, 502, 503, 504)
+
+    def __init__(self, pool_size=10, retries=3, backoff_factor=0.5, timeout=10):
+        super().__init__()
+        self.timeout = timeout
+        retry = JitteredRetry(total=retries,
+                              backoff_factor=backoff_factor,
+                              status_forcelist=self.RETRY_STATUS,
+                              respect_retry_after_header=True,
+                              raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+        self.headers.update({'Accept-Encoding': 'gzip, deflate', 'Connection': 'keep-alive'})
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return super().request(method, url, **kwargs)
@@ -1,10 +1,12 @@
 import config
-import requests
 from requests.exceptions import HTTPError
 from datetime import date
 
+from Data_Providers.HttpSession import HttpSession
+from Data_Providers.ResponseCache import CachedProvider, FOREVER
 
-class Polygon:
+
+class Polygon(CachedProvider):
     """
     https://polygon.io/docs/#getting-started
 
@@ -15,9 +17,59 @@ class Polygon:
 
     """
 
-    def __init__(self, token=config.POLYGON_TOKEN, base_url=config.POLYGON_BASE_URL):
+    # documented rate limits as (calls, period in seconds)
+    POLYGON_RATE_LIMITS = [(1, 1)]
+
+    def __init__(self, token=config.POLYGON_TOKEN, base_url=config.POLYGON_BASE_URL, http_session=None):
         self.polygon_token = token
         self.polygon_base_url = base_url
+        self.http_session = http_session if http_session is not None else HttpSession()
+
+    def polygon_get(self, endpoint, ttl):
+        """
+        GET request through the response cache
+
+        Args:
+            endpoint (str): path of the endpoint
+            ttl (float): seconds to cache the response
+
+        Returns:
+            response (dict or list): parsed json, None if the status code is not 200
+        """
+
+        def fetch():
+            response = self.http_session.get(self.polygon_base_url + endpoint, params={'apiKey': self.polygon_token})
+            if response.status_code == 200:
+                return response.json()
+            return None
+
+        return self.cached('polygon' + endpoint, {}, fetch, ttl=ttl)
+
+    def polygon_get_stream(self, endpoint, chunk_size=65536):
+        """
+        GET request bypassing the response cache, the body is returned in chunks as it arrives
+
+        Args:
+            endpoint (str): path of the endpoint
+            chunk_size (int): max. bytes per chunk
+
+        Returns:
+            chunks (generator): bytes of the body, None if the status code is not 200,
+                the response is closed when the generator is exhausted or closed (e.g. contextlib.closing)
+        """
+        response = self.http_session.get(self.polygon_base_url + endpoint, params={'apiKey': self.polygon_token},
+                                         stream=True)
+        if response.status_code != 200:
+            response.close()
+            return None
+
+        def chunks():
+            try:
+                yield from response.iter_content(chunk_size=chunk_size)
+            finally:
+                response.close()
+
+        return chunks()
 
     def polygon_get_market_status(self, exchange='NASDAQ'):
         """
@@ -30,10 +82,8 @@ class Polygon:
         Returns:
             object (str): string specifying the market status ('open', 'extended-hours', 'closed')
         """
-        endpoint = '/v1/marketstatus/now'
-        response = requests.get(self.polygon_base_url + endpoint, params={'apiKey': self.polygon_token})
-        if response.status_code == 200:
-            resp = response.json()
+        resp = self.polygon_get('/v1/marketstatus/now', ttl=60)
+        if resp is not None:
             if exchange == 'NASDAQ':
                 return str(resp['exchanges']['nasdaq'])
             if exchange == 'NYSE':
@@ -41,16 +91,63 @@ class Polygon:
         else:
             return None
 
-    def polygon_get_us_stocks_candles_for_date(self, _date=date.today().strftime('%Y-%m-%d')):
+    def polygon_get_us_stocks_candles_for_date(self, _date=None):
         """
         https://polygon.io/docs/#get_v2_aggs_grouped_locale__locale__market__market___date__anchor
 
+        Args:
+            _date (str): 'YYYY-MM-DD', default today
+
         Returns:
-            response (dict): see url
+            response (dict): see url, None if the request failed
         """
-        endpoint = '/v2/aggs/grouped/locale/US/market/STOCKS/' + _date
-        response = requests.get(self.polygon_base_url + endpoint, params={'apiKey': self.polygon_token})
-        return response.json()
+        _date = _date or date.today().strftime('%Y-%m-%d')
+        # aggregates of past days never change
+        return self.polygon_get('/v2/aggs/grouped/locale/US/market/STOCKS/' + _date,
+                                ttl=FOREVER if _date < date.today().strftime('%Y-%m-%d') else 300)
+
+    def polygon_get_splits(self, symbol):
+        """
+        All splits of a symbol
+        https://polygon.io/docs/#get_v2_reference_splits__symbol__anchor
+
+        Returns:
+            splits (list): dicts with exDate, ratio (old/new shares), tofactor, forfactor, None if the request failed
+        """
+        resp = self.polygon_get('/v2/reference/splits/' + symbol, ttl=86400)
+        return resp.get('results', []) if resp is not None else None
+
+    def polygon_get_dividends(self, symbol):
+        """
+        All cash dividends of a symbol
+        https://polygon.io/docs/#get_v2_reference_dividends__symbol__anchor
+
+        Returns:
+            dividends (list): dicts with exDate and amount (per share), None if the request failed
+        """
+        resp = self.polygon_get('/v2/reference/dividends/' + symbol, ttl=86400)
+        return resp.get('results', []) if resp is not None else None
+
+    def polygon_get_market_holidays(self, exchange='NASDAQ'):
+        """
+        Upcoming days on which the market is closed the whole day
+        https://polygon.io/docs/#get_v1_marketstatus_upcoming_anchor
+
+        Args:
+            exchange (str): 'NASDAQ' or 'NYSE'
+
+        Returns:
+            holidays (list): dates as 'YYYY-MM-DD', None if the request failed
+        """
+        resp = self.polygon_get('/v1/marketstatus/upcoming', ttl=86400)
+        if resp is not None:
+            holidays = []
+            for element in resp:
+                if element.get('exchange') == exchange and element.get('status', 'closed') == 'closed':
+                    holidays.append(str(element['date']))
+            return holidays
+        else:
+            return None
 
     def polygon_market_holiday(self, exchange='NASDAQ'):
         """
@@ -65,10 +162,8 @@ class Polygon:
                 True if today is a market holiday
                 False if today is not a market holiday
         """
-        endpoint = '/v1/marketstatus/upcoming'
-        response = requests.get(self.polygon_base_url + endpoint, params={'apiKey': self.polygon_token})
-        if response.status_code == 200:
-            resp = response.json()
+        resp = self.polygon_get('/v1/marketstatus/upcoming', ttl=86400)
+        if resp is not None:
             holidays = []
             for element in resp:
                 if 'exchange' in element and 'date' in element:
@@ -0,0 +1,115 @@
+import asyncio
+import threading
+import time
+from collections import deque
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at calls/period tokens per second
+
+    Args:
+        calls (int): number of calls allowed per period
+        period (float): length of the period in seconds
+        capacity (float): max. number of tokens the bucket can hold (burst size), defaults to calls
+    """
+
+    def __init__(self, calls, period, capacity=None):
+        self.rate = float(calls) / float(period)
+        self.capacity = float(calls) if capacity is None else max(1.0, float(capacity))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self):
+        """
+        Returns:
+            seconds (float): time until the next token is available, 0.0 if one is available now
+        """
+        if self.tokens >= 1.0:
+            return 0.0
+        return (1.0 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """
+    Thread-safe rate limiter combining one token bucket per documented API limit
+
+    A call is only allowed if every bucket holds a token, i.e. all limits are respected at once.
+    The burst of the longer windows is capped to what they refill within the shortest window, so a
+    sliding window never sees more calls than documented (minus the headroom).
+
+    Args:
+        limits (list): (calls, period in seconds) pairs, e.g. [(60, 60), (30, 1)] for 60/min and 30/s
+        headroom (float): fraction of the documented rate to actually use
+    """
+
+    def __init__(self, limits, headroom=0.95):
+        shortest_period = min(period for calls, period in limits)
+        self.buckets = []
+        for calls, period in limits:
+            calls = calls * headroom
+            capacity = calls if period == shortest_period else calls / period * shortest_period
+            self.buckets.append(TokenBucket(calls, period, capacity=capacity))
+
+        self.lock = threading.Lock()
+        self.total_requests = 0
+        self.recent = deque()  # monotonic timestamps of the calls within the last minute
+
+    def try_acquire(self):
+        """
+        Takes a token from every bucket if all of them have one
+
+        Returns:
+            wait (float): 0.0 if the call is allowed, otherwise seconds to wait before trying again
+        """
+        with self.lock:
+            now = time.monotonic()
+            for bucket in self.buckets:
+                bucket.refill(now)
+            wait = max(bucket.wait_time() for bucket in self.buckets)
+            if wait > 0.0:
+                return wait
+            for bucket in self.buckets:
+                bucket.tokens -= 1.0
+            self.total_requests += 1
+            self.recent.append(now)
+            self._prune(now)
+            return 0.0
+
+    def _prune(self, now):
+        # called under the lock, keeps recent bounded also if request_rate is never read
+        horizon = now - 60.0
+        while self.recent and self.recent[0] < horizon:
+            self.recent.popleft()
+
+    def acquire(self):
+        """
+        Blocks until a call is allowed by all limits
+        """
+        wait = self.try_acquire()
+        while wait > 0.0:
+            time.sleep(wait)
+            wait = self.try_acquire()
+
+    async def acquire_async(self):
+        """
+        Like acquire, but waits without blocking the event loop
+        """
+        wait = self.try_acquire()
+        while wait > 0.0:
+            await asyncio.sleep(wait)
+            wait = self.try_acquire()
+
+    @property
+    def request_rate(self):
+        """
+        Returns:
+            rate (float): achieved requests per minute over the last 60 seconds
+        """
+        with self.lock:
+            self._prune(time.monotonic())
+            return float(len(self.recent))
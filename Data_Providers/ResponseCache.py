@@ -0,0 +1,173 @@
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# ttl of responses which never change, e.g. candles of closed sessions
+FOREVER = None
+
+
+class MemoryCache:
+    """
+    Thread-safe in-memory LRU cache
+
+    Args:
+        max_entries (int): least recently used entries are evicted above that number
+        max_bytes (int): least recently used entries are evicted above that size (pickled size of the values),
+                         values larger than a quarter of it are not cached
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key --> (expires, value, size)
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Returns:
+            entry (tuple): (expires, value), None if the key is missing or expired
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] is not None and entry[0] < time.time():
+                del self.entries[key]
+                self.size -= entry[2]
+                return None
+            self.entries.move_to_end(key)
+            return entry[:2]
+
+    def set(self, key, value, expires):
+        size = len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        if size > self.max_bytes // 4:
+            return
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.size -= previous[2]
+            self.entries[key] = (expires, value, size)
+            self.size += size
+            while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+                self.size -= self.entries.popitem(last=False)[1][2]
+
+
+class SqliteCache:
+    """
+    Thread-safe on-disk cache in a single SQLite file, values are pickled
+
+    Args:
+        filename (str): path of the SQLite file, created if it does not exist
+        max_entries (int): least recently used entries are evicted above that size
+    """
+
+    def __init__(self, filename, max_entries=100000):
+        self.max_entries = max_entries
+        directory = os.path.dirname(filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(filename, check_same_thread=False)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS cache '
+                                '(key TEXT PRIMARY KEY, expires REAL, accessed REAL, value BLOB)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)')
+        self.connection.commit()
+
+    def get(self, key):
+        with self.lock:
+            row = self.connection.execute('SELECT expires, value FROM cache WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            if row[0] is not None and row[0] < now:
+                self.connection.execute('DELETE FROM cache WHERE key = ?', (key,))
+                self.connection.commit()
+                return None
+            self.connection.execute('UPDATE cache SET accessed = ? WHERE key = ?', (now, key))
+            self.connection.commit()
+            return row[0], pickle.loads(row[1])
+
+    def set(self, key, value, expires):
+        with self.lock:
+            self.connection.execute('INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)',
+                                    (key, expires, time.time(), pickle.dumps(value)))
+            count = self.connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+            if count > self.max_entries:
+                self.connection.execute('DELETE FROM cache WHERE key IN '
+                                        '(SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+                                        (count - self.max_entries,))
+            self.connection.commit()
+
+
+class ResponseCache:
+    """
+    Cache of data provider responses keyed by endpoint and params
+
+    Lookups go through the backends in order (e.g. memory, then disk), hits of a later backend are copied
+    into the earlier ones. Every call site passes a default ttl for its endpoint which can be overridden
+    per endpoint via ttls.
+
+    Args:
+        backends (list): MemoryCache/SqliteCache objects, default in-memory only
+        ttls (dict): endpoint --> ttl in seconds (FOREVER to never expire, 0 to disable caching)
+    """
+
+    def __init__(self, backends=None, ttls=None):
+        self.backends = backends if backends is not None else [MemoryCache()]
+        self.ttls = ttls if ttls is not None else {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(endpoint, params):
+        return endpoint + ' ' + json.dumps(params, sort_keys=True, default=str)
+
+    def get_or_fetch(self, endpoint, params, fetch, ttl):
+        """
+        Args:
+            endpoint (str): name of the endpoint, e.g. 'finnhub/quote'
+            params (dict): all params which influence the response
+            fetch (function): fetch() --> response, None responses are not cached
+            ttl (float): default ttl of the endpoint in seconds, FOREVER to never expire, 0 to disable caching
+
+        Returns:
+            response: cached or fetched response
+        """
+        ttl = self.ttls.get(endpoint, ttl)
+        if ttl == 0:
+            return fetch()
+
+        key = self.key(endpoint, params)
+        for i, backend in enumerate(self.backends):
+            entry = backend.get(key)
+            if entry is not None:
+                self.hits += 1
+                for earlier in self.backends[:i]:
+                    earlier.set(key, entry[1], entry[0])
+                return entry[1]
+
+        self.misses += 1
+        value = fetch()
+        if value is not None:
+            expires = None if ttl is FOREVER else time.time() + ttl
+            for backend in self.backends:
+                backend.set(key, value, expires)
+        return value
+
+
+class CachedProvider:
+    """
+    Base of the data provider mixins, routes their calls through self.response_cache (None disables caching)
+    """
+
+    response_cache = None
+
+    def cached(self, endpoint, params, fetch, ttl):
+        if self.response_cache is None:
+            return fetch()
+        return self.response_cache.get_or_fetch(endpoint, params, fetch, ttl)
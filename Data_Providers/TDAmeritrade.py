@@ -1,16 +1,17 @@
 import config
 import logging
-import requests
 import json
-from requests.exceptions import HTTPError
-from datetime import datetime
-import pytz
-from tda import auth
-from tda.client import Client as TDA_CLIENT
+from requests.exceptions import HTTPError, RequestException
+from datetime import datetime, timedelta
 import os
+import threading
 
+from Data_Providers.Candles import TimeView, NEW_YORK, ZURICH
+from Data_Providers.HttpSession import HttpSession
+from Data_Providers.ResponseCache import CachedProvider, FOREVER
 
-class TDAmeritrade:
+
+class TDAmeritrade(CachedProvider):
     """
     https://developer.tdameritrade.com/apis
 
@@ -22,25 +23,51 @@ class TDAmeritrade:
         https://github.com/alexgolec/tda-api
         https://tda-api.readthedocs.io/en/stable/
 
+    tda-api is imported and the client logged in (possibly with the selenium login flow) on first use of
+    tda_client, the REST endpoints only need the api key
     """
 
-    def __init__(self, api_key=config.TDA_API_KEY, token_path=config.TDA_TOKEN_PATH, redirect=config.TDA_REDIRECT_URI):
+    # documented rate limits as (calls, period in seconds)
+    TDAMERITRADE_RATE_LIMITS = [(120, 60), (2, 1)]
+
+    # candle length in minutes --> name of the tda-api frequency of the price history endpoint
+    TDAMERITRADE_MINUTE_FREQUENCIES = {
+        1: 'EVERY_MINUTE',
+        5: 'EVERY_FIVE_MINUTES',
+        15: 'EVERY_FIFTEEN_MINUTES',
+        30: 'EVERY_THIRTY_MINUTES'
+    }
+
+    def __init__(self, api_key=config.TDA_API_KEY, token_path=config.TDA_TOKEN_PATH, redirect=config.TDA_REDIRECT_URI,
+                 http_session=None):
         self.tda_apikey = api_key
         self.tda_token_path = token_path
         self.tda_redirect = redirect
+        self.http_session = http_session if http_session is not None else HttpSession()
+        self.tda_client_instance = None
+        self.tda_client_lock = threading.Lock()
 
-        try:
-            self.tda_client = auth.client_from_token_file(config.TDA_TOKEN_PATH, self.tda_apikey)
-        except FileNotFoundError:
-            from selenium import webdriver
-            chromedriver_path = os.path.dirname(os.path.abspath(__file__)) + '\..\chromedriver.exe'
-            print(chromedriver_path)
-            options = webdriver.ChromeOptions()
-            with webdriver.Chrome(executable_path=chromedriver_path, chrome_options=options) as driver:
-                self.tda_client = auth.client_from_login_flow(webdriver=driver,
-                                                              api_key=self.tda_apikey,
-                                                              redirect_url=self.tda_redirect,
-                                                              token_path=self.tda_token_path)
+    @property
+    def tda_client(self):
+        """
+        tda-api client, created from the token file or the login flow on first use
+        """
+        with self.tda_client_lock:
+            if self.tda_client_instance is None:
+                from tda import auth
+                try:
+                    self.tda_client_instance = auth.client_from_token_file(self.tda_token_path, self.tda_apikey)
+                except FileNotFoundError:
+                    from selenium import webdriver
+                    chromedriver_path = os.path.dirname(os.path.abspath(__file__)) + '\..\chromedriver.exe'
+                    print(chromedriver_path)
+                    options = webdriver.ChromeOptions()
+                    with webdriver.Chrome(executable_path=chromedriver_path, chrome_options=options) as driver:
+                        self.tda_client_instance = auth.client_from_login_flow(webdriver=driver,
+                                                                               api_key=self.tda_apikey,
+                                                                               redirect_url=self.tda_redirect,
+                                                                               token_path=self.tda_token_path)
+            return self.tda_client_instance
 
     @staticmethod
     def tdameritrade_millis_since_epoch(dt):
@@ -56,13 +83,25 @@ class TDAmeritrade:
         millis_passed_since_epoch = int((dt - epoch).total_seconds() * 1000.0)  # seconds --> milliseconds
         return millis_passed_since_epoch
 
-    def tdameritrade_client_get_price_history(self, symbol='AAPL',
-                                              period_type=TDA_CLIENT.PriceHistory.PeriodType.DAY,
-                                              period=TDA_CLIENT.PriceHistory.Period.ONE_DAY,
-                                              frequency_type=TDA_CLIENT.PriceHistory.FrequencyType.MINUTE,
-                                              frequency=TDA_CLIENT.PriceHistory.Frequency.EVERY_MINUTE,
-                                              startDate=None, endDate=None, need_extended_hours_data=False):
-        try:
+    def tdameritrade_client_get_price_history(self, symbol='AAPL', period_type='DAY', period='ONE_DAY',
+                                              frequency_type='MINUTE', frequency='EVERY_MINUTE',
+                                              startDate=None, endDate=None, need_extended_hours_data=False,
+                                              raise_errors=False):
+        """
+        period_type, period, frequency_type and frequency are tda-api enums (Client.PriceHistory) or their names
+
+        raise_errors: True to raise HTTP errors (e.g. 429, 401, 5xx) instead of returning None, i.e. None
+                      only means that TDAmeritrade confirmed that there is no data
+        """
+        from tda.client import Client as TDA_CLIENT
+        price_history = TDA_CLIENT.PriceHistory
+        period_type = getattr(price_history.PeriodType, period_type) if isinstance(period_type, str) else period_type
+        period = getattr(price_history.Period, period) if isinstance(period, str) else period
+        frequency_type = getattr(price_history.FrequencyType, frequency_type) \
+            if isinstance(frequency_type, str) else frequency_type
+        frequency = getattr(price_history.Frequency, frequency) if isinstance(frequency, str) else frequency
+
+        def fetch():
             response = self.tda_client.get_price_history(symbol=symbol,
                                                          period_type=period_type,
                                                          period=period,
@@ -71,20 +110,52 @@ class TDAmeritrade:
                                                          start_datetime=startDate,
                                                          end_datetime=endDate,
                                                          need_extended_hours_data=need_extended_hours_data)
-
             response.raise_for_status()
-            content = json.loads(response.content)
+            return json.loads(response.content)
+
+        # candles of closed sessions never change
+        closed = endDate is not None and endDate < datetime.now() - timedelta(hours=1)
+        try:
+            content = self.cached('tdameritrade/pricehistory',
+                                  {'symbol': symbol, 'period_type': period_type, 'period': period,
+                                   'frequency_type': frequency_type, 'frequency': frequency,
+                                   'start': startDate, 'end': endDate, 'extended_hours': need_extended_hours_data},
+                                  fetch, ttl=FOREVER if closed else 0)
             if content['empty']:
                 logging.warning('TDAmeritrade: no Data for ' + str(startDate))
                 return None
             return content
         except HTTPError as http_err:
+            if raise_errors:
+                raise
             logging.warning(f'HTTP error occurred: {http_err}')
             return None
 
+    def tdameritrade_get_quotes(self, symbols):
+        """
+        Quotes of many symbols in a single request (real-time with a logged in account, delayed otherwise)
+        https://developer.tdameritrade.com/quotes/apis/get/marketdata/quotes
+
+        Args:
+            symbols (list):
+
+        Returns:
+            quotes (dict): symbol --> quote (lastPrice, tradeTimeInLong in milliseconds since epoch, ...),
+                None if the request failed
+        """
+        try:
+            response = self.http_session.get(url='https://api.tdameritrade.com/v1/marketdata/quotes',
+                                             params={'apikey': self.tda_apikey, 'symbol': ','.join(symbols)})
+            response.raise_for_status()
+            return json.loads(response.content)
+        except RequestException as request_err:
+            # HTTP errors, timeouts and connection errors, the caller falls back to another provider
+            logging.warning(f'Request error occurred: {request_err}')
+            return None
+
     def tdameritrade_get_price_history(self, symbol='AAPL', periodType='day', period=10, frequencyType='minute',
                                        frequency=1,
-                                       startDate=None, endDate=None, extended_hours=False):
+                                       startDate=None, endDate=None, extended_hours=False, local_times=False):
         """
         https://developer.tdameritrade.com/price-history/apis/get/marketdata/%7Bsymbol%7D/pricehistory
 
@@ -96,7 +167,8 @@ class TDAmeritrade:
         :param startDate : Start date as milliseconds since epoch. Only startDate or period.
         :param endDate: End date as milliseconds since epoch. Only endDate or period.
         :param extended_hours: true to return extended hours data, false for regular market hours only. Default is true
-
+        :param local_times: true to add timestamp, day and time in New York and Zurich (..._zurich) to every candle,
+                            otherwise use Candles.TimeView on the datetimes when local times are needed
 
         :return: list of candles with OHCL, volume and time as epoch
             Example response
@@ -129,39 +201,36 @@ class TDAmeritrade:
             'needExtendedHoursData': extended_hours
         }
 
-        try:
-            response = requests.get(url=endpoint, params=params)
+        def fetch():
+            response = self.http_session.get(url=endpoint, params=params)
             response.raise_for_status()
-            content = json.loads(response.content)
+            return json.loads(response.content)
+
+        # candles of closed sessions never change
+        closed = endDate is not None and endDate < self.tdameritrade_millis_since_epoch(datetime.utcnow() -
+                                                                                        timedelta(hours=1))
+        try:
+            cache_params = dict(params, symbol=symbol)
+            del cache_params['apikey']
+            content = self.cached('tdameritrade/pricehistory', cache_params, fetch, ttl=FOREVER if closed else 0)
 
             if content['empty']:
                 logging.warning('TDAmeritrade: no Data for ' + str(startDate))
 
-            # add time related data to response
-            for element in content['candles']:
-                seconds_since_epoch = element['datetime'] / 1000  # milliseconds to seconds
-
-                # add time related info based on market time (New York)
-                ts = datetime.fromtimestamp(seconds_since_epoch, pytz.timezone('US/Eastern'))
-                timestamp = ts.strftime('%Y-%m-%d %H:%M:%S')
-                element['timestamp'] = timestamp
-                day = ts.strftime('%Y-%m-%d')
-                element['day'] = day
-                time = ts.strftime('%H:%M:%S')
-                element['time'] = time
-
-                # add time related info based on local time (Zurich)
-                ts_zurich = datetime.fromtimestamp(seconds_since_epoch, pytz.timezone('Europe/Zurich'))
-                timestamp_zurich = ts_zurich.strftime('%Y-%m-%d %H:%M:%S')
-                element['timestamp_zurich'] = timestamp_zurich
-                day_zurich = ts_zurich.strftime('%Y-%m-%d')
-                element['day_zurich'] = day_zurich
-                time_zurich = ts_zurich.strftime('%H:%M:%S')
-                element['time_zurich'] = time_zurich
+            if local_times:
+                # add time related data to response, rendered for all candles at once
+                view = TimeView([element['datetime'] // 1000 for element in content['candles']])
+                for suffix, timezone in (('', NEW_YORK), ('_zurich', ZURICH)):
+                    columns = zip(view.strings(timezone).tolist(), view.dates(timezone).tolist(),
+                                  view.times(timezone).tolist())
+                    for element, (timestamp, day, time) in zip(content['candles'], columns):
+                        element['timestamp' + suffix] = timestamp
+                        element['day' + suffix] = day
+                        element['time' + suffix] = time
 
             return content
         except HTTPError as http_err:
-            if response.status_code == 400:
+            if http_err.response.status_code == 400:
                 print('Combination of periodType, period, frequencyType, frequency not supported')
             else:
                 print(f'HTTP error occurred: {http_err}')
@@ -0,0 +1,290 @@
+import logging
+import os
+import threading
+from datetime import datetime
+
+import numpy as np
+
+from Data_Providers.Candles import CANDLE_DTYPE, local_days
+
+# corporate action, day as days since epoch of the ex-date (New York)
+#   split --> new shares per old share (2.0 for a 2:1 split), 1.0 for a dividend
+#   dividend --> cash per share, 0.0 for a split
+#   previous_close --> unadjusted close before the ex-date, NaN if not known yet
+ACTION_DTYPE = np.dtype([('day', '<i8'),
+                         ('split', '<f8'),
+                         ('dividend', '<f8'),
+                         ('previous_close', '<f8')])
+
+# adjustment basis of stored candles
+RAW = 'raw'  # as traded
+SPLIT_ADJUSTED = 'split'  # split adjusted, not dividend adjusted
+ADJUSTED = 'adjusted'  # split and dividend adjusted
+
+# provider name in the CandleStore --> basis of its candles
+#   Finnhub --> exported with adjusted=False
+#   TDAmeritrade --> the price history endpoint only delivers candles split adjusted as of the fetch day
+#   Merged --> see CandleMerge
+PROVIDER_BASIS = {'Finnhub': RAW, 'TDAmeritrade': SPLIT_ADJUSTED, 'Merged': SPLIT_ADJUSTED}
+
+
+def epoch_day(day):
+    """
+    Args:
+        day (str): 'YYYY-MM-DD'
+
+    Returns:
+        day (int): days since epoch
+    """
+    return (datetime.strptime(day[:10], '%Y-%m-%d') - datetime(1970, 1, 1)).days
+
+
+class Adjustments:
+    """
+    Local table of the splits and dividends of every symbol, one NumPy array of ACTION_DTYPE per symbol
+
+        <base_path>/adjustments/<SYMBOL>.npy
+
+    Candles are stored as delivered (see PROVIDER_BASIS), the adjustment is applied when they are read
+    (see AdjustedStore).
+    A new corporate action only changes this table, the stored history stays valid.
+    """
+
+    def __init__(self, base_path):
+        self.base_path = base_path
+        self.lock = threading.Lock()
+        self.tables = {}  # symbol --> actions
+        self.versions = {}  # symbol --> number of writes in this process
+
+    def path(self, symbol):
+        return os.path.join(self.base_path, 'adjustments', symbol + '.npy')
+
+    def actions(self, symbol):
+        """
+        Returns:
+            actions (np.ndarray): ACTION_DTYPE array sorted by day, empty if none are known
+        """
+        with self.lock:
+            if symbol not in self.tables:
+                filename = self.path(symbol)
+                self.tables[symbol] = np.load(filename) if os.path.exists(filename) else \
+                    np.empty(0, dtype=ACTION_DTYPE)
+            return self.tables[symbol]
+
+    def version(self, symbol):
+        return self.versions.get(symbol, 0)
+
+    def write(self, symbol, actions):
+        """
+        Merges actions into the table of the symbol, an action with the same day and kind replaces the stored one
+        """
+        actions = np.asarray(actions, dtype=ACTION_DTYPE)
+        merged = np.concatenate([actions, self.actions(symbol)])
+        # keep the first occurrence of (day, split or dividend), i.e. new actions win
+        kind = merged['dividend'] > 0
+        merged = merged[np.unique(np.stack([merged['day'], kind]), axis=1, return_index=True)[1]]
+        merged = merged[np.argsort(merged['day'], kind='stable')]
+        if merged.tobytes() == self.actions(symbol).tobytes():
+            return  # nothing new, the table (and its modification time, see CandleMerge) stays
+        with self.lock:
+            os.makedirs(os.path.dirname(self.path(symbol)), exist_ok=True)
+            tmp = self.path(symbol) + '.tmp.npy'
+            np.save(tmp, merged)
+            os.replace(tmp, self.path(symbol))
+            self.tables[symbol] = merged
+            self.versions[symbol] = self.versions.get(symbol, 0) + 1
+
+    def add_split(self, symbol, day, ratio):
+        """
+        Args:
+            day (str): ex-date 'YYYY-MM-DD'
+            ratio (float): new shares per old share, e.g. 4.0 for a 4:1 split, 0.1 for a 1:10 reverse split
+        """
+        self.write(symbol, np.array([(epoch_day(day), ratio, 0.0, np.nan)], dtype=ACTION_DTYPE))
+
+    def add_dividend(self, symbol, day, amount, previous_close=np.nan):
+        """
+        Args:
+            day (str): ex-date 'YYYY-MM-DD'
+            amount (float): cash per share
+            previous_close (float): unadjusted close before the ex-date, NaN to take it from the stored candles
+        """
+        self.write(symbol, np.array([(epoch_day(day), 1.0, amount, previous_close)], dtype=ACTION_DTYPE))
+
+    def update_from_polygon(self, data_provider, symbol):
+        """
+        Downloads all splits and dividends of the symbol (two requests)
+
+        Args:
+            data_provider (Polygon):
+
+        Returns:
+            actions (int): number of actions received
+        """
+        actions = []
+        for split in data_provider.polygon_get_splits(symbol) or []:
+            if split.get('tofactor') and split.get('forfactor'):
+                ratio = split['tofactor'] / split['forfactor']
+            else:
+                ratio = 1.0 / split['ratio']
+            actions.append((epoch_day(split['exDate']), ratio, 0.0, np.nan))
+        for dividend in data_provider.polygon_get_dividends(symbol) or []:
+            if dividend.get('amount'):
+                actions.append((epoch_day(dividend['exDate']), 1.0, dividend['amount'], np.nan))
+        if actions:
+            # previous closes already resolved for known dividends are kept
+            known = self.actions(symbol)
+            actions = np.array(actions, dtype=ACTION_DTYPE)
+            for i in np.flatnonzero(actions['dividend'] > 0):
+                same = known[(known['day'] == actions['day'][i]) & (known['dividend'] > 0)]
+                if len(same):
+                    actions['previous_close'][i] = same['previous_close'][0]
+            self.write(symbol, actions)
+        logging.info(symbol + ": " + str(len(actions)) + " corporate actions")
+        return len(actions)
+
+
+class AdjustedStore:
+    """
+    Read-only view of a CandleStore with adjusted prices and split adjusted volumes
+
+    Same read methods as CandleStore, i.e. it can be passed to Backtesting.Panel.load_panel or
+    HistoryStore. Per symbol the cumulative factors after every ex-date are computed once and cached
+    until the actions of the symbol change; a read multiplies the columns with the factor of every
+    candle's day (one searchsorted per read).
+
+        factor of a candle = product over all later ex-dates of 1 / split * (1 - dividend / previous close)
+
+    Only the part missing in the basis of the provider is applied: dividends only if basis is ADJUSTED,
+    splits to RAW candles and to SPLIT_ADJUSTED candles only if their ex-date is after the day the
+    partition was fetched on (see CandleStore.fetched), i.e. partitions fetched before and after a split
+    agree. Providers of unknown basis or already ADJUSTED candles are refused.
+
+    Args:
+        store (CandleStore):
+        adjustments (Adjustments):
+        basis (str): ADJUSTED or SPLIT_ADJUSTED, basis of the candles read
+        provider_basis (dict): provider --> basis of its stored candles, default PROVIDER_BASIS
+    """
+
+    def __init__(self, store, adjustments, basis=ADJUSTED, provider_basis=None):
+        if basis not in (ADJUSTED, SPLIT_ADJUSTED):
+            logging.critical(basis)
+            raise Exception('Unknown adjustment basis found')
+        self.store = store
+        self.adjustments = adjustments
+        self.basis = basis
+        self.provider_basis = provider_basis if provider_basis is not None else PROVIDER_BASIS
+        self.lock = threading.Lock()
+        self.factors = {}  # (provider, frequency, symbol) --> (version, source, days, dividends, splits)
+
+    def _fetched(self, provider, frequency, symbol, day):
+        """
+        Returns:
+            fetched (int): fetch day of the partition as days since epoch, None for RAW candles
+        """
+        if self.provider_basis.get(provider) != SPLIT_ADJUSTED:
+            return None
+        fetched = self.store.fetched(provider, frequency, symbol, day)
+        return epoch_day(fetched) if fetched is not None else None
+
+    def _previous_close(self, provider, frequency, symbol, day, action_days, splits):
+        """
+        Returns:
+            close (float): as traded close of the last stored day before day, NaN if there is none
+        """
+        days = [stored for stored in self.store.days(provider, frequency, symbol)
+                if epoch_day(stored) < day]
+        if not days:
+            return np.nan
+        close = float(self.store.read_day(provider, frequency, symbol, days[-1])['close'][-1])
+        fetched = self._fetched(provider, frequency, symbol, days[-1])
+        if fetched is not None:
+            # undo the splits after the day which were already applied when it was fetched
+            close *= splits[np.searchsorted(action_days, epoch_day(days[-1]), side='right')] / \
+                splits[np.searchsorted(action_days, fetched, side='right')]
+        return close
+
+    def _factors(self, provider, frequency, symbol):
+        """
+        Returns:
+            (source, days, dividends, splits): basis of the provider, ex-dates and the products of the
+                dividend factors and of the splits from every action on (one more element, 1.0 at the end)
+        """
+        key = (provider, frequency, symbol)
+        version = self.adjustments.version(symbol)
+        with self.lock:
+            cached = self.factors.get(key)
+            if cached is not None and cached[0] == version:
+                return cached[1:]
+        source = self.provider_basis.get(provider)
+        if source not in (RAW, SPLIT_ADJUSTED):
+            logging.critical(provider + ": " + str(source))
+            raise Exception('Candles of unknown or already adjusted basis found')
+        actions = self.adjustments.actions(symbol)
+        # suffix products, element i applies to the candles before the ex-date of action i
+        splits = np.append(np.cumprod(actions['split'][::-1])[::-1], 1.0)
+        if self.basis == ADJUSTED:
+            previous_close = actions['previous_close'].copy()
+            for i in np.flatnonzero((actions['dividend'] > 0) & np.isnan(previous_close)):
+                previous_close[i] = self._previous_close(provider, frequency, symbol, actions['day'][i],
+                                                         actions['day'], splits)
+            dividend_factor = np.where(previous_close > 0, 1.0 - actions['dividend'] / previous_close, 1.0)
+            dividend_factor[np.isnan(dividend_factor)] = 1.0
+        else:
+            dividend_factor = np.ones(len(actions))
+        dividends = np.append(np.cumprod(dividend_factor[::-1])[::-1], 1.0)
+        with self.lock:
+            self.factors[key] = (version, source, actions['day'], dividends, splits)
+        return source, actions['day'], dividends, splits
+
+    def adjust(self, provider, frequency, symbol, candles, fetched=None):
+        """
+        Args:
+            fetched (int): fetch day of SPLIT_ADJUSTED candles as days since epoch, None if they are adjusted
+                           for all known splits
+
+        Returns:
+            candles (np.ndarray): adjusted copy of the CANDLE_DTYPE array
+        """
+        source, days, dividends, splits = self._factors(provider, frequency, symbol)
+        candles = np.array(candles)
+        if len(days) == 0 or len(candles) == 0:
+            return candles
+        candle_days = local_days(candles['ts'])
+        rows = np.searchsorted(days, candle_days, side='right')
+        if source == RAW:
+            split_rows = rows
+        elif fetched is None:
+            split_rows = np.full(len(candles), len(days))
+        else:
+            split_rows = np.searchsorted(days, np.maximum(candle_days, fetched), side='right')
+        for column in ('open', 'high', 'low', 'close'):
+            candles[column] *= dividends[rows] / splits[split_rows]
+        candles['volume'] *= splits[split_rows]
+        return candles
+
+    def days(self, provider, frequency, symbol):
+        return self.store.days(provider, frequency, symbol)
+
+    def symbols(self, provider, frequency):
+        return self.store.symbols(provider, frequency)
+
+    def fetched(self, provider, frequency, symbol, day):
+        return self.store.fetched(provider, frequency, symbol, day)
+
+    def read_day(self, provider, frequency, symbol, day, mmap=True):
+        return self.adjust(provider, frequency, symbol, self.store.read_day(provider, frequency, symbol, day, mmap),
+                           self._fetched(provider, frequency, symbol, day))
+
+    def iter_days(self, provider, frequency, symbol, start=None, end=None):
+        for day, candles in self.store.iter_days(provider, frequency, symbol, start, end):
+            fetched = self._fetched(provider, frequency, symbol, day)
+            yield day, self.adjust(provider, frequency, symbol, candles, fetched)
+
+    def read(self, provider, frequency, symbol, start=None, end=None):
+        # partitions may have been fetched on different days, i.e. each has its own split factors
+        parts = [candles for day, candles in self.iter_days(provider, frequency, symbol, start, end)]
+        if not parts:
+            return np.empty(0, dtype=CANDLE_DTYPE)
+        return np.concatenate(parts)
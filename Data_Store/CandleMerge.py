@@ -0,0 +1,210 @@
+import logging
+import os
+from collections import namedtuple
+
+import numpy as np
+
+from Data_Providers.Candles import CANDLE_DTYPE
+from Data_Store.Adjustments import AdjustedStore, PROVIDER_BASIS, SPLIT_ADJUSTED
+from Data_Store.CandleStore import today
+
+# provenance of a merged candle
+PRIMARY = 1
+SECONDARY = 2
+
+# flags of a merged candle, combined bitwise
+FILLED = 1  # missing in the primary provider
+REPLACED = 2  # primary candle rejected as outlier
+DISAGREE = 4  # both providers have the candle and their closes differ by more than the tolerance
+
+# CANDLE_DTYPE + provenance, i.e. readable like any other partition of the CandleStore
+MERGED_DTYPE = np.dtype(CANDLE_DTYPE.descr + [('source', 'u1'), ('flags', 'u1')])
+
+# summary of a merge, the counts are over the days merged by this run (days already merged are skipped)
+MergeReport = namedtuple('MergeReport', ['days', 'candles', 'filled', 'replaced', 'disagree', 'secondary_days',
+                                         'skipped'])
+
+
+def _invalid(candles):
+    """
+    Returns:
+        invalid (np.ndarray): bool per candle with impossible prices or volume
+    """
+    return ~((candles['low'] > 0) & (candles['low'] <= candles['high']) &
+             (candles['open'] >= candles['low']) & (candles['open'] <= candles['high']) &
+             (candles['close'] >= candles['low']) & (candles['close'] <= candles['high']) &
+             (candles['volume'] >= 0))
+
+
+def merge_day(primary, secondary, tolerance_pct=1.0):
+    """
+    Sort-merge join of the candles of one day of two providers on ts
+
+        only primary --> primary
+        only secondary --> secondary, flag FILLED
+        both --> primary, unless it is invalid or, when the closes disagree by more than tolerance_pct,
+                 the secondary close is closer to the previous merged close (flag REPLACED)
+
+    Args:
+        primary (np.ndarray): CANDLE_DTYPE array sorted by ts
+        secondary (np.ndarray): CANDLE_DTYPE array sorted by ts
+        tolerance_pct (float): max. difference of the closes in percent
+
+    Returns:
+        candles (np.ndarray): MERGED_DTYPE array sorted by ts
+    """
+    ts = np.union1d(primary['ts'], secondary['ts'])
+    merged = np.zeros(len(ts), dtype=MERGED_DTYPE)
+    merged['ts'] = ts
+    in_primary = np.isin(ts, primary['ts'], assume_unique=True)
+    in_secondary = np.isin(ts, secondary['ts'], assume_unique=True)
+    rows_primary = np.searchsorted(primary['ts'], ts[in_primary])
+    rows_secondary = np.searchsorted(secondary['ts'], ts[in_secondary])
+
+    columns = ('open', 'high', 'low', 'close', 'volume')
+    for column in columns:
+        merged[column][in_secondary] = secondary[column][rows_secondary]
+        merged[column][in_primary] = primary[column][rows_primary]
+    merged['source'] = np.where(in_primary, PRIMARY, SECONDARY)
+    merged['flags'] = np.where(in_primary, 0, FILLED)
+
+    both = np.flatnonzero(in_primary & in_secondary)
+    if len(both):
+        close_primary = merged['close'][both]
+        close_secondary = secondary['close'][np.searchsorted(secondary['ts'], ts[both])]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            disagree = np.abs(close_primary / close_secondary - 1) * 100 > tolerance_pct
+        # previous merged close as reference, the first candle of the day compares against the secondary
+        reference = np.where(both > 0, merged['close'][np.maximum(both - 1, 0)], close_secondary)
+        secondary_closer = np.abs(close_secondary - reference) < np.abs(close_primary - reference)
+        replace = (disagree & secondary_closer) | _invalid(merged[both])
+        replace &= ~_invalid(secondary[np.searchsorted(secondary['ts'], ts[both])])
+        merged['flags'][both[disagree]] |= DISAGREE
+        replaced = both[replace]
+        if len(replaced):
+            rows = np.searchsorted(secondary['ts'], ts[replaced])
+            for column in columns:
+                merged[column][replaced] = secondary[column][rows]
+            merged['source'][replaced] = SECONDARY
+            merged['flags'][replaced] |= REPLACED
+    return merged
+
+
+class CandleMerge:
+    """
+    Merges the candles of two providers in the CandleStore into one canonical series with provenance
+
+        <base_path>/<target>/<N>min/<SYMBOL>/<YYYY-MM-DD>.npy  (MERGED_DTYPE)
+
+    The days are processed one after the other, each day is read memory-mapped from both providers,
+    merged (see merge_day) and written, i.e. memory is bounded by one day regardless of the length of
+    the history. Days stored by only one provider are taken as they are. The merged partitions have
+    the columns of CANDLE_DTYPE, so they are read through the CandleStore with provider=target.
+    A day is merged again only if one of its source partitions (or the adjustments of the symbol)
+    changed after it was merged, i.e. a rerun only merges new and refetched days.
+
+    Prices are only comparable on the same adjustment basis (see Adjustments.PROVIDER_BASIS). With
+    adjustments both providers are read split adjusted (the basis of the merged series), without
+    them providers of different basis are refused.
+
+    Args:
+        store (CandleStore):
+        primary (str): provider whose candles are preferred
+        secondary (str): provider filling the gaps and outliers of the primary
+        target (str): provider name of the merged series
+        tolerance_pct (float): see merge_day
+        adjustments (Adjustments): corporate actions, None if both providers have the same basis
+    """
+
+    def __init__(self, store, primary='TDAmeritrade', secondary='Finnhub', target='Merged', tolerance_pct=1.0,
+                 adjustments=None):
+        self.store = store
+        self.primary = primary
+        self.secondary = secondary
+        self.target = target
+        self.tolerance_pct = tolerance_pct
+        self.adjustments = adjustments
+        if adjustments is not None:
+            self.reader = AdjustedStore(store, adjustments, basis=SPLIT_ADJUSTED)
+        elif PROVIDER_BASIS.get(primary) == PROVIDER_BASIS.get(secondary):
+            self.reader = store
+        else:
+            logging.critical(primary + ": " + str(PROVIDER_BASIS.get(primary)) + ", " +
+                             secondary + ": " + str(PROVIDER_BASIS.get(secondary)))
+            raise Exception('Providers of different adjustment basis found, adjustments needed')
+
+    def _read(self, provider, frequency, symbol, day, days):
+        if day not in days:
+            return np.empty(0, dtype=CANDLE_DTYPE)
+        return self.reader.read_day(provider, frequency, symbol, day)
+
+    @staticmethod
+    def _mtime(filename):
+        try:
+            return os.stat(filename).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _merged(self, frequency, symbol, day):
+        """
+        Returns:
+            True if the merged partition of the day is newer than its sources
+        """
+        merged = self._mtime(self.store.path(self.target, frequency, symbol, day))
+        if merged is None:
+            return False
+        sources = [self.store.path(self.primary, frequency, symbol, day),
+                   self.store.path(self.secondary, frequency, symbol, day)]
+        if self.adjustments is not None:
+            sources.append(self.adjustments.path(symbol))
+        return all(mtime is None or mtime <= merged for mtime in map(self._mtime, sources))
+
+    def merge(self, frequency, symbol, start=None, end=None, force=False):
+        """
+        Args:
+            frequency (int): candle length in minutes
+            symbol (str): single symbol/stock
+            start (str): first day 'YYYY-MM-DD' (inclusive), None for the first stored day
+            end (str): last day 'YYYY-MM-DD' (inclusive), None for the last stored day
+            force (bool): merge also the days whose sources did not change
+
+        Returns:
+            report (MergeReport): number of merged days and candles, filled/replaced/disagreeing candles,
+                days only the secondary provider has and skipped days
+        """
+        primary_days = set(self.store.days(self.primary, frequency, symbol))
+        secondary_days = set(self.store.days(self.secondary, frequency, symbol))
+        days = sorted(day for day in primary_days | secondary_days
+                      if (start is None or day >= start) and (end is None or day <= end))
+
+        merged_days = candles = filled = replaced = disagree = only_secondary = skipped = 0
+        fetched = today()
+        for day in days:
+            if not force and self._merged(frequency, symbol, day):
+                skipped += 1
+                continue
+            merged = merge_day(self._read(self.primary, frequency, symbol, day, primary_days),
+                               self._read(self.secondary, frequency, symbol, day, secondary_days),
+                               self.tolerance_pct)
+            # split adjusted as of today, see AdjustedStore
+            self.store.write_day(self.target, frequency, symbol, day, merged, fetched=fetched)
+            merged_days += 1
+            candles += len(merged)
+            filled += int(np.count_nonzero(merged['flags'] & FILLED))
+            replaced += int(np.count_nonzero(merged['flags'] & REPLACED))
+            disagree += int(np.count_nonzero(merged['flags'] & DISAGREE))
+            only_secondary += day not in primary_days
+
+        report = MergeReport(merged_days, candles, filled, replaced, disagree, only_secondary, skipped)
+        logging.info(symbol + " " + str(frequency) + "min merged: " + str(report))
+        return report
+
+    def merge_all(self, frequency, symbols=None, start=None, end=None, force=False):
+        """
+        Returns:
+            reports (dict): symbol --> MergeReport, for all symbols of both providers if symbols is None
+        """
+        if symbols is None:
+            symbols = sorted(set(self.store.symbols(self.primary, frequency)) |
+                             set(self.store.symbols(self.secondary, frequency)))
+        return {symbol: self.merge(frequency, symbol, start, end, force) for symbol in symbols}
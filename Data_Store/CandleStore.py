@@ -0,0 +1,215 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from Data_Providers.Candles import CANDLE_DTYPE, local_days
+
+
+def day_str(days_since_epoch):
+    return (datetime(1970, 1, 1) + timedelta(days=int(days_since_epoch))).strftime('%Y-%m-%d')
+
+
+def today():
+    """
+    Returns:
+        day (str): current day 'YYYY-MM-DD' in New York, e.g. the fetch day of a request
+    """
+    return day_str(local_days([int(time.time())])[0])
+
+
+class CandleStore:
+    """
+    On-disk candle store, partitioned by provider/frequency/symbol/trading day (New York)
+
+        <base_path>/<provider>/<N>min/<SYMBOL>/<YYYY-MM-DD>.npy
+
+    Every partition is a NumPy array of CANDLE_DTYPE sorted by ts. Partitions are memory-mapped on read,
+    i.e. the columns (candles['close'], ...) are available as NumPy arrays without any parsing.
+
+    The day a partition was fetched on is recorded next to the partitions of the symbol
+
+        <base_path>/<provider>/<N>min/<SYMBOL>/fetched.json  {"<YYYY-MM-DD>": "<fetch day>", ...}
+
+    since providers delivering adjusted history (see Adjustments.PROVIDER_BASIS) adjust it as of that day.
+    """
+
+    FETCHED = 'fetched.json'
+
+    def __init__(self, base_path):
+        self.base_path = base_path
+        self.lock = threading.Lock()
+        self.symbol_locks = {}
+        self.fetched_days = {}  # (provider, frequency, symbol) --> (mtime of fetched.json, day --> fetch day)
+
+    def path(self, provider, frequency, symbol, day=None):
+        path = os.path.join(self.base_path, provider, str(frequency) + 'min', symbol)
+        if day is None:
+            return path
+        return os.path.join(path, day + '.npy')
+
+    def _symbol_lock(self, provider, frequency, symbol):
+        with self.lock:
+            key = (provider, frequency, symbol)
+            if key not in self.symbol_locks:
+                self.symbol_locks[key] = threading.Lock()
+            return self.symbol_locks[key]
+
+    def write(self, provider, frequency, symbol, candles, fetched=None):
+        """
+        Writes candles into their day partitions, merging with already stored candles of the same day.
+        Candles with equal ts replace the stored ones.
+
+        Args:
+            provider (str): data provider name
+            frequency (int): candle length in minutes
+            symbol (str): single symbol/stock
+            candles (np.ndarray): CANDLE_DTYPE array
+            fetched (str): day 'YYYY-MM-DD' the candles were fetched on, None to keep the recorded fetch days.
+                           A partition fetched on another day is replaced instead of merged, the provider may
+                           have adjusted its history in between.
+
+        Returns:
+            days (list): written days ('YYYY-MM-DD')
+        """
+        if len(candles) == 0:
+            return []
+        candles = np.asarray(candles, dtype=CANDLE_DTYPE)
+        days = local_days(candles['ts'])
+        written = []
+
+        os.makedirs(self.path(provider, frequency, symbol), exist_ok=True)
+        with self._symbol_lock(provider, frequency, symbol):
+            recorded = self._fetched_days(provider, frequency, symbol)
+            for day in np.unique(days):
+                name = day_str(day)
+                part = candles[days == day]
+                filename = self.path(provider, frequency, symbol, name)
+                if os.path.exists(filename) and (fetched is None or recorded.get(name) == fetched):
+                    stored = np.load(filename)
+                    part = np.concatenate([part, stored])
+                # keep the first occurrence, i.e. new candles win over stored ones
+                self._save(filename, part[np.unique(part['ts'], return_index=True)[1]])
+                written.append(name)
+            if fetched is not None:
+                self._record_fetched(provider, frequency, symbol, written, fetched)
+        return written
+
+    def write_day(self, provider, frequency, symbol, day, candles, fetched=None):
+        """
+        Replaces the partition of one day, e.g. with derived candles of a wider dtype (see CandleMerge)
+
+        Args:
+            day (str): 'YYYY-MM-DD'
+            candles (np.ndarray): sorted by ts, CANDLE_DTYPE or a dtype with additional columns
+            fetched (str): see write
+        """
+        os.makedirs(self.path(provider, frequency, symbol), exist_ok=True)
+        with self._symbol_lock(provider, frequency, symbol):
+            self._save(self.path(provider, frequency, symbol, day), candles)
+            if fetched is not None:
+                self._record_fetched(provider, frequency, symbol, [day], fetched)
+
+    @staticmethod
+    def _save(filename, candles):
+        # atomic, readers see either the old or the new partition
+        tmp = filename + '.tmp.npy'
+        np.save(tmp, candles)
+        os.replace(tmp, filename)
+
+    def _record_fetched(self, provider, frequency, symbol, days, fetched):
+        recorded = dict(self._fetched_days(provider, frequency, symbol))
+        recorded.update((day, fetched) for day in days)
+        filename = os.path.join(self.path(provider, frequency, symbol), self.FETCHED)
+        with open(filename + '.tmp', mode='w') as f:
+            json.dump(recorded, f, indent=1, sort_keys=True)
+        os.replace(filename + '.tmp', filename)
+
+    def _fetched_days(self, provider, frequency, symbol):
+        filename = os.path.join(self.path(provider, frequency, symbol), self.FETCHED)
+        try:
+            mtime = os.stat(filename).st_mtime_ns
+        except FileNotFoundError:
+            return {}
+        key = (provider, frequency, symbol)
+        with self.lock:
+            cached = self.fetched_days.get(key)
+            if cached is not None and cached[0] == mtime:
+                return cached[1]
+        with open(filename) as f:
+            recorded = json.load(f)
+        with self.lock:
+            self.fetched_days[key] = (mtime, recorded)
+        return recorded
+
+    def fetched(self, provider, frequency, symbol, day):
+        """
+        Returns:
+            fetched (str): day 'YYYY-MM-DD' the partition was fetched on, for partitions written without a
+                           fetch day the day it was last written on, None if the partition does not exist
+        """
+        recorded = self._fetched_days(provider, frequency, symbol).get(day)
+        if recorded is not None:
+            return recorded
+        try:
+            mtime = os.stat(self.path(provider, frequency, symbol, day)).st_mtime
+        except FileNotFoundError:
+            return None
+        return day_str(local_days([int(mtime)])[0])
+
+    def days(self, provider, frequency, symbol):
+        """
+        Returns:
+            days (list): sorted stored days ('YYYY-MM-DD') of the symbol
+        """
+        path = self.path(provider, frequency, symbol)
+        if not os.path.isdir(path):
+            return []
+        return sorted(name[:-4] for name in os.listdir(path) if name.endswith('.npy') and '.tmp' not in name)
+
+    def symbols(self, provider, frequency):
+        """
+        Returns:
+            symbols (list): sorted symbols with at least one stored day
+        """
+        path = os.path.join(self.base_path, provider, str(frequency) + 'min')
+        if not os.path.isdir(path):
+            return []
+        return sorted(name for name in os.listdir(path) if os.path.isdir(os.path.join(path, name)))
+
+    def read_day(self, provider, frequency, symbol, day, mmap=True):
+        """
+        Returns:
+            candles (np.ndarray): CANDLE_DTYPE array of the day (memory-mapped, read-only if mmap)
+        """
+        return np.load(self.path(provider, frequency, symbol, day), mmap_mode='r' if mmap else None)
+
+    def iter_days(self, provider, frequency, symbol, start=None, end=None):
+        """
+        Iterates over the stored days without copying them into memory
+
+        Args:
+            start (str): first day 'YYYY-MM-DD' (inclusive), None for the first stored day
+            end (str): last day 'YYYY-MM-DD' (inclusive), None for the last stored day
+
+        Yields:
+            (day, candles): day as 'YYYY-MM-DD' and the memory-mapped CANDLE_DTYPE array
+        """
+        for day in self.days(provider, frequency, symbol):
+            if (start is None or day >= start) and (end is None or day <= end):
+                yield day, self.read_day(provider, frequency, symbol, day)
+
+    def read(self, provider, frequency, symbol, start=None, end=None):
+        """
+        Reads all stored candles of a symbol between start and end (days, inclusive)
+
+        Returns:
+            candles (np.ndarray): CANDLE_DTYPE array sorted by ts
+        """
+        parts = [candles for day, candles in self.iter_days(provider, frequency, symbol, start, end)]
+        if not parts:
+            return np.empty(0, dtype=CANDLE_DTYPE)
+        return np.concatenate(parts)
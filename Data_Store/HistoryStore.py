@@ -0,0 +1,114 @@
+import os
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+
+import numpy as np
+
+from Backtesting.Panel import Panel
+from Data_Providers.Candles import CANDLE_DTYPE, NEW_YORK, utc_offsets
+
+
+def _minute(hh_mm):
+    t = datetime.strptime(hh_mm, '%H:%M')
+    return t.hour * 60 + t.minute
+
+
+class HistoryStore:
+    """
+    Queries over the stored history: several symbols, a range of days and optionally a time window per day
+
+        history = HistoryStore(CandleStore(DATA_PATH), provider='TDAmeritrade')
+        panel = history.query(['QQQ', 'SPY'], 1, '2020-03-01', '2020-03-31', session_filter=('10:30', '11:30'))
+
+    The day partitions of the store are the index: the sorted list of stored days per symbol is cached
+    (and refreshed when the directory changes), so a query opens only the partitions of the requested
+    days. Within a partition the window is found with a binary search on ts and only that slice is
+    copied out of the memory-mapped file.
+
+    Args:
+        store (CandleStore): or AdjustedStore for adjusted prices
+        provider (str): data provider name, e.g. 'Merged' (see CandleMerge)
+        timezone (pytz.timezone): timezone of the days and of the session filter
+    """
+
+    def __init__(self, store, provider='TDAmeritrade', timezone=NEW_YORK):
+        self.store = store
+        self.provider = provider
+        self.timezone = timezone
+        self.lock = threading.Lock()
+        self.indexes = {}  # (frequency, symbol) --> (mtime of the directory, sorted days)
+
+    def days(self, frequency, symbol):
+        """
+        Returns:
+            days (list): sorted stored days ('YYYY-MM-DD') of the symbol
+        """
+        store = getattr(self.store, 'store', self.store)  # directory of an AdjustedStore
+        try:
+            mtime = os.stat(store.path(self.provider, frequency, symbol)).st_mtime_ns
+        except FileNotFoundError:
+            return []
+        key = (frequency, symbol)
+        with self.lock:
+            cached = self.indexes.get(key)
+            if cached is not None and cached[0] == mtime:
+                return cached[1]
+        days = self.store.days(self.provider, frequency, symbol)
+        with self.lock:
+            self.indexes[key] = (mtime, days)
+        return days
+
+    def _window(self, day, session_filter):
+        """
+        Returns:
+            (first, end): ts of the first minute of the window and of the first minute after it
+        """
+        midnight = int((datetime.strptime(day, '%Y-%m-%d') - datetime(1970, 1, 1)).total_seconds())
+        # offset at noon, i.e. after a DST transition of that day
+        offset = int(utc_offsets(np.array([midnight + 12 * 3600]), self.timezone)[0])
+        return (midnight + _minute(session_filter[0]) * 60 - offset,
+                midnight + _minute(session_filter[1]) * 60 - offset)
+
+    def read(self, symbol, frequency, start=None, end=None, session_filter=None):
+        """
+        Args:
+            symbol (str): single symbol/stock
+            frequency (int): candle length in minutes
+            start (str): first day 'YYYY-MM-DD' (inclusive), None for the first stored day
+            end (str): last day 'YYYY-MM-DD' (inclusive), None for the last stored day
+            session_filter (tuple): ('HH:MM', 'HH:MM') local start (inclusive) and end (exclusive) of the
+                                    candles per day, None for all candles
+
+        Returns:
+            candles (np.ndarray): candles sorted by ts (CANDLE_DTYPE or the dtype of the store, e.g. MERGED_DTYPE)
+        """
+        days = self.days(frequency, symbol)
+        days = days[bisect_left(days, start) if start else 0:bisect_right(days, end) if end else len(days)]
+        parts = []
+        for day in days:
+            candles = self.store.read_day(self.provider, frequency, symbol, day)
+            if session_filter is not None:
+                first, last = self._window(day, session_filter)
+                candles = candles[np.searchsorted(candles['ts'], first):np.searchsorted(candles['ts'], last)]
+            parts.append(candles)
+        if not parts:
+            return np.empty(0, dtype=CANDLE_DTYPE)
+        return np.concatenate(parts)
+
+    def query(self, symbols, frequency, start=None, end=None, session_filter=None, as_frame=False):
+        """
+        Candles of several symbols aligned on a common time axis, see read for the arguments
+
+        Returns:
+            panel (Panel): or, if as_frame, a pandas DataFrame indexed by the UTC candle start with the
+                           columns (field, symbol)
+        """
+        panel = Panel.from_candles({symbol: self.read(symbol, frequency, start, end, session_filter)
+                                    for symbol in symbols}, frequency=frequency, timezone=self.timezone)
+        if not as_frame:
+            return panel
+        import pandas as pd
+        index = pd.to_datetime(panel.ts, unit='s', utc=True)
+        return pd.concat({field: pd.DataFrame(getattr(panel, field), index=index, columns=panel.symbols)
+                          for field in Panel.FIELDS}, axis=1)
@@ -0,0 +1,108 @@
+import json
+import os
+import threading
+from bisect import bisect_right
+from datetime import datetime, timedelta
+
+
+def _day(day):
+    return datetime.strptime(day, '%Y-%m-%d').date()
+
+
+def _str(day):
+    return day.strftime('%Y-%m-%d')
+
+
+class Manifest:
+    """
+    Persisted index of the day ranges already fetched per provider/frequency/symbol
+
+        {"TDAmeritrade/1min/AAPL": [["2020-09-01", "2020-09-30"], ["2020-10-05", "2020-10-09"]], ...}
+
+    Ranges are inclusive, sorted and merged if they overlap or touch. Days on which the data provider
+    returned no data (weekends, holidays) are recorded as well, so they are not requested again.
+    The file is rewritten atomically after every change, i.e. an interrupted export loses at most
+    the requests in flight.
+
+    Args:
+        filename (str): path of the json file, created on the first change if it does not exist
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.lock = threading.Lock()
+        self.entries = {}
+        if os.path.exists(filename):
+            with open(filename) as f:
+                for key, ranges in json.load(f).items():
+                    self.entries[key] = [(_day(first), _day(last)) for first, last in ranges]
+
+    @staticmethod
+    def key(provider, frequency, symbol):
+        return provider + '/' + str(frequency) + 'min/' + symbol
+
+    def save(self):
+        data = {key: [[_str(first), _str(last)] for first, last in ranges]
+                for key, ranges in sorted(self.entries.items())}
+        directory = os.path.dirname(self.filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = self.filename + '.tmp'
+        with open(tmp, mode='w') as f:
+            json.dump(data, f, indent=1)
+        os.replace(tmp, self.filename)
+
+    def ranges(self, provider, frequency, symbol):
+        """
+        Returns:
+            ranges (list): fetched (first, last) day ranges as 'YYYY-MM-DD' strings
+        """
+        with self.lock:
+            ranges = self.entries.get(self.key(provider, frequency, symbol), [])
+            return [(_str(first), _str(last)) for first, last in ranges]
+
+    def add(self, provider, frequency, symbol, first, last):
+        """
+        Records the days first to last (inclusive, 'YYYY-MM-DD') as fetched and saves the manifest
+        """
+        first, last = _day(first), _day(last)
+        with self.lock:
+            key = self.key(provider, frequency, symbol)
+            merged = []
+            for start, end in sorted(self.entries.get(key, []) + [(first, last)]):
+                if merged and start <= merged[-1][1] + timedelta(days=1):
+                    merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+                else:
+                    merged.append((start, end))
+            self.entries[key] = merged
+            self.save()
+
+    def contains(self, provider, frequency, symbol, first, last=None):
+        """
+        Returns:
+            True if all days first to last (inclusive, 'YYYY-MM-DD') are already fetched
+        """
+        first = _day(first)
+        last = first if last is None else _day(last)
+        with self.lock:
+            ranges = self.entries.get(self.key(provider, frequency, symbol), [])
+            i = bisect_right(ranges, (first, datetime.max.date())) - 1
+            return i >= 0 and ranges[i][0] <= first and last <= ranges[i][1]
+
+    def missing(self, provider, frequency, symbol, first, last):
+        """
+        Returns:
+            gaps (list): (first, last) day ranges between first and last which are not fetched yet
+        """
+        first, last = _day(first), _day(last)
+        gaps = []
+        with self.lock:
+            for start, end in self.entries.get(self.key(provider, frequency, symbol), []):
+                if end < first or start > last:
+                    continue
+                if start > first:
+                    gaps.append((_str(first), _str(start - timedelta(days=1))))
+                first = max(first, end + timedelta(days=1))
+        if first <= last:
+            gaps.append((_str(first), _str(last)))
+        return gaps
@@ -0,0 +1,105 @@
+import os
+
+import numpy as np
+
+from Data_Providers.Candles import CANDLE_DTYPE
+
+# daily candle of one symbol within a cross-sectional snapshot
+SNAPSHOT_DTYPE = np.dtype([('symbol', 'S16'),
+                           ('ts', '<i8'),
+                           ('open', '<f8'),
+                           ('high', '<f8'),
+                           ('low', '<f8'),
+                           ('close', '<f8'),
+                           ('volume', '<f8'),
+                           ('vwap', '<f8'),
+                           ('transactions', '<i8')])
+
+
+class SnapshotStore:
+    """
+    On-disk store of daily candles of all symbols, one cross-sectional snapshot per trading day
+
+        <base_path>/<provider>/daily/<YYYY-MM-DD>.npy
+
+    Every snapshot is a NumPy array of SNAPSHOT_DTYPE sorted by symbol, i.e. the day --> all symbols index
+    for screening is the file itself and a single symbol is found by binary search. Snapshots are
+    memory-mapped on read. The daily history of a symbol is read across the snapshots (see history),
+    so there is no file per symbol and day.
+    """
+
+    def __init__(self, base_path, provider='Polygon'):
+        self.path = os.path.join(base_path, provider, 'daily')
+
+    def filename(self, day):
+        return os.path.join(self.path, day + '.npy')
+
+    def write(self, day, snapshot):
+        """
+        Replaces the snapshot of a day
+
+        Args:
+            day (str): 'YYYY-MM-DD'
+            snapshot (np.ndarray): SNAPSHOT_DTYPE array
+        """
+        snapshot = np.asarray(snapshot, dtype=SNAPSHOT_DTYPE)
+        snapshot = snapshot[np.unique(snapshot['symbol'], return_index=True)[1]]  # sorted, one row per symbol
+        os.makedirs(self.path, exist_ok=True)
+        filename = self.filename(day)
+        tmp = filename + '.tmp.npy'
+        np.save(tmp, snapshot)
+        os.replace(tmp, filename)
+
+    def days(self, start=None, end=None):
+        """
+        Returns:
+            days (list): sorted stored days ('YYYY-MM-DD') between start and end (inclusive, None for no limit)
+        """
+        if not os.path.isdir(self.path):
+            return []
+        days = sorted(name[:-4] for name in os.listdir(self.path) if name.endswith('.npy') and '.tmp' not in name)
+        return [day for day in days if (start is None or day >= start) and (end is None or day <= end)]
+
+    def read_day(self, day, mmap=True):
+        """
+        Returns:
+            snapshot (np.ndarray): SNAPSHOT_DTYPE array of all symbols of the day, sorted by symbol
+        """
+        return np.load(self.filename(day), mmap_mode='r' if mmap else None)
+
+    def cross_section(self, day, symbols=None):
+        """
+        Args:
+            day (str): 'YYYY-MM-DD'
+            symbols (list): None for all symbols of the day
+
+        Returns:
+            snapshot (np.ndarray): SNAPSHOT_DTYPE rows of the symbols found on that day, sorted by symbol
+        """
+        snapshot = self.read_day(day)
+        if symbols is None:
+            return snapshot
+        keys = np.unique(np.array([symbol.encode() for symbol in symbols], dtype=SNAPSHOT_DTYPE['symbol']))
+        rows = np.searchsorted(snapshot['symbol'], keys)
+        found = rows < len(snapshot)
+        rows, keys = rows[found], keys[found]
+        return snapshot[rows[snapshot['symbol'][rows] == keys]]
+
+    def history(self, symbol, start=None, end=None):
+        """
+        Daily candles of a symbol across all snapshots between start and end
+
+        Returns:
+            candles (np.ndarray): CANDLE_DTYPE array sorted by ts
+        """
+        key = np.array(symbol.encode(), dtype=SNAPSHOT_DTYPE['symbol'])
+        rows = []
+        for day in self.days(start, end):
+            snapshot = self.read_day(day)
+            row = np.searchsorted(snapshot['symbol'], key)
+            if row < len(snapshot) and snapshot['symbol'][row] == key:
+                rows.append(snapshot[row])
+        candles = np.empty(len(rows), dtype=CANDLE_DTYPE)
+        for field in CANDLE_DTYPE.names:
+            candles[field] = [row[field] for row in rows]
+        return candles
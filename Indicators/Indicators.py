@@ -0,0 +1,257 @@
+import math
+
+import numpy as np
+
+# Vectorized indicators over whole candle arrays (e.g. CandleStore.read or Panel columns).
+# Values are NaN until enough candles are available, the incremental counterparts in Indicators.Streaming
+# return the same values candle by candle.
+
+
+def _ewm(x, alpha, initial):
+    """
+    Exponentially weighted recursion y[i] = y[i-1] + alpha * (x[i] - y[i-1]) with y[-1] = initial
+
+    Evaluated in closed form over blocks short enough that the weights (1 - alpha) ** -k stay finite.
+    """
+    x = np.asarray(x, dtype='<f8')
+    out = np.empty(len(x))
+    decay = 1.0 - alpha
+    if decay <= 0.0:
+        out[:] = x
+        return out
+    block = max(1, min(len(x), int(200 * math.log(10) / -math.log(decay))))
+    k = np.arange(1, block + 1)
+    powers = decay ** k
+    previous = initial
+    for start in range(0, len(x), block):
+        chunk = x[start:start + block]
+        n = len(chunk)
+        # y[k] = decay^k * previous + alpha * sum_{i<=k} decay^(k-i) * x[i]
+        out[start:start + n] = powers[:n] * (previous + alpha * np.cumsum(chunk / powers[:n]))
+        previous = out[start + n - 1]
+    return out
+
+
+def _smoothed(x, period, alpha):
+    """
+    EMA seeded with the SMA of the first period values, NaN before
+    """
+    x = np.asarray(x, dtype='<f8')
+    out = np.full(len(x), np.nan)
+    if len(x) < period:
+        return out
+    out[period - 1] = x[:period].mean()
+    out[period:] = _ewm(x[period:], alpha, out[period - 1])
+    return out
+
+
+def sma(values, period):
+    """
+    Args:
+        values (np.ndarray): e.g. close prices
+        period (int): number of candles
+
+    Returns:
+        sma (np.ndarray): simple moving average, NaN for the first period - 1 candles
+    """
+    values = np.asarray(values, dtype='<f8')
+    out = np.full(len(values), np.nan)
+    if len(values) >= period:
+        sums = np.cumsum(np.r_[0.0, values])
+        out[period - 1:] = (sums[period:] - sums[:-period]) / period
+    return out
+
+
+def ema(values, period):
+    """
+    Exponential moving average with alpha = 2 / (period + 1), seeded with the SMA of the first period candles
+    """
+    return _smoothed(values, period, 2.0 / (period + 1))
+
+
+def rsi(close, period=14):
+    """
+    Relative strength index with Wilder's smoothing (alpha = 1 / period)
+
+    Returns:
+        rsi (np.ndarray): 0 to 100, NaN for the first period candles
+    """
+    close = np.asarray(close, dtype='<f8')
+    out = np.full(len(close), np.nan)
+    if len(close) <= period:
+        return out
+    change = np.diff(close)
+    gains = _smoothed(np.maximum(change, 0.0), period, 1.0 / period)
+    losses = _smoothed(np.maximum(-change, 0.0), period, 1.0 / period)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out[1:] = np.where(losses == 0, 100.0, 100.0 - 100.0 / (1.0 + gains / losses))
+    return out
+
+
+def true_range(high, low, close):
+    """
+    Returns:
+        true_range (np.ndarray): max(high - low, |high - previous close|, |low - previous close|),
+            high - low for the first candle
+    """
+    high, low, close = (np.asarray(a, dtype='<f8') for a in (high, low, close))
+    previous = np.r_[np.nan, close[:-1]]
+    return np.fmax(high - low, np.fmax(np.abs(high - previous), np.abs(low - previous)))
+
+
+def atr(high, low, close, period=14):
+    """
+    Average true range with Wilder's smoothing, NaN for the first period - 1 candles
+    """
+    return _smoothed(true_range(high, low, close), period, 1.0 / period)
+
+
+def adx(high, low, close, period=14):
+    """
+    Average directional index with Wilder's smoothing
+
+    Returns:
+        adx (np.ndarray): 0 to 100, NaN for the first 2 * period - 1 candles
+        plus_di (np.ndarray): +DI, NaN for the first period candles
+        minus_di (np.ndarray): -DI, NaN for the first period candles
+    """
+    high, low, close = (np.asarray(a, dtype='<f8') for a in (high, low, close))
+    n = len(close)
+    out, plus_di, minus_di = np.full(n, np.nan), np.full(n, np.nan), np.full(n, np.nan)
+    if n <= period:
+        return out, plus_di, minus_di
+
+    up, down = np.diff(high), -np.diff(low)
+    plus_dm = np.where((up > down) & (up > 0), up, 0.0)
+    minus_dm = np.where((down > up) & (down > 0), down, 0.0)
+    alpha = 1.0 / period
+    tr = _smoothed(true_range(high, low, close)[1:], period, alpha)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        plus_di[1:] = 100.0 * _smoothed(plus_dm, period, alpha) / tr
+        minus_di[1:] = 100.0 * _smoothed(minus_dm, period, alpha) / tr
+        total = plus_di + minus_di
+        dx = np.where(total == 0, 0.0, 100.0 * np.abs(plus_di - minus_di) / total)
+    out[period:] = _smoothed(dx[period:], period, alpha)
+    return out, plus_di, minus_di
+
+
+def vwap(high, low, close, volume, day):
+    """
+    Volume weighted average price of the typical price (high + low + close) / 3, restarting every day
+
+    Args:
+        day (np.ndarray): trading day per candle, e.g. Panel.day or Candles.local_days
+
+    Returns:
+        vwap (np.ndarray): NaN until the first candle of a day with volume
+    """
+    high, low, close, volume = (np.asarray(a, dtype='<f8') for a in (high, low, close, volume))
+    day = np.asarray(day)
+    price_volume = np.r_[0.0, np.cumsum((high + low + close) / 3.0 * volume)]
+    volumes = np.r_[0.0, np.cumsum(volume)]
+    starts = np.flatnonzero(np.r_[True, day[1:] != day[:-1]])
+    first = np.repeat(starts, np.diff(np.r_[starts, len(day)]))  # first candle of the day per candle
+    price_volume = price_volume[1:] - price_volume[first]
+    volumes = volumes[1:] - volumes[first]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(volumes > 0, price_volume / volumes, np.nan)
+
+
+def pivot_points(high, low, close):
+    """
+    Classic floor pivots of the next session from the high, low and close of a session
+
+    Args:
+        high, low, close (float or np.ndarray): e.g. daily candles, the result of row i applies to row i + 1
+
+    Returns:
+        levels (dict): 'pivot', 'r1', 'r2', 's1', 's2'
+    """
+    pivot = (high + low + close) / 3.0
+    return {'pivot': pivot,
+            'r1': 2 * pivot - low,
+            'r2': pivot + (high - low),
+            's1': 2 * pivot - high,
+            's2': pivot - (high - low)}
+
+
+def support_resistance(high, low, window=5, tolerance_pct=0.5, min_touches=2):
+    """
+    Local replacement of Finnhub.finnhub_get_support_resistance
+
+    Swing highs and lows (extremes of window candles on both sides) are clustered into levels if they are
+    within tolerance_pct of each other.
+
+    Args:
+        high, low (np.ndarray):
+        window (int): candles on each side of a swing point
+        tolerance_pct (float): max. distance in percent between swing points of the same level
+        min_touches (int): min. number of swing points of a level
+
+    Returns:
+        levels (list): sorted support and resistance levels
+    """
+    high, low = np.asarray(high, dtype='<f8'), np.asarray(low, dtype='<f8')
+    n = len(high)
+    if n < 2 * window + 1:
+        return []
+    middle = slice(window, n - window)
+    swing_high = np.ones(n - 2 * window, dtype=bool)
+    swing_low = np.ones(n - 2 * window, dtype=bool)
+    for k in range(1, window + 1):
+        swing_high &= (high[middle] >= high[window - k:n - window - k]) & \
+                      (high[middle] >= high[window + k:n - window + k])
+        swing_low &= (low[middle] <= low[window - k:n - window - k]) & (low[middle] <= low[window + k:n - window + k])
+
+    points = np.sort(np.r_[high[middle][swing_high], low[middle][swing_low]])
+    if not len(points):
+        return []
+    breaks = np.flatnonzero(np.diff(points) > points[:-1] * tolerance_pct / 100.0) + 1
+    clusters = np.split(points, breaks)
+    return [float(cluster.mean()) for cluster in clusters if len(cluster) >= min_touches]
+
+
+def aggregate_signal(high, low, close, adx_period=14, rsi_period=14, trending_adx=25.0):
+    """
+    Local replacement of Finnhub.finnhub_get_aggregate_indicators for the last candle
+
+    Every indicator votes buy, neutral or sell:
+        close vs. SMA 10/20/50/100/200 and EMA 10/20/50/100/200 (buy above, sell below)
+        RSI (buy below 30, sell above 70)
+        +DI vs. -DI
+
+    Returns:
+        indicators (dict): same structure as the Finnhub response
+            technicalAnalysis: {'count': {'buy', 'neutral', 'sell'}, 'signal': 'strong buy', 'buy', 'neutral',
+                                'sell' or 'strong sell'}
+            trend: {'adx': ADX reading, 'trending': ADX above trending_adx}
+    """
+    close = np.asarray(close, dtype='<f8')
+    last = close[-1]
+    votes = []
+    for period in (10, 20, 50, 100, 200):
+        for average in (sma(close, period)[-1], ema(close, period)[-1]):
+            if not np.isnan(average):
+                votes.append(np.sign(last - average))
+    last_rsi = rsi(close, rsi_period)[-1]
+    if not np.isnan(last_rsi):
+        votes.append(1 if last_rsi < 30 else (-1 if last_rsi > 70 else 0))
+    last_adx, plus_di, minus_di = (a[-1] for a in adx(high, low, close, adx_period))
+    if not np.isnan(plus_di):
+        votes.append(np.sign(plus_di - minus_di))
+
+    count = {'buy': sum(1 for v in votes if v > 0), 'neutral': sum(1 for v in votes if v == 0),
+             'sell': sum(1 for v in votes if v < 0)}
+    score = (count['buy'] - count['sell']) / float(len(votes)) if votes else 0.0
+    if score > 0.5:
+        signal = 'strong buy'
+    elif score > 0.1:
+        signal = 'buy'
+    elif score < -0.5:
+        signal = 'strong sell'
+    elif score < -0.1:
+        signal = 'sell'
+    else:
+        signal = 'neutral'
+    return {'technicalAnalysis': {'count': count, 'signal': signal},
+            'trend': {'adx': float(last_adx), 'trending': bool(last_adx > trending_adx)}}
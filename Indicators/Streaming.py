@@ -0,0 +1,176 @@
+import math
+from collections import deque
+
+# Incremental indicators for streaming candles (e.g. BarAggregator.on_bar), O(1) per update.
+# update() returns the current value, NaN until enough candles were seen, and matches the values of the
+# vectorized functions in Indicators.Indicators at the same candle.
+
+NAN = float('nan')
+
+
+class Smoothed:
+    """
+    EMA seeded with the SMA of the first period values
+
+    Args:
+        period (int):
+        alpha (float): weight of the newest value
+    """
+
+    def __init__(self, period, alpha):
+        self.period = period
+        self.alpha = alpha
+        self.count = 0
+        self.total = 0.0
+        self.value = NAN
+
+    def update(self, x):
+        self.count += 1
+        if self.count < self.period:
+            self.total += x
+        elif self.count == self.period:
+            self.value = (self.total + x) / self.period
+        else:
+            self.value += self.alpha * (x - self.value)
+        return self.value
+
+
+class SMA:
+
+    def __init__(self, period):
+        self.period = period
+        self.window = deque(maxlen=period)
+        self.total = 0.0
+        self.value = NAN
+
+    def update(self, x):
+        if len(self.window) == self.period:
+            self.total -= self.window[0]
+        self.window.append(x)
+        self.total += x
+        if len(self.window) == self.period:
+            self.value = self.total / self.period
+        return self.value
+
+
+class EMA(Smoothed):
+
+    def __init__(self, period):
+        super().__init__(period, 2.0 / (period + 1))
+
+
+class RSI:
+
+    def __init__(self, period=14):
+        self.gains = Smoothed(period, 1.0 / period)
+        self.losses = Smoothed(period, 1.0 / period)
+        self.previous = None
+        self.value = NAN
+
+    def update(self, close):
+        if self.previous is not None:
+            change = close - self.previous
+            gains, losses = self.gains.update(max(change, 0.0)), self.losses.update(max(-change, 0.0))
+            if not math.isnan(losses):
+                self.value = 100.0 if losses == 0 else 100.0 - 100.0 / (1.0 + gains / losses)
+        self.previous = close
+        return self.value
+
+
+class ATR:
+
+    def __init__(self, period=14):
+        self.average = Smoothed(period, 1.0 / period)
+        self.previous = None
+        self.value = NAN
+
+    def true_range(self, high, low, close):
+        if self.previous is None:
+            tr = high - low
+        else:
+            tr = max(high - low, abs(high - self.previous), abs(low - self.previous))
+        self.previous = close
+        return tr
+
+    def update(self, high, low, close):
+        self.value = self.average.update(self.true_range(high, low, close))
+        return self.value
+
+
+class ADX:
+    """
+    value: ADX, plus_di/minus_di: +DI/-DI
+    """
+
+    def __init__(self, period=14):
+        alpha = 1.0 / period
+        self.period = period
+        self.tr = Smoothed(period, alpha)
+        self.plus_dm = Smoothed(period, alpha)
+        self.minus_dm = Smoothed(period, alpha)
+        self.average = Smoothed(period, alpha)
+        self.atr = ATR(period)  # only used for the true range
+        self.previous = None
+        self.value = self.plus_di = self.minus_di = NAN
+
+    def update(self, high, low, close):
+        tr = self.atr.true_range(high, low, close)
+        if self.previous is not None:
+            up, down = high - self.previous[0], self.previous[1] - low
+            tr = self.tr.update(tr)
+            plus_dm = self.plus_dm.update(up if up > down and up > 0 else 0.0)
+            minus_dm = self.minus_dm.update(down if down > up and down > 0 else 0.0)
+            if not math.isnan(tr):
+                self.plus_di = 100.0 * plus_dm / tr if tr else NAN
+                self.minus_di = 100.0 * minus_dm / tr if tr else NAN
+                total = self.plus_di + self.minus_di
+                dx = 0.0 if total == 0 else 100.0 * abs(self.plus_di - self.minus_di) / total
+                self.value = self.average.update(dx)
+        self.previous = (high, low)
+        return self.value
+
+
+class VWAP:
+    """
+    Volume weighted average price of the typical price, restarting when the day changes
+    """
+
+    def __init__(self):
+        self.day = None
+        self.price_volume = 0.0
+        self.volume = 0.0
+        self.value = NAN
+
+    def update(self, high, low, close, volume, day):
+        if day != self.day:
+            self.day, self.price_volume, self.volume = day, 0.0, 0.0
+        self.price_volume += (high + low + close) / 3.0 * volume
+        self.volume += volume
+        self.value = self.price_volume / self.volume if self.volume > 0 else NAN
+        return self.value
+
+
+class Pivots:
+    """
+    Classic floor pivots of the current day from the high, low and close of the previous day
+    (see Indicators.pivot_points), None during the first day
+    """
+
+    def __init__(self):
+        self.day = None
+        self.session = None  # [high, low, close] of the current day
+        self.value = None
+
+    def update(self, high, low, close, day):
+        if day != self.day:
+            if self.session is not None:
+                h, l, c = self.session
+                pivot = (h + l + c) / 3.0
+                self.value = {'pivot': pivot, 'r1': 2 * pivot - l, 'r2': pivot + (h - l),
+                              's1': 2 * pivot - h, 's2': pivot - (h - l)}
+            self.day, self.session = day, [high, low, close]
+        else:
+            self.session[0] = max(self.session[0], high)
+            self.session[1] = min(self.session[1], low)
+            self.session[2] = close
+        return self.value
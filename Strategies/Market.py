@@ -1,8 +1,8 @@
 import time
 import logging
-from math import floor
+from math import floor, isnan
 
-from Brokers.Broker import Broker
+from Data_Providers.DataProvider import DataProvider
 from Strategies.Strategy import Strategy
 
 
@@ -12,11 +12,10 @@ class Market(Strategy):
         sell/short if market is negative at 11:00 NY Time
     """
 
-    def __init__(self, broker=Broker()):
-        super().__init__()
-        self.broker = broker  # override broker
+    def __init__(self, broker=None, data_api=None):
+        super().__init__(broker=broker)
+        self.data_api = data_api if data_api is not None else DataProvider()
         self.risk_pct = 1.0  # max percentage of the portfolio to allocate to any one position
-        self.symbols = self.symbols_market
         self.assets = {
             "SPY": {
                 "factor": 0.333,
@@ -24,7 +23,7 @@ class Market(Strategy):
                 "cash_to_allocate": 0.0,
                 "shares_to_order": 0.0
             },
-            "DJIA": {
+            "DIA": {
                 "factor": 0.333,
                 "latest_price": 0.0,
                 "cash_to_allocate": 0.0,
@@ -37,6 +36,11 @@ class Market(Strategy):
                 "shares_to_order": 0.0
             }
         }
+        self.trade_minute = 11 * 60  # 11:00 NY Time
+
+    @property
+    def symbols(self):
+        return self.symbols_market
 
     def calc_shares_to_order(self):
         """
@@ -44,23 +48,48 @@ class Market(Strategy):
 
         cash per asset to allocate = account cash * max risk per trade * factor of asset
         amount of shares to order per asset = floor(cash per asset to allocate / latest price)
+        no shares are ordered for an asset without a latest price
         """
         latest_prices = self.data_api.get_latest_price(self.symbols)
         for symbol in self.symbols:
-            self.assets[symbol]["latest_price"] = latest_prices[symbol]
             self.assets[symbol]["cash_to_allocate"] = self.cash * \
                                                       self.risk_pct * self.assets[symbol]["factor"]
+            if latest_prices[symbol] is None:
+                logging.warning("no latest price for " + symbol)
+                self.assets[symbol]["latest_price"] = 0.0
+                self.assets[symbol]["shares_to_order"] = 0
+                continue
+            self.assets[symbol]["latest_price"] = latest_prices[symbol]
             self.assets[symbol]["shares_to_order"] = floor(
                 self.assets[symbol]["cash_to_allocate"] / self.assets[symbol]["latest_price"])
 
-    def run(self):
+    def check_change_positive_daily(self, symbols):
+        """
+        Args:
+            symbols (list): symbol_market, the first symbol decides
+
+        Returns:
+            positive (bool): change to the previous close above market_positive_threshold_pct,
+                None if the quote is not available
+        """
+        try:
+            change_pct = self.data_api.finnhub_get_change_pct_prev_day(symbols[0])
+        except Exception as e:
+            logging.warning(symbols[0] + ": change to the previous day not available " + str(e))
+            return None
+        if isnan(change_pct):
+            return None
+        logging.info(symbols[0] + " change to the previous day: " + str(round(change_pct, 2)) + "%")
+        return change_pct > self.market_positive_threshold_pct
+
+    def run(self, session=None):
+        """
+        Trades once, at the time given by the caller, e.g. MarketScheduler.at_open(90, market.run)
+
+        Args:
+            session (Session): trading session passed by MarketScheduler
+        """
         logging.info("run start")
-        # self.broker.wait_to_trade()
-        # while True:
-        #    if self.broker.api.get_clock().is_open == False:
-        #        time.sleep(1)
-        #    else:
-        #        break
         logging.info("time to trade")
 
         # check if account is able to trade
@@ -80,12 +109,42 @@ class Market(Strategy):
 
         # check if market is positive or negative (buy or sell decision)
         market_positive = self.check_change_positive_daily(self.symbol_market)
+        if market_positive is None:
+            logging.critical("market change not available, no orders")
+            return
         if market_positive:
             side = 'buy'
         else:
             side = 'sell'
 
-        # order assets according to strategy
-        for key, value in self.assets.items():
-            self.broker.order_asset(
-                symbol=key, qty=value["shares_to_order"], side=side)
+        # order assets according to strategy, all at once
+        orders = [dict(symbol=key, qty=value["shares_to_order"], latest_price=value["latest_price"],
+                       take_profit_pct=self.take_profit_pct, side=side, stop_loss_pct=self.stop_loss_pct)
+                  for key, value in self.assets.items() if value["shares_to_order"] > 0]
+        self.broker.order_assets(orders)
+
+    def on_bar(self, panel, t):
+        """
+        Backtesting: decides on the candle ending at 11:00 NY Time (price vs. previous close of symbol_market),
+        positions are closed with the last candle of the day if neither take profit nor stop loss was hit
+        """
+        if panel.minute[t] + panel.frequency != self.trade_minute:
+            if panel.last_of_day[t]:
+                self.broker.close_all_positions()
+            return
+
+        j = panel.index[self.symbol_market[0]]
+        change_pct = (panel.close[t, j] / panel.previous_close(t, j) - 1) * 100
+        if isnan(change_pct):
+            return
+        side = 'buy' if change_pct > self.market_positive_threshold_pct else 'sell'
+
+        self.cash = self.broker.get_account_cash()
+        for symbol in self.symbols:
+            latest_price = panel.close[t, panel.index[symbol]]
+            if isnan(latest_price):
+                continue
+            shares_to_order = floor(self.cash * self.risk_pct * self.assets[symbol]["factor"] / latest_price)
+            self.broker.order_asset(symbol=symbol, qty=shares_to_order, latest_price=latest_price,
+                                    take_profit_pct=self.take_profit_pct, side=side,
+                                    stop_loss_pct=self.stop_loss_pct)
@@ -1,16 +1,125 @@
+import asyncio
 import logging
+from datetime import date
 
-from Brokers.Broker import Broker
+from Data_Providers.AsyncDataProvider import AsyncDataProvider
+from Strategies.Scanner import Scanner
 from Strategies.Strategy import Strategy
 
 
 # https://addisonlynch.github.io/iexfinance/stable/stocks.html#stocks-movers
 
 class Market_Movers(Strategy):
+    """
+        ranks a universe by change, gap, relative volume and momentum (see Scanner)
 
-    def __init__(self, broker=Broker()):
-        super().__init__()
-        self.broker = broker
+        The previous closes and average volumes come from the Polygon grouped daily snapshots
+        (SnapshotStore, no request), the intraday state from the Finnhub trade websocket. REST quotes are
+        only used for short lists, e.g. to confirm the top candidates (refresh).
 
-    def run(self):
-        pass
+    Nothing is requested before the first scan: the universe and the scanner are resolved on first use.
+
+    Args:
+        broker (Broker):
+        data_provider (DataProvider): source of the trade websocket and of the index constituents
+        snapshot_store (SnapshotStore): None to start without references
+        symbols (list): universe, None for the constituents of index_symbol
+                        (all symbols of the last snapshot if a snapshot_store is given)
+        index_symbol (str): see Finnhub.finnhub_get_index_symbols
+        top_k (int): length of the rankings
+        previous_days (int): days of the average volume
+    """
+
+    def __init__(self, broker=None, data_provider=None, snapshot_store=None, symbols=None, index_symbol='^GSPC',
+                 top_k=10, previous_days=20):
+        super().__init__(broker=broker)
+        self.data_provider = data_provider  # DataProvider
+        self.snapshot_store = snapshot_store
+        self.index_symbol = index_symbol
+        self.top_k = top_k
+        self.previous_days = previous_days
+        if symbols is None and data_provider is None and snapshot_store is None:
+            logging.critical("Market_Movers without symbols, data provider and snapshot store")
+            raise Exception('No universe found, symbols, a data provider or a snapshot store needed')
+        self.universe_checked = symbols
+        self.day = date.today().strftime('%Y-%m-%d')
+        self.scanner_instance = None
+        self.stream = None
+
+    @property
+    def universe(self):
+        """
+        Returns:
+            symbols (list): symbols to scan, the constituents of index_symbol are requested on first use,
+                None for all symbols of the last snapshot of the snapshot_store
+        """
+        if self.universe_checked is None and self.snapshot_store is None:
+            self.universe_checked = self.data_provider.finnhub_get_index_symbols(self.index_symbol)
+        return self.universe_checked
+
+    @property
+    def scanner(self):
+        if self.scanner_instance is None:
+            self.scanner_instance = self.build_scanner(self.day)
+        return self.scanner_instance
+
+    def build_scanner(self, day):
+        """
+        Returns:
+            scanner (Scanner): universe with the references of the snapshots before day
+        """
+        if self.snapshot_store is None:
+            return Scanner(self.universe)
+        return Scanner.from_snapshots(self.snapshot_store, day, self.previous_days, symbols=self.universe)
+
+    async def get_quotes(self, symbols):
+        async with AsyncDataProvider() as data_provider:
+            return await data_provider.get_quotes(symbols)
+
+    def refresh(self, symbols):
+        """
+        Updates the symbols with REST quotes (fetched concurrently within the Finnhub rate limits),
+        meant for a few symbols, e.g. the current top candidates
+        """
+        quotes = asyncio.run(self.get_quotes(symbols))
+        for symbol, quote in quotes.items():
+            self.scanner.update_quote(symbol, quote)
+
+    def follow(self, symbols=None):
+        """
+        Keeps the scanner up to date with every trade of the symbols (default the universe) from the shared
+        Finnhub trade websocket
+        """
+        if self.data_provider is None:
+            logging.critical("Market_Movers without data provider")
+            raise Exception('No data provider found, the trade websocket needs one')
+        if self.stream is None:
+            self.stream = self.data_provider.finnhub_stream()
+            # the scanner may be replaced on a new day, the listener always updates the current one
+            self.stream.add_listener(lambda trade: self.scanner.on_trade(trade))
+        self.stream.subscribe(symbols if symbols is not None else self.scanner.symbols)
+
+    def scan(self):
+        """
+        Returns:
+            rankings (dict): see Scanner.movers
+        """
+        return self.scanner.movers(self.top_k)
+
+    def run(self, session=None):
+        """
+        Logs the rankings, e.g. MarketScheduler.at_open(30, market_movers.run)
+
+        Args:
+            session (Session): trading session passed by MarketScheduler, a new day resets the references
+        """
+        logging.info("run start")
+        day = session.day.strftime('%Y-%m-%d') if session is not None else date.today().strftime('%Y-%m-%d')
+        if day != self.day:
+            self.day = day
+            self.scanner_instance = self.build_scanner(day)
+        self.follow()
+        rankings = self.scan()
+        for metric, ranking in rankings.items():
+            logging.info(metric + ": " + ", ".join(symbol + " " + str(round(value, 2)) for symbol, value in ranking))
+        return rankings
@@ -0,0 +1,211 @@
+import heapq
+import math
+import threading
+
+import numpy as np
+
+
+class Scanner:
+    """
+    Ranks a universe of symbols by intraday movement while quotes/trades stream in
+
+        change_pct --> last price vs. previous close in percent
+        gap_pct --> session open vs. previous close in percent
+        relative_volume --> session volume / average daily volume
+        momentum_pct --> last price vs. its exponentially time-weighted average in percent
+
+    Every update changes the state of one symbol in O(1) and pushes its new scores onto one max- and one
+    min-heap per metric. Outdated heap entries are skipped (and dropped) when a ranking is read, so a
+    ranking costs O(k log n) instead of sorting the universe. The heaps are rebuilt once they hold
+    many outdated entries. Updates may come from another thread, e.g. FinnhubStream listeners.
+
+    Args:
+        symbols (list): universe
+        previous_close (dict): symbol --> close of the previous session
+        average_volume (dict): symbol --> average daily volume
+        momentum_half_life (float): seconds after which a price weighs half in the momentum average
+    """
+
+    METRICS = ('change_pct', 'gap_pct', 'relative_volume', 'momentum_pct')
+
+    def __init__(self, symbols, previous_close=None, average_volume=None, momentum_half_life=300):
+        self.symbols = list(symbols)
+        self.index = {symbol: j for j, symbol in enumerate(self.symbols)}
+        n = len(self.symbols)
+        self.previous_close = np.full(n, np.nan)
+        self.average_volume = np.full(n, np.nan)
+        self.open = np.full(n, np.nan)
+        self.price = np.full(n, np.nan)
+        self.volume = np.zeros(n)
+        self.average_price = np.full(n, np.nan)
+        self.updated = np.full(n, np.nan)  # ts of the last update
+        self.version = np.zeros(n, dtype='<i8')
+        self.decay = math.log(2) / momentum_half_life
+        self.lock = threading.Lock()
+        self.heaps = {}
+        for symbol, close in (previous_close or {}).items():
+            self.set_reference(symbol, previous_close=close)
+        for symbol, volume in (average_volume or {}).items():
+            self.set_reference(symbol, average_volume=volume)
+        self._rebuild()
+
+    @classmethod
+    def from_snapshots(cls, store, day, previous_days, symbols=None, **kwargs):
+        """
+        Universe and references from a SnapshotStore: previous close of the last day before day and
+        average volume over up to previous_days days before day
+
+        Args:
+            store (SnapshotStore):
+            day (str): 'YYYY-MM-DD' of the session to scan
+            previous_days (int): days for the average volume
+            symbols (list): None for all symbols of the last snapshot before day
+        """
+        days = [stored for stored in store.days(end=day) if stored < day][-previous_days:]
+        if not days:
+            return cls(symbols or [], **kwargs)
+        last = store.cross_section(days[-1], symbols)
+        scanner = cls([symbol.decode() for symbol in last['symbol']], **kwargs)
+        scanner.previous_close[:] = last['close']
+        volumes = np.zeros(len(scanner.symbols))
+        counts = np.zeros(len(scanner.symbols))
+        for stored in days:
+            snapshot = store.cross_section(stored, scanner.symbols)
+            rows = np.array([scanner.index[symbol.decode()] for symbol in snapshot['symbol']], dtype='<i8')
+            volumes[rows] += snapshot['volume']
+            counts[rows] += 1
+        with np.errstate(invalid='ignore', divide='ignore'):
+            scanner.average_volume[:] = volumes / counts
+        scanner._rebuild()
+        return scanner
+
+    def set_reference(self, symbol, previous_close=None, average_volume=None):
+        j = self.index[symbol]
+        if previous_close is not None:
+            self.previous_close[j] = previous_close
+        if average_volume is not None:
+            self.average_volume[j] = average_volume
+
+    def start_session(self):
+        """
+        Starts a new session: the last prices become the previous closes, open and volume are reset
+        """
+        with self.lock:
+            traded = ~np.isnan(self.price)
+            self.previous_close[traded] = self.price[traded]
+            self.open[:] = np.nan
+            self.volume[:] = 0.0
+            self._rebuild()
+
+    def scores(self, j):
+        """
+        Returns:
+            scores (tuple): value of every metric (see METRICS) for symbol j, NaN if unknown
+        """
+        price, previous_close = self.price[j], self.previous_close[j]
+        average_volume = self.average_volume[j]
+        return ((price / previous_close - 1) * 100,
+                (self.open[j] / previous_close - 1) * 100,
+                self.volume[j] / average_volume if average_volume > 0 else math.nan,
+                (price / self.average_price[j] - 1) * 100)
+
+    def update(self, symbol, price, volume=0.0, ts=None, open_price=None):
+        """
+        Args:
+            symbol (str):
+            price (float): last price
+            volume (float): volume since the last update (trade size), not the session volume
+            ts (float): seconds since epoch
+            open_price (float): open of the session if known, otherwise the first price of the session
+        """
+        j = self.index.get(symbol)
+        if j is None or price is None or not price > 0:
+            return
+        with self.lock:
+            if open_price is not None:
+                self.open[j] = open_price
+            elif math.isnan(self.open[j]):
+                self.open[j] = price
+            if math.isnan(self.average_price[j]) or ts is None or math.isnan(self.updated[j]):
+                self.average_price[j] = price
+            else:
+                weight = 1.0 - math.exp(-self.decay * max(0.0, ts - self.updated[j]))
+                self.average_price[j] += weight * (price - self.average_price[j])
+            if ts is not None:
+                self.updated[j] = ts
+            self.price[j] = price
+            self.volume[j] += volume
+            self._push(j)
+
+    def update_quote(self, symbol, quote):
+        """
+        Args:
+            quote (dict): Finnhub quote, see Finnhub.finnhub_get_quote (c, o, pc, t)
+        """
+        if quote is None:
+            return
+        if quote.get('pc'):
+            self.set_reference(symbol, previous_close=quote['pc'])
+        self.update(symbol, quote.get('c'), ts=quote.get('t'), open_price=quote.get('o') or None)
+
+    def on_trade(self, trade):
+        """
+        FinnhubStream listener, see FinnhubStream.add_listener
+        """
+        self.update(trade.symbol, trade.price, volume=trade.volume, ts=trade.ts)
+
+    def _push(self, j):
+        self.version[j] += 1
+        version = int(self.version[j])
+        for metric, score in zip(self.METRICS, self.scores(j)):
+            if not math.isnan(score):
+                descending, ascending = self.heaps[metric]
+                heapq.heappush(descending, (-score, j, version))
+                heapq.heappush(ascending, (score, j, version))
+        if len(self.heaps['change_pct'][0]) > 4 * len(self.symbols) + 1024:
+            self._rebuild()
+
+    def _rebuild(self):
+        self.heaps = {metric: ([], []) for metric in self.METRICS}
+        for j in range(len(self.symbols)):
+            version = int(self.version[j])
+            for metric, score in zip(self.METRICS, self.scores(j)):
+                if not math.isnan(score):
+                    self.heaps[metric][0].append((-score, j, version))
+                    self.heaps[metric][1].append((score, j, version))
+        for descending, ascending in self.heaps.values():
+            heapq.heapify(descending)
+            heapq.heapify(ascending)
+
+    def top(self, metric='change_pct', k=10, ascending=False):
+        """
+        Args:
+            metric (str): see METRICS
+            k (int): number of symbols
+            ascending (bool): False for the largest values (e.g. gainers), True for the smallest (e.g. losers)
+
+        Returns:
+            ranking (list): (symbol, value) of the top k symbols, best first
+        """
+        with self.lock:
+            heap = self.heaps[metric][1 if ascending else 0]
+            ranking, valid = [], []
+            while heap and len(ranking) < k:
+                entry = heapq.heappop(heap)
+                score, j, version = entry
+                if version != self.version[j]:
+                    continue  # outdated, dropped
+                valid.append(entry)
+                ranking.append((self.symbols[j], float(score if ascending else -score)))
+            for entry in valid:
+                heapq.heappush(heap, entry)
+            return ranking
+
+    def movers(self, k=10):
+        """
+        Returns:
+            rankings (dict): metric --> top k (see top), plus 'losers' (smallest change_pct)
+        """
+        rankings = {metric: self.top(metric, k) for metric in self.METRICS}
+        rankings['losers'] = self.top('change_pct', k, ascending=True)
+        return rankings
@@ -3,18 +3,45 @@ from Brokers.Broker import Broker
 
 class Strategy:
 
-    def __init__(self, broker=Broker()):
+    def __init__(self, broker=None):
         self.stop_loss_pct = .95  # stop limit to default to
         self.take_profit_pct = 1.05  # take profit to default to
         self.risk_pct = 0.1  # max percentage of the portfolio to allocate to any one position
         self.market_positive_threshold_pct = 0.0  # value in pct at which the market is considered to be positive
 
-        self.broker = broker
+        self.broker = broker if broker is not None else Broker()
 
-        # SPX       --> SPY ETF
-        # DJIA      --> DIA ETF
-        # NASDAQ    --> QQQ ETF
-        self.symbols_market = self.broker.check_symbols(['SPY', 'DIA', 'QQQ'])
-        self.symbol_market = self.broker.check_symbols(['SPY'])
+        self.symbols_market_checked = None
+        self.symbol_market_checked = None
 
         self.cash = 0.0
+
+    @property
+    def symbols_market(self):
+        """
+        SPX       --> SPY ETF
+        DJIA      --> DIA ETF
+        NASDAQ    --> QQQ ETF
+
+        checked by the broker on first use
+        """
+        if self.symbols_market_checked is None:
+            self.symbols_market_checked = self.broker.check_symbols(['SPY', 'DIA', 'QQQ'])
+        return self.symbols_market_checked
+
+    @property
+    def symbol_market(self):
+        if self.symbol_market_checked is None:
+            self.symbol_market_checked = self.broker.check_symbols(['SPY'])
+        return self.symbol_market_checked
+
+    def on_bar(self, panel, t):
+        """
+        Backtesting hook, called by Backtesting.Backtest after candle t of the panel closed.
+        self.broker is a SimulatedBroker which fills orders at the open of the next candle.
+
+        Args:
+            panel (Panel): candles of all symbols of the backtest
+            t (int): row of the current candle
+        """
+        pass
@@ -1,13 +1,26 @@
+import asyncio
 import logging
 import time
 from pprint import pprint
 from datetime import datetime, timedelta
-import csv
 import sys, os
 
 from Brokers.Alpaca import Alpaca
+from Brokers.MarketScheduler import MarketScheduler
 from Strategies.Market import Market
 from Data_Providers.DataProvider import DataProvider
+from Data_Providers.RateLimiter import RateLimiter
+from Data_Providers.ResponseCache import ResponseCache, MemoryCache, SqliteCache
+from Data_Export.ExportEngine import ExportEngine
+from Data_Export.RangePlanner import RangePlanner, TradingCalendar
+from Data_Export.StoreSink import StoreSink
+from Data_Export.GroupedDailyIngest import GroupedDailyIngest
+from Data_Providers.BarAggregator import resample_stored
+from Data_Store.Adjustments import Adjustments
+from Data_Store.CandleMerge import CandleMerge
+from Data_Store.CandleStore import CandleStore
+from Data_Store.Manifest import Manifest
+from Data_Store.SnapshotStore import SnapshotStore
 
 # Setup global logger
 format = '%(asctime)s %(levelname)s: %(message)s'
@@ -21,136 +34,92 @@ formatter = logging.Formatter(format)
 handler.setFormatter(formatter)
 root.addHandler(handler)
 
+DATA_PATH = os.path.dirname(os.path.abspath(__file__)) + '/Data'
 
-def export_historical_data(data_provider, data_provider_name, symbols, frequencies, _from, _to):
+
+def export_historical_data(data_provider, data_provider_name, symbols, frequencies, _from, _to, max_workers=4):
     """
+    Exports the candles of all symbols and frequencies from the first session until today.
+    The window is split into the largest ranges the data provider returns per call, skipping weekends
+    and market holidays. The requests run concurrently, governed by the documented rate limits of the
+    data provider. Days already recorded in the manifest (Data/manifest.json) are skipped, i.e. an
+    interrupted export resumes where it stopped and a rerun only fetches the missing days.
 
     Args:
         data_provider (Data_Provider object):
         data_provider_name(str):
         symbols (list):
         frequencies (list):
-        _to (int):
-        _from (int):
+        _to (int or datetime): end of the first session, seconds since epoch (Finnhub) or datetime (TDAmeritrade)
+        _from (int or datetime): start of the first session, seconds since epoch (Finnhub) or datetime (TDAmeritrade)
+        max_workers (int): number of concurrent requests
     """
-    _from_default = _from
-    _to_default = _to
-    now_finnhub = DataProvider.finnhub_seconds_since_epoch(datetime.now())
-    now_tdameritrade = datetime.now()
+    if data_provider_name == 'Finnhub':
+        _from, _to = datetime.utcfromtimestamp(_from), datetime.utcfromtimestamp(_to)
+        now = datetime.utcnow()
 
-    for frequency in frequencies:
-        for symbol in symbols:
-            logging.info("Symbol: " + symbol)
-            _from = _from_default
-            _to = _to_default
-            filename = os.path.dirname(os.path.abspath(__file__)) + \
-                       '/Data/' + data_provider_name + '/' + str(frequency) + 'min/' + symbol + '.csv'
-            with open(filename, mode='w') as csv_file:
-                fieldnames = ['symbol', 'frequency', 'ts', 'ts_utc', 'ts_ny', 'ts_zurich', 'open', 'high', 'close',
-                              'volume']
-                writer = csv.DictWriter(csv_file, fieldnames=fieldnames)
-                writer.writeheader()
-
-                # Finnhub
-                if data_provider_name == 'Finnhub':
-                    while _to < now_finnhub:
-                        resp = data_provider.finnhub_get_stock_candles(symbol=symbol, _from=_from, _to=_to,
-                                                                       resolution=frequency)
-                        if resp is not None:
-                            mapped_response = data_provider.map_finnhub_response(resp,
-                                                                                 symbol=symbol,
-                                                                                 frequency=frequency)
-                            logging.info(mapped_response[0]['ts_ny'])
-                            for candle in mapped_response:
-                                writer.writerow(
-                                    {'symbol': symbol,
-                                     'frequency': frequency,
-                                     'ts': candle['ts'],
-                                     'ts_utc': candle['ts_utc'],
-                                     'ts_ny': candle['ts_ny'],
-                                     'ts_zurich': candle['ts_zurich'],
-                                     'open': candle['open'],
-                                     'high': candle['high'],
-                                     'close': candle['close'],
-                                     'volume': candle['volume']
-                                     })
-                        _from = DataProvider.finnhub_seconds_since_epoch(
-                            datetime.fromtimestamp(_from) + timedelta(days=1))
-                        _to = DataProvider.finnhub_seconds_since_epoch(datetime.fromtimestamp(_to) + timedelta(days=1))
-                        time.sleep(1)
-
-                # TDAmeritrade
-                if data_provider_name == 'TDAmeritrade':
-                    while _to < now_tdameritrade:
-                        if frequency == 1:
-                            frequency = data_provider.tda_client.PriceHistory.Frequency.EVERY_MINUTE
-                        elif frequency == 5:
-                            frequency = data_provider.tda_client.PriceHistory.Frequency.EVERY_FIVE_MINUTES
-                        elif frequency == 15:
-                            frequency = data_provider.tda_client.PriceHistory.Frequency.EVERY_FIFTEEN_MINUTES
-                        elif frequency == 30:
-                            frequency = data_provider.tda_client.PriceHistory.Frequency.EVERY_THIRTY_MINUTES
-                        else:
-                            logging.critical(frequency)
-                            raise Exception('Unknown frequency found')
-
-                        resp = data_provider.tdameritrade_client_get_price_history(symbol=symbol,
-                                                                                   period_type=None,
-                                                                                   period=None,
-                                                                                   frequency_type=data_provider.tda_client.PriceHistory.FrequencyType.MINUTE,
-                                                                                   startDate=_from,
-                                                                                   endDate=_to,
-                                                                                   frequency=frequency)
-
-                        if frequency == data_provider.tda_client.PriceHistory.Frequency.EVERY_MINUTE:
-                            frequency = 1
-                        elif frequency == data_provider.tda_client.PriceHistory.Frequency.EVERY_FIVE_MINUTES:
-                            frequency = 5
-                        elif frequency == data_provider.tda_client.PriceHistory.Frequency.EVERY_FIFTEEN_MINUTES:
-                            frequency = 15
-                        elif frequency == data_provider.tda_client.PriceHistory.Frequency.EVERY_THIRTY_MINUTES:
-                            frequency = 30
-                        else:
-                            logging.critical(frequency)
-                            raise Exception('Unknown frequency found')
-
-                        if resp is not None:
-                            mapped_response = data_provider.map_tdameritrade_response(resp, symbol=symbol,
-                                                                                      frequency=frequency)
-                            for candle in mapped_response:
-                                writer.writerow(
-                                    {'symbol': symbol,
-                                     'frequency': frequency,
-                                     'ts': candle['ts'],
-                                     'ts_utc': candle['ts_utc'],
-                                     'ts_ny': candle['ts_ny'],
-                                     'ts_zurich': candle['ts_zurich'],
-                                     'open': candle['open'],
-                                     'high': candle['high'],
-                                     'close': candle['close'],
-                                     'volume': candle['volume']
-                                     })
-
-                        _from = _from + timedelta(days=1)
-                        _to = _to + timedelta(days=1)
-                        time.sleep(0.5)
+        def make_range(first_day, last_day):
+            return (DataProvider.finnhub_seconds_since_epoch(datetime.combine(first_day, _from.time())),
+                    DataProvider.finnhub_seconds_since_epoch(datetime.combine(last_day, _to.time())))
+    else:
+        now = datetime.now()
+
+        def make_range(first_day, last_day):
+            return datetime.combine(first_day, _from.time()), datetime.combine(last_day, _to.time())
+
+    # only sessions which already ended
+    last_day = now.date() if datetime.combine(now.date(), _to.time()) < now else now.date() - timedelta(days=1)
+
+    def fetch(task):
+        return data_provider.get_candles(task.data_provider_name, symbol=task.symbol, frequency=task.frequency,
+                                         _from=task.start, _to=task.end)
+
+    try:
+        holidays = data_provider.polygon_get_market_holidays() or []
+    except Exception as e:
+        logging.warning(e)
+        holidays = []
+    planner = RangePlanner(TradingCalendar(extra_holidays=holidays))
+
+    manifest = Manifest(DATA_PATH + '/manifest.json')
+    tasks = planner.tasks(data_provider_name, symbols, frequencies, first=_from.date(), last=last_day,
+                          make_range=make_range, manifest=manifest)
+    logging.info(str(len(tasks)) + " requests to export")
+
+    engine = ExportEngine(fetch=fetch,
+                          rate_limiter=RateLimiter(DataProvider.rate_limits(data_provider_name)),
+                          max_workers=max_workers)
+    sink = StoreSink(CandleStore(DATA_PATH), manifest=manifest)
+    failed = engine.run(tasks, sink)
+    if failed:
+        logging.warning(str(len(failed)) + " requests failed")
 
 
 def main():
-    data_provider = DataProvider()
+    # candles are kept in the CandleStore and the manifest prevents refetching them, i.e. caching the
+    # history responses would only duplicate them in memory and on disk
+    data_provider = DataProvider(response_cache=ResponseCache([MemoryCache(), SqliteCache(DATA_PATH + '/cache.sqlite')],
+                                                              ttls={'tdameritrade/pricehistory': 0,
+                                                                    'finnhub/stock/candle': 0}))
 
     if True:
         # TDAmeritrade export historical data
         _from = datetime.strptime('2020-09-01 09:30:00', '%Y-%m-%d %H:%M:%S')
         _to = datetime.strptime('2020-09-01 16:00:00', '%Y-%m-%d %H:%M:%S')
 
+        symbols = data_provider.finnhub_get_index_symbols('^NDX')
         export_historical_data(data_provider=data_provider,
                                data_provider_name='TDAmeritrade',
-                               symbols=data_provider.finnhub_get_index_symbols('^NDX'),
-                               frequencies=[1, 5, 15, 30],
+                               symbols=symbols,
+                               frequencies=[1],
                                _from=_from,
                                _to=_to)
 
+        # 5, 15 and 30 minute candles are derived from the 1 minute candles instead of being downloaded
+        store = CandleStore(DATA_PATH)
+        for symbol in symbols:
+            resample_stored(store, 'TDAmeritrade', symbol, frequencies=[5, 15, 30])
+
     if False:
         # Finnhub export historical data
         # 09:30 us_eastern --> 13:30 utc
@@ -165,6 +134,31 @@ def main():
                                _from=_from,
                                _to=_to)
 
+    if False:
+        # one series per symbol from both exports: TDAmeritrade, gaps and outliers filled from Finnhub
+        # Finnhub candles are unadjusted, they are split adjusted like the TDAmeritrade ones before the comparison
+        adjustments = Adjustments(DATA_PATH)
+        for symbol in CandleStore(DATA_PATH).symbols('Finnhub', 1):
+            adjustments.update_from_polygon(data_provider, symbol)
+        CandleMerge(CandleStore(DATA_PATH), primary='TDAmeritrade', secondary='Finnhub',
+                    adjustments=adjustments).merge_all(frequency=1)
+
+    if False:
+        # Polygon daily candles of all US stocks, one request per trading day
+        ingest = GroupedDailyIngest(data_provider, SnapshotStore(DATA_PATH))
+        ingest.ingest(first=datetime(2020, 1, 1).date(), last=datetime.now().date() - timedelta(days=1))
+
+    if False:
+        # live trading: the calendar is loaded once, the strategies run at their times on one event loop
+        alpaca = Alpaca()
+        market = Market(broker=alpaca, data_api=data_provider)
+        scheduler = MarketScheduler(api=alpaca.api)
+        scheduler.at_open(90, market.run)
+        try:
+            asyncio.run(scheduler.run())
+        finally:
+            alpaca.close()
+
 
 if __name__ == "__main__":
     try:
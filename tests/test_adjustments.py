@@ -0,0 +1,116 @@
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from Data_Providers.Candles import CANDLE_DTYPE
+from Data_Store.Adjustments import Adjustments, AdjustedStore, ACTION_DTYPE, ADJUSTED, SPLIT_ADJUSTED, epoch_day
+from Data_Store.CandleStore import CandleStore
+
+DAYS = ['2020-01-02', '2020-01-03', '2020-01-06']
+
+
+def candles(closes, volume=100.0):
+    """
+    Returns:
+        candles (np.ndarray): one candle at 10:00 New York per day of DAYS
+    """
+    ts = [epoch_day(day) * 86400 + 15 * 3600 for day in DAYS]
+    return np.array([(t, close, close, close, close, volume) for t, close in zip(ts, closes)], dtype=CANDLE_DTYPE)
+
+
+class TestAdjustedStore(unittest.TestCase):
+    """
+    dividend of 40 on 2020-01-03 (as traded close before: 500), 4:1 split on 2020-01-06
+
+        Finnhub (raw): 500, 460, 115
+        TDAmeritrade (split adjusted): 125, 115, 115
+    """
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.store = CandleStore(self.path)
+        self.store.write('Finnhub', 1, 'AAPL', candles([500.0, 460.0, 115.0]))
+        self.store.write('TDAmeritrade', 1, 'AAPL', candles([125.0, 115.0, 115.0], volume=400.0))
+        self.adjustments = Adjustments(self.path)
+        self.adjustments.add_dividend('AAPL', DAYS[1], 40.0)
+        self.adjustments.add_split('AAPL', DAYS[2], 4.0)
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def closes(self, provider, basis):
+        return AdjustedStore(self.store, self.adjustments, basis=basis).read(provider, 1, 'AAPL')['close'].tolist()
+
+    def test_table(self):
+        actions = self.adjustments.actions('AAPL')
+        self.assertEqual(actions.dtype, ACTION_DTYPE)
+        self.assertEqual(actions['day'].tolist(), [epoch_day(DAYS[1]), epoch_day(DAYS[2])])
+        self.assertEqual(actions['split'].tolist(), [1.0, 4.0])
+        reloaded = Adjustments(self.path).actions('AAPL')
+        for column in ('day', 'split', 'dividend'):
+            self.assertEqual(reloaded[column].tolist(), actions[column].tolist())
+        self.assertTrue(np.isnan(reloaded['previous_close']).all())
+
+    def test_split_adjusted(self):
+        self.assertEqual(self.closes('Finnhub', SPLIT_ADJUSTED), [125.0, 115.0, 115.0])
+        self.assertEqual(self.closes('TDAmeritrade', SPLIT_ADJUSTED), [125.0, 115.0, 115.0])
+
+    def test_adjusted_is_the_same_for_both_bases(self):
+        np.testing.assert_allclose(self.closes('Finnhub', ADJUSTED), [115.0, 115.0, 115.0])
+        np.testing.assert_allclose(self.closes('TDAmeritrade', ADJUSTED), [115.0, 115.0, 115.0])
+
+    def test_volumes(self):
+        adjusted = AdjustedStore(self.store, self.adjustments)
+        self.assertEqual(adjusted.read('Finnhub', 1, 'AAPL')['volume'].tolist(), [400.0, 400.0, 100.0])
+        self.assertEqual(adjusted.read('TDAmeritrade', 1, 'AAPL')['volume'].tolist(), [400.0, 400.0, 400.0])
+
+    def test_new_action_invalidates_the_factors(self):
+        adjusted = AdjustedStore(self.store, self.adjustments, basis=SPLIT_ADJUSTED)
+        self.assertEqual(adjusted.read_day('Finnhub', 1, 'AAPL', DAYS[0])['close'].tolist(), [125.0])
+        self.adjustments.add_split('AAPL', DAYS[1], 0.5)
+        self.assertEqual(adjusted.read_day('Finnhub', 1, 'AAPL', DAYS[0])['close'].tolist(), [250.0])
+        self.assertEqual(self.store.read_day('Finnhub', 1, 'AAPL', DAYS[0])['close'].tolist(), [500.0])
+
+    def test_reverse_split(self):
+        self.adjustments.add_split('MSFT', DAYS[1], 0.1)
+        self.store.write('Finnhub', 1, 'MSFT', candles([1.0, 10.0, 10.0]))
+        adjusted = AdjustedStore(self.store, self.adjustments, basis=SPLIT_ADJUSTED)
+        self.assertEqual(adjusted.read('Finnhub', 1, 'MSFT')['close'].tolist(), [10.0, 10.0, 10.0])
+
+    def test_split_after_the_fetch_day(self):
+        self.store.write('TDAmeritrade', 1, 'TSLA', candles([100.0, 100.0, 50.0])[:1], fetched=DAYS[0])
+        self.adjustments.add_split('TSLA', DAYS[2], 2.0)
+        # gap fill of an older day and the new day after the split, both already split adjusted
+        self.store.write('TDAmeritrade', 1, 'TSLA', candles([100.0, 50.0, 50.0], volume=200.0)[1:], fetched=DAYS[2])
+        self.assertEqual(self.store.fetched('TDAmeritrade', 1, 'TSLA', DAYS[0]), DAYS[0])
+        adjusted = AdjustedStore(self.store, self.adjustments, basis=SPLIT_ADJUSTED).read('TDAmeritrade', 1, 'TSLA')
+        self.assertEqual(adjusted['close'].tolist(), [50.0, 50.0, 50.0])
+        self.assertEqual(adjusted['volume'].tolist(), [200.0, 200.0, 200.0])
+
+    def test_refetch_replaces_the_partition(self):
+        self.store.write('TDAmeritrade', 1, 'TSLA', candles([100.0])[:1], fetched=DAYS[0])
+        self.store.write('TDAmeritrade', 1, 'TSLA', candles([50.0])[:1], fetched=DAYS[2])
+        self.assertEqual(self.store.read('TDAmeritrade', 1, 'TSLA')['close'].tolist(), [50.0])
+        self.assertEqual(self.store.fetched('TDAmeritrade', 1, 'TSLA', DAYS[0]), DAYS[2])
+
+    def test_dividend_before_a_split_after_the_fetch_day(self):
+        # TDAmeritrade fetched before the split, i.e. as traded: 500, 460, then split adjusted: 115
+        self.store.write('TDAmeritrade', 1, 'IBM', candles([500.0, 460.0, 115.0])[:2], fetched=DAYS[1])
+        self.store.write('TDAmeritrade', 1, 'IBM', candles([500.0, 460.0, 115.0])[2:], fetched=DAYS[2])
+        self.adjustments.add_dividend('IBM', DAYS[1], 40.0)
+        self.adjustments.add_split('IBM', DAYS[2], 4.0)
+        adjusted = AdjustedStore(self.store, self.adjustments).read('TDAmeritrade', 1, 'IBM')
+        np.testing.assert_allclose(adjusted['close'], [115.0, 115.0, 115.0])
+
+    def test_unknown_basis(self):
+        self.store.write('Other', 1, 'AAPL', candles([1.0, 1.0, 1.0]))
+        with self.assertRaises(Exception):
+            AdjustedStore(self.store, self.adjustments).read('Other', 1, 'AAPL')
+        with self.assertRaises(Exception):
+            AdjustedStore(self.store, self.adjustments, basis='raw')
+
+
+if __name__ == '__main__':
+    unittest.main()
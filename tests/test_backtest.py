@@ -0,0 +1,81 @@
+import unittest
+
+import numpy as np
+
+from Backtesting.Backtest import market_direction_vectorized
+from Backtesting.Panel import Panel
+
+try:
+    from Backtesting.Backtest import Backtest
+    from Brokers.SimulatedBroker import SimulatedBroker
+    from Strategies.Market import Market
+except ImportError:  # brokers and data providers need config.py with the api keys, which is not part of the repository
+    Market = None
+
+# 2020-01-13 09:30 New York
+OPEN_TS = 1578925800
+SYMBOLS = ['SPY', 'DIA', 'QQQ']
+WEIGHTS = {symbol: 0.333 for symbol in SYMBOLS}
+
+
+def day(closes, highs=None, lows=None):
+    """
+    Returns:
+        candles (list): 13 candles of 30 minutes as (open, high, low, close), opening at the previous close
+    """
+    opens = [closes[0]] + closes[:-1]
+    highs = highs or [max(o, c) for o, c in zip(opens, closes)]
+    lows = lows or [min(o, c) for o, c in zip(opens, closes)]
+    return list(zip(opens, highs, lows, closes))
+
+
+def panel():
+    """
+    Returns:
+        panel (Panel): 3 days of 30 minute candles, the same for all SYMBOLS
+            day 0: flat, no previous close --> no trade
+            day 1: up at 11:00 --> buy at 101, take profit at 106.05
+            day 2: down at 11:00 --> sell at 100, closed at 99
+    """
+    flat = day([100.0] * 13)
+    up = day([100.0, 100.0, 101.0] + [101.0] * 10)
+    up[6] = (101.0, 106.5, 101.0, 101.0)
+    down = day([101.0, 101.0, 100.0] + [100.0] * 9 + [99.0])
+    candles = np.array(flat + up + down)
+    ts = np.concatenate([OPEN_TS + d * 86400 + 1800 * np.arange(13) for d in range(3)])
+    fields = {field: np.repeat(candles[:, [i]], len(SYMBOLS), axis=1)
+              for i, field in enumerate(('open', 'high', 'low', 'close'))}
+    fields['volume'] = np.ones((len(ts), len(SYMBOLS)))
+    return Panel(SYMBOLS, ts, fields, frequency=30)
+
+
+class TestMarketDirectionVectorized(unittest.TestCase):
+
+    def test_returns(self):
+        result = market_direction_vectorized(panel(), 'SPY', WEIGHTS)
+        np.testing.assert_allclose(result['daily_returns'], [0.0, 0.999 * 0.05, 0.999 * 0.01])
+        self.assertEqual(result['days'], 3)
+
+    def test_trade_minute_outside_of_the_session(self):
+        for trade_minute in (9 * 60 + 30, 9 * 60, 16 * 60, 17 * 60):
+            with self.assertRaises(Exception):
+                market_direction_vectorized(panel(), 'SPY', WEIGHTS, trade_minute=trade_minute)
+        # first and last possible decision
+        market_direction_vectorized(panel(), 'SPY', WEIGHTS, trade_minute=10 * 60)
+        market_direction_vectorized(panel(), 'SPY', WEIGHTS, trade_minute=15 * 60 + 30)
+
+    @unittest.skipIf(Market is None, 'config.py not found')
+    def test_same_as_the_event_driven_backtest(self):
+        strategy = Market(broker=SimulatedBroker(cash=100000.0), data_api=object())
+        events = Backtest(strategy, panel()).run()
+        vectorized = market_direction_vectorized(panel(), 'SPY', WEIGHTS, trade_minute=strategy.trade_minute,
+                                                 take_profit_pct=strategy.take_profit_pct,
+                                                 stop_loss_pct=strategy.stop_loss_pct, risk_pct=strategy.risk_pct)
+        # the event-driven backtest orders whole shares
+        np.testing.assert_allclose(events['daily_equity'], vectorized['daily_equity'], rtol=1e-3)
+        self.assertEqual([reason for ts, symbol, qty, price, reason in events['trades']],
+                         ['entry'] * 3 + ['take_profit'] * 3 + ['entry'] * 3 + ['close'] * 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+import shutil
+import tempfile
+import unittest
+from collections import namedtuple
+
+import numpy as np
+
+from Data_Providers.BarAggregator import BarAggregator, resample, resample_stored
+from Data_Providers.Candles import CANDLE_DTYPE
+from Data_Store.CandleStore import CandleStore
+
+# 2020-01-13 09:30 New York (UTC-5), 2020-07-13 09:30 New York (UTC-4)
+WINTER = 1578925800
+SUMMER = 1594647000
+
+# same fields as FinnhubStream.Trade, which needs websocket-client
+Trade = namedtuple('Trade', ['symbol', 'price', 'volume', 'ts'])
+
+
+def minutes(start, first, count, seed=0):
+    """
+    Returns:
+        candles (np.ndarray): count random 1 minute candles from first minutes after start on
+    """
+    random = np.random.RandomState(seed)
+    candles = np.zeros(count, dtype=CANDLE_DTYPE)
+    candles['ts'] = start + 60 * (first + np.arange(count))
+    candles['open'] = 100 + random.rand(count)
+    candles['close'] = 100 + random.rand(count)
+    candles['high'] = np.maximum(candles['open'], candles['close']) + random.rand(count)
+    candles['low'] = np.minimum(candles['open'], candles['close']) - random.rand(count)
+    candles['volume'] = random.randint(1, 100, count)
+    return candles
+
+
+class TestResample(unittest.TestCase):
+
+    def test_five_minutes(self):
+        candles = minutes(WINTER, 0, 10)
+        bars = resample(candles, 5)
+        self.assertEqual(bars['ts'].tolist(), [WINTER, WINTER + 300])
+        self.assertEqual(bars['open'].tolist(), [candles['open'][0], candles['open'][5]])
+        self.assertEqual(bars['close'].tolist(), [candles['close'][4], candles['close'][9]])
+        self.assertEqual(bars['high'][0], candles['high'][:5].max())
+        self.assertEqual(bars['low'][1], candles['low'][5:].min())
+        self.assertEqual(bars['volume'].tolist(), [candles['volume'][:5].sum(), candles['volume'][5:].sum()])
+
+    def test_aligned_to_the_session_in_local_time(self):
+        # extended hours are dropped, 30 minute candles start at 09:30, 10:00, ... also in summer time
+        for start in (WINTER, SUMMER):
+            candles = minutes(start, -30, 30 + 390 + 30)
+            bars = resample(candles, 30)
+            self.assertEqual(len(bars), 13)
+            self.assertEqual(bars['ts'][0], start)
+            self.assertEqual(bars['ts'][-1], start + 360 * 60)
+            self.assertEqual(bars['volume'].sum(), candles['volume'][30:-30].sum())
+
+    def test_gaps_and_days(self):
+        candles = np.concatenate([minutes(WINTER, 3, 1), minutes(WINTER, 7, 1), minutes(WINTER + 86400, 0, 1)])
+        bars = resample(candles, 5)
+        self.assertEqual(bars['ts'].tolist(), [WINTER, WINTER + 300, WINTER + 86400])
+        self.assertEqual(bars['open'].tolist(), candles['open'].tolist())
+
+    def test_empty(self):
+        self.assertEqual(len(resample(np.empty(0, dtype=CANDLE_DTYPE), 5)), 0)
+
+    def test_resample_stored(self):
+        path = tempfile.mkdtemp()
+        try:
+            store = CandleStore(path)
+            store.write('TDAmeritrade', 1, 'AAPL', minutes(WINTER, 0, 390), fetched='2020-01-14')
+            self.assertEqual(resample_stored(store, 'TDAmeritrade', 'AAPL', frequencies=(5, 30)), 1)
+            self.assertEqual(len(store.read('TDAmeritrade', 5, 'AAPL')), 78)
+            self.assertEqual(len(store.read('TDAmeritrade', 30, 'AAPL')), 13)
+            # derived candles have the fetch day of their source
+            self.assertEqual(store.fetched('TDAmeritrade', 30, 'AAPL', '2020-01-13'), '2020-01-14')
+        finally:
+            shutil.rmtree(path)
+
+
+class TestBarAggregator(unittest.TestCase):
+
+    def test_same_as_resample(self):
+        candles = minutes(SUMMER, -10, 400)
+        aggregator = BarAggregator(frequencies=(1, 5, 15, 30))
+        for candle in candles:
+            aggregator.add_candle('AAPL', candle)
+        aggregator.flush()
+        for frequency in (1, 5, 15, 30):
+            bars = np.array([candle for symbol, f, candle in aggregator.completed if f == frequency],
+                            dtype=CANDLE_DTYPE)
+            expected = resample(candles, frequency)
+            for column in CANDLE_DTYPE.names:
+                np.testing.assert_allclose(bars[column], expected[column], err_msg=column + str(frequency))
+
+    def test_trades(self):
+        bars = []
+        aggregator = BarAggregator(frequencies=(1,), on_bar=lambda symbol, frequency, candle: bars.append(candle))
+        aggregator.add_trade(Trade('AAPL', 10.0, 5, WINTER + 1))
+        aggregator.add_trade(Trade('AAPL', 11.0, 1, WINTER + 20))
+        aggregator.add_trade(Trade('AAPL', 9.5, 2, WINTER + 59))
+        self.assertEqual(bars, [])
+        aggregator.add_trade(Trade('AAPL', 10.0, 1, WINTER + 61))
+        self.assertEqual(bars, [(WINTER, 10.0, 11.0, 9.5, 9.5, 8)])
+
+    def test_symbols_are_independent(self):
+        aggregator = BarAggregator(frequencies=(1,))
+        aggregator.add_trade(Trade('AAPL', 10.0, 1, WINTER))
+        aggregator.add_trade(Trade('MSFT', 20.0, 1, WINTER + 70))
+        self.assertEqual(aggregator.completed, [])
+        aggregator.flush()
+        self.assertEqual(sorted(symbol for symbol, frequency, candle in aggregator.completed), ['AAPL', 'MSFT'])
+
+    def test_close_due(self):
+        aggregator = BarAggregator(frequencies=(1, 5))
+        aggregator.add_trade(Trade('AAPL', 10.0, 1, WINTER + 10))
+        aggregator.close_due(WINTER + 59)
+        self.assertEqual(aggregator.completed, [])
+        aggregator.close_due(WINTER + 60)
+        self.assertEqual(aggregator.completed, [('AAPL', 1, (WINTER, 10.0, 10.0, 10.0, 10.0, 1))])
+        aggregator.close_due(WINTER + 300)
+        self.assertEqual([frequency for symbol, frequency, candle in aggregator.completed], [1, 5])
+
+    def test_late_trade_after_close_due_is_dropped(self):
+        aggregator = BarAggregator(frequencies=(1,))
+        aggregator.add_trade(Trade('AAPL', 10.0, 1, WINTER + 10))
+        aggregator.close_due(WINTER + 61)
+        aggregator.add_trade(Trade('AAPL', 12.0, 1, WINTER + 30))
+        aggregator.flush()
+        self.assertEqual(aggregator.completed, [('AAPL', 1, (WINTER, 10.0, 10.0, 10.0, 10.0, 1))])
+
+    def test_outside_of_the_session(self):
+        aggregator = BarAggregator(frequencies=(30,))
+        aggregator.add_trade(Trade('AAPL', 10.0, 1, WINTER - 60))
+        aggregator.add_trade(Trade('AAPL', 10.0, 1, WINTER + 390 * 60))
+        aggregator.flush()
+        self.assertEqual(aggregator.completed, [])
+
+    def test_last_candle_of_the_session_closes_at_the_session_end(self):
+        # 09:30 + 6 * 60 minutes = 15:30, the 45 minute candle ends at 16:00 instead of 16:15
+        aggregator = BarAggregator(frequencies=(45,))
+        aggregator.add_trade(Trade('AAPL', 10.0, 1, WINTER + 375 * 60))
+        aggregator.close_due(WINTER + 390 * 60)
+        self.assertEqual(len(aggregator.completed), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
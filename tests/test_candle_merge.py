@@ -0,0 +1,132 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import numpy as np
+
+from Data_Providers.Candles import CANDLE_DTYPE
+from Data_Store.Adjustments import Adjustments, epoch_day
+from Data_Store.CandleMerge import CandleMerge, merge_day, PRIMARY, SECONDARY, FILLED, REPLACED, DISAGREE
+from Data_Store.CandleStore import CandleStore
+
+# 2020-01-13 09:30 New York
+OPEN_TS = 1578925800
+
+
+def candles(rows, day=0):
+    """
+    Args:
+        rows (list): (minute after 09:30, open, high, low, close)
+    """
+    return np.array([(OPEN_TS + day * 86400 + minute * 60, open_, high, low, close, 100.0)
+                     for minute, open_, high, low, close in rows], dtype=CANDLE_DTYPE)
+
+
+class TestMergeDay(unittest.TestCase):
+
+    def test_gaps_are_filled(self):
+        merged = merge_day(candles([(0, 10, 10, 10, 10), (2, 12, 12, 12, 12)]),
+                           candles([(1, 11, 11, 11, 11), (2, 12, 12, 12, 12)]))
+        self.assertEqual(merged['ts'].tolist(), [OPEN_TS, OPEN_TS + 60, OPEN_TS + 120])
+        self.assertEqual(merged['close'].tolist(), [10, 11, 12])
+        self.assertEqual(merged['source'].tolist(), [PRIMARY, SECONDARY, PRIMARY])
+        self.assertEqual(merged['flags'].tolist(), [0, FILLED, 0])
+
+    def test_agreeing_closes_keep_the_primary(self):
+        merged = merge_day(candles([(0, 10, 10.1, 10, 10.05)]), candles([(0, 10, 10.1, 10, 10.0)]))
+        self.assertEqual((merged['source'][0], merged['flags'][0], merged['close'][0]), (PRIMARY, 0, 10.05))
+
+    def test_outlier_is_replaced(self):
+        # the primary jumps away from the previous close, the secondary stays close to it
+        merged = merge_day(candles([(0, 10, 10, 10, 10), (1, 10, 20, 10, 20)]),
+                           candles([(0, 10, 10, 10, 10), (1, 10, 10.2, 10, 10.2)]))
+        self.assertEqual(merged['close'].tolist(), [10, 10.2])
+        self.assertEqual(merged['high'][1], 10.2)
+        self.assertEqual(merged['source'][1], SECONDARY)
+        self.assertEqual(merged['flags'][1], REPLACED | DISAGREE)
+
+    def test_disagreement_closer_to_the_primary(self):
+        merged = merge_day(candles([(0, 10, 10, 10, 10), (1, 10, 10.2, 10, 10.2)]),
+                           candles([(0, 10, 10, 10, 10), (1, 10, 20, 10, 20)]))
+        self.assertEqual(merged['close'][1], 10.2)
+        self.assertEqual((merged['source'][1], merged['flags'][1]), (PRIMARY, DISAGREE))
+
+    def test_tolerance(self):
+        primary, secondary = candles([(0, 10, 10, 10, 10), (1, 10, 11, 10, 11)]), \
+            candles([(0, 10, 10, 10, 10), (1, 10, 10.5, 10, 10.5)])
+        self.assertEqual(merge_day(primary, secondary, tolerance_pct=10.0)['flags'].tolist(), [0, 0])
+        self.assertEqual(merge_day(primary, secondary, tolerance_pct=1.0)['flags'].tolist(), [0, REPLACED | DISAGREE])
+
+    def test_invalid_primary_is_replaced(self):
+        merged = merge_day(candles([(0, 10, 9, 11, 10)]), candles([(0, 10, 11, 9, 10)]))
+        self.assertEqual((merged['source'][0], merged['flags'][0]), (SECONDARY, REPLACED))
+        self.assertEqual((merged['high'][0], merged['low'][0]), (11, 9))
+
+    def test_invalid_secondary_never_replaces(self):
+        merged = merge_day(candles([(0, 10, 9, 11, 10)]), candles([(0, 10, 9, 11, 10)]))
+        self.assertEqual((merged['source'][0], merged['flags'][0]), (PRIMARY, 0))
+
+    def test_empty(self):
+        empty = np.empty(0, dtype=CANDLE_DTYPE)
+        self.assertEqual(len(merge_day(empty, empty)), 0)
+        self.assertEqual(merge_day(empty, candles([(0, 10, 10, 10, 10)]))['flags'].tolist(), [FILLED])
+
+
+class TestCandleMerge(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.store = CandleStore(self.path)
+        self.adjustments = Adjustments(self.path)
+        for day in range(2):
+            self.store.write('TDAmeritrade', 1, 'AAPL', candles([(0, 10, 10, 10, 10)], day), fetched='2020-01-15')
+            self.store.write('Finnhub', 1, 'AAPL', candles([(0, 10, 10, 10, 10), (1, 10, 10, 10, 10)], day))
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_different_basis_needs_adjustments(self):
+        with self.assertRaises(Exception):
+            CandleMerge(self.store)
+
+    def test_merge_is_incremental(self):
+        merge = CandleMerge(self.store, adjustments=self.adjustments)
+        report = merge.merge(1, 'AAPL')
+        self.assertEqual((report.days, report.candles, report.filled, report.skipped), (2, 4, 2, 0))
+        merged = self.store.read('Merged', 1, 'AAPL')
+        self.assertEqual(merged['source'].tolist(), [PRIMARY, SECONDARY] * 2)
+
+        self.assertEqual(merge.merge(1, 'AAPL').skipped, 2)
+        self.assertEqual(merge.merge(1, 'AAPL', force=True).days, 2)
+
+        # refetched secondary day
+        self.store.write('Finnhub', 1, 'AAPL', candles([(2, 10, 10, 10, 10)], 1))
+        future = time.time_ns() + 10 ** 9
+        os.utime(self.store.path('Finnhub', 1, 'AAPL', '2020-01-14'), ns=(future, future))
+        report = merge.merge(1, 'AAPL')
+        self.assertEqual((report.days, report.skipped, report.filled), (1, 1, 2))
+
+    def test_new_split_merges_again(self):
+        # 2:1 split on 2020-01-14, TDAmeritrade fetched after it, the split is not known yet
+        self.store.write('TDAmeritrade', 1, 'AAPL', candles([(0, 5, 5, 5, 5)], 0), fetched='2020-01-15')
+        merge = CandleMerge(self.store, adjustments=self.adjustments)
+        merge.merge(1, 'AAPL')
+        self.assertEqual(self.store.read_day('Merged', 1, 'AAPL', '2020-01-13')['flags'][0] & DISAGREE, DISAGREE)
+
+        self.adjustments.add_split('AAPL', '2020-01-14', 2.0)
+        future = time.time_ns() + 10 ** 9
+        os.utime(self.adjustments.path('AAPL'), ns=(future, future))
+        self.assertEqual(merge.merge(1, 'AAPL').days, 2)
+        # the Finnhub candles of the day before the split are split adjusted like the TDAmeritrade ones
+        merged = self.store.read_day('Merged', 1, 'AAPL', '2020-01-13')
+        self.assertEqual(merged['close'].tolist(), [5, 5])
+        self.assertEqual(merged['source'].tolist(), [PRIMARY, SECONDARY])
+        self.assertEqual(merged['flags'].tolist(), [0, FILLED])
+        self.assertGreaterEqual(epoch_day(self.store.fetched('Merged', 1, 'AAPL', '2020-01-13')),
+                                epoch_day('2020-01-15'))
+
+
+if __name__ == '__main__':
+    unittest.main()
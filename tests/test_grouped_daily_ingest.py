@@ -0,0 +1,55 @@
+import json
+import unittest
+
+try:
+    from Data_Export.GroupedDailyIngest import iter_json_array, grouped_snapshot
+except ImportError:  # Data_Providers.Polygon needs config.py with the api keys, which is not part of the repository
+    iter_json_array = None
+
+DOCUMENT = json.dumps({'ticker': 'grouped', 'queryCount': 3,
+                       'results': [{'T': 'AAPL', 't': 1600000000000, 'c': 115.5, 'v': 1000.0},
+                                   {'T': 'ZÜRICH', 'c': 1.0, 'nested': {'results': [1, 2]}},
+                                   {'T': 'MSFT', 'c': 205.0, 'note': 'a ] and a , inside'}],
+                       'status': 'OK'}, ensure_ascii=False).encode()
+
+
+def chunked(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+@unittest.skipIf(iter_json_array is None, 'config.py not found')
+class TestIterJsonArray(unittest.TestCase):
+
+    def test_every_chunk_size(self):
+        expected = json.loads(DOCUMENT.decode())['results']
+        # chunk sizes of one byte split the marker, the elements and the multi-byte characters
+        for size in range(1, len(DOCUMENT) + 1):
+            self.assertEqual(list(iter_json_array(chunked(DOCUMENT, size))), expected, size)
+
+    def test_stops_at_the_end_of_the_array(self):
+        consumed = []
+
+        def chunks():
+            for chunk in chunked(DOCUMENT, 4):
+                consumed.append(chunk)
+                yield chunk
+
+        self.assertEqual(len(list(iter_json_array(chunks()))), 3)
+        self.assertLess(len(b''.join(consumed)), len(DOCUMENT))
+
+    def test_empty_and_missing_array(self):
+        self.assertEqual(list(iter_json_array([b'{"results": [ ]}'])), [])
+        self.assertEqual(list(iter_json_array([b'{"status": "OK", "resultsCount": 0}'])), [])
+
+    def test_other_key(self):
+        self.assertEqual(list(iter_json_array([b'{"results": [1], "tickers": [2, 3]}'], key='tickers')), [2, 3])
+
+    def test_grouped_snapshot(self):
+        snapshot = grouped_snapshot(iter_json_array(chunked(DOCUMENT, 7)), capacity=1)
+        self.assertEqual(snapshot['symbol'].tolist(), [b'AAPL', 'ZÜRICH'.encode(), b'MSFT'])
+        self.assertEqual(snapshot['ts'][0], 1600000000)
+        self.assertEqual(snapshot['close'].tolist(), [115.5, 1.0, 205.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
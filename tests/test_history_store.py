@@ -0,0 +1,106 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from datetime import datetime
+
+import numpy as np
+
+from Data_Providers.Candles import CANDLE_DTYPE
+from Data_Store.Adjustments import AdjustedStore, Adjustments, RAW
+from Data_Store.CandleStore import CandleStore
+from Data_Store.HistoryStore import HistoryStore
+
+# New York is UTC-5 before 2020-03-08 and after 2020-11-01, UTC-4 in between
+UTC_OFFSETS = {'2020-03-06': -5, '2020-03-09': -4, '2020-10-30': -4, '2020-11-02': -5}
+
+
+def ts(day, hh_mm):
+    """
+    Returns:
+        ts (int): seconds since epoch of the local time hh_mm of day in New York
+    """
+    local = datetime.strptime(day + ' ' + hh_mm, '%Y-%m-%d %H:%M')
+    return int((local - datetime(1970, 1, 1)).total_seconds()) - UTC_OFFSETS[day] * 3600
+
+
+def session(day, first='09:00', last='11:00', close=10.0):
+    """
+    Returns:
+        candles (np.ndarray): 1 minute candles from first (inclusive) to last (exclusive) local time
+    """
+    start, end = ts(day, first), ts(day, last)
+    candles = np.zeros((end - start) // 60, dtype=CANDLE_DTYPE)
+    candles['ts'] = np.arange(start, end, 60)
+    candles['open'] = candles['high'] = candles['low'] = candles['close'] = close
+    candles['volume'] = 1.0
+    return candles
+
+
+class TestHistoryStore(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.store = CandleStore(self.path)
+        for day in sorted(UTC_OFFSETS):
+            self.store.write('TDAmeritrade', 1, 'SPY', session(day))
+        self.store.write('TDAmeritrade', 1, 'QQQ', session('2020-03-09', '10:00', '10:30', close=20.0))
+        self.history = HistoryStore(self.store)
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_read(self):
+        self.assertEqual(len(self.history.read('SPY', 1)), 4 * 120)
+        candles = self.history.read('SPY', 1, start='2020-03-07', end='2020-10-30')
+        self.assertEqual((candles['ts'][0], candles['ts'][-1]), (ts('2020-03-09', '09:00'), ts('2020-10-30', '10:59')))
+        self.assertEqual(len(self.history.read('SPY', 1, start='2020-04-01', end='2020-04-30')), 0)
+        self.assertEqual(len(self.history.read('IBM', 1)), 0)
+
+    def test_session_filter_in_local_time_across_dst(self):
+        candles = self.history.read('SPY', 1, session_filter=('09:30', '10:00'))
+        self.assertEqual(len(candles), 4 * 30)
+        for day in UTC_OFFSETS:
+            rows = candles[(candles['ts'] >= ts(day, '00:00')) & (candles['ts'] < ts(day, '23:59'))]
+            self.assertEqual((rows['ts'][0], rows['ts'][-1]), (ts(day, '09:30'), ts(day, '09:59')))
+
+    def test_query_aligns_the_symbols(self):
+        panel = self.history.query(['SPY', 'QQQ'], 1, start='2020-03-09', end='2020-03-09',
+                                   session_filter=('09:45', '10:15'))
+        self.assertEqual(panel.symbols, ['SPY', 'QQQ'])
+        self.assertEqual(len(panel), 30)
+        self.assertEqual((panel.ts[0], panel.minute[0]), (ts('2020-03-09', '09:45'), 9 * 60 + 45))
+        self.assertEqual(panel.close[:, 0].tolist(), [10.0] * 30)
+        # QQQ starts at 10:00
+        self.assertTrue(np.isnan(panel.close[:15, 1]).all())
+        self.assertEqual(panel.close[15:, 1].tolist(), [20.0] * 15)
+
+    def test_days_are_cached(self):
+        calls = []
+        days = self.store.days
+        self.store.days = lambda *args: calls.append(args) or days(*args)
+        self.assertEqual(self.history.days(1, 'SPY'), sorted(UTC_OFFSETS))
+        self.assertEqual(self.history.days(1, 'SPY'), sorted(UTC_OFFSETS))
+        self.assertEqual(len(calls), 1)
+
+        # a new partition changes the directory
+        candles = session('2020-03-09')
+        candles['ts'] += 86400
+        self.store.write('TDAmeritrade', 1, 'SPY', candles)
+        future = time.time_ns() + 10 ** 9
+        os.utime(self.store.path('TDAmeritrade', 1, 'SPY'), ns=(future, future))
+        self.assertEqual(self.history.days(1, 'SPY'), sorted(list(UTC_OFFSETS) + ['2020-03-10']))
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(self.history.days(1, 'IBM'), [])
+
+    def test_adjusted_store(self):
+        adjustments = Adjustments(self.path)
+        adjustments.add_split('SPY', '2020-10-01', 2.0)
+        history = HistoryStore(AdjustedStore(self.store, adjustments, provider_basis={'TDAmeritrade': RAW}))
+        candles = history.read('SPY', 1, session_filter=('10:00', '10:01'))
+        self.assertEqual(candles['close'].tolist(), [5.0, 5.0, 10.0, 10.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
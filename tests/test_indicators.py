@@ -0,0 +1,128 @@
+import unittest
+
+import numpy as np
+
+from Indicators import Indicators, Streaming
+
+
+def candles(n=600, seed=0):
+    """
+    Returns:
+        high, low, close, volume (np.ndarray): random walk
+    """
+    random = np.random.RandomState(seed)
+    close = 100 + np.cumsum(random.normal(0, 1, n))
+    high = close + random.rand(n)
+    low = close - random.rand(n)
+    volume = random.randint(0, 1000, n).astype(float)
+    return high, low, close, volume
+
+
+class TestIndicators(unittest.TestCase):
+
+    def test_sma(self):
+        np.testing.assert_allclose(Indicators.sma([1, 2, 3, 4, 5], 3), [np.nan, np.nan, 2, 3, 4])
+        self.assertTrue(np.isnan(Indicators.sma([1, 2], 3)).all())
+
+    def test_ema_same_as_the_recursion(self):
+        # longer than one block of the closed form evaluation
+        close = candles(5000)[2]
+        for period in (3, 14, 200):
+            alpha = 2.0 / (period + 1)
+            expected = np.full(len(close), np.nan)
+            expected[period - 1] = close[:period].mean()
+            for i in range(period, len(close)):
+                expected[i] = expected[i - 1] + alpha * (close[i] - expected[i - 1])
+            np.testing.assert_allclose(Indicators.ema(close, period), expected, rtol=1e-9)
+
+    def test_rsi(self):
+        self.assertEqual(Indicators.rsi(np.arange(20.0), 14)[-1], 100.0)
+        self.assertEqual(Indicators.rsi(np.arange(20.0)[::-1], 14)[-1], 0.0)
+        self.assertEqual(np.isnan(Indicators.rsi(np.arange(20.0), 14)).sum(), 14)
+
+    def test_true_range(self):
+        np.testing.assert_allclose(Indicators.true_range([11, 12], [9, 11.5], [10, 12]), [2, 2])
+
+    def test_vwap_restarts_every_day(self):
+        vwap = Indicators.vwap([3, 6, 9], [3, 6, 9], [3, 6, 9], [1, 1, 1], [0, 0, 1])
+        np.testing.assert_allclose(vwap, [3, 4.5, 9])
+        self.assertTrue(np.isnan(Indicators.vwap([3], [3], [3], [0], [0])[0]))
+
+    def test_pivot_points(self):
+        levels = Indicators.pivot_points(12.0, 9.0, 9.0)
+        self.assertEqual(levels, {'pivot': 10.0, 'r1': 11.0, 'r2': 13.0, 's1': 8.0, 's2': 7.0})
+
+    def test_support_resistance(self):
+        high = np.array([10, 11, 12, 11, 10, 11, 12.05, 11, 10, 9, 10], dtype=float)
+        levels = Indicators.support_resistance(high, high - 5, window=2)
+        self.assertEqual(len(levels), 1)
+        self.assertAlmostEqual(levels[0], 12.025)
+        self.assertEqual(Indicators.support_resistance(high[:4], high[:4], window=2), [])
+
+    def test_aggregate_signal(self):
+        close = np.linspace(100, 150, 300)
+        result = Indicators.aggregate_signal(close + 1, close - 1, close)
+        # RSI of a rising line is 100 and votes sell, everything else buys
+        self.assertEqual(result['technicalAnalysis']['count'], {'buy': 11, 'neutral': 0, 'sell': 1})
+        self.assertEqual(result['technicalAnalysis']['signal'], 'strong buy')
+        self.assertTrue(result['trend']['trending'])
+        result = Indicators.aggregate_signal(close[::-1] + 1, close[::-1] - 1, close[::-1])
+        self.assertEqual(result['technicalAnalysis']['signal'], 'strong sell')
+
+
+class TestStreaming(unittest.TestCase):
+    """
+    Streaming indicators return the values of the batch ones at every candle
+    """
+
+    def setUp(self):
+        self.high, self.low, self.close, self.volume = candles()
+
+    def assertSame(self, streamed, batch):
+        np.testing.assert_allclose(np.array(streamed, dtype=float), batch, rtol=1e-9, equal_nan=True)
+
+    def test_sma_ema(self):
+        for period in (1, 10, 50):
+            sma, ema = Streaming.SMA(period), Streaming.EMA(period)
+            self.assertSame([sma.update(c) for c in self.close], Indicators.sma(self.close, period))
+            self.assertSame([ema.update(c) for c in self.close], Indicators.ema(self.close, period))
+
+    def test_rsi(self):
+        rsi = Streaming.RSI(14)
+        self.assertSame([rsi.update(c) for c in self.close], Indicators.rsi(self.close, 14))
+
+    def test_atr(self):
+        atr = Streaming.ATR(14)
+        self.assertSame([atr.update(h, l, c) for h, l, c in zip(self.high, self.low, self.close)],
+                        Indicators.atr(self.high, self.low, self.close, 14))
+
+    def test_adx(self):
+        adx = Streaming.ADX(14)
+        values, plus_di, minus_di = [], [], []
+        for h, l, c in zip(self.high, self.low, self.close):
+            values.append(adx.update(h, l, c))
+            plus_di.append(adx.plus_di)
+            minus_di.append(adx.minus_di)
+        expected = Indicators.adx(self.high, self.low, self.close, 14)
+        self.assertSame(values, expected[0])
+        self.assertSame(plus_di, expected[1])
+        self.assertSame(minus_di, expected[2])
+
+    def test_vwap(self):
+        day = np.arange(len(self.close)) // 78
+        self.volume[0] = 0.0
+        vwap = Streaming.VWAP()
+        self.assertSame([vwap.update(h, l, c, v, d)
+                         for h, l, c, v, d in zip(self.high, self.low, self.close, self.volume, day)],
+                        Indicators.vwap(self.high, self.low, self.close, self.volume, day))
+
+    def test_pivots(self):
+        pivots = Streaming.Pivots()
+        self.assertIsNone(pivots.update(11.0, 10.0, 10.5, 0))
+        pivots.update(12.0, 9.5, 10.0, 0)
+        pivots.update(10.0, 9.0, 9.0, 0)
+        self.assertEqual(pivots.update(10.0, 10.0, 10.0, 1), Indicators.pivot_points(12.0, 9.0, 9.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from Data_Store.Manifest import Manifest
+
+
+class TestManifest(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.filename = os.path.join(self.path, 'export', 'manifest.json')
+        self.manifest = Manifest(self.filename)
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_missing_without_ranges(self):
+        self.assertEqual(self.manifest.missing('Finnhub', 1, 'AAPL', '2020-09-01', '2020-09-30'),
+                         [('2020-09-01', '2020-09-30')])
+
+    def test_missing_between_ranges(self):
+        self.manifest.add('Finnhub', 1, 'AAPL', '2020-09-05', '2020-09-10')
+        self.manifest.add('Finnhub', 1, 'AAPL', '2020-09-20', '2020-10-10')
+        self.assertEqual(self.manifest.missing('Finnhub', 1, 'AAPL', '2020-09-01', '2020-09-30'),
+                         [('2020-09-01', '2020-09-04'), ('2020-09-11', '2020-09-19')])
+        self.assertEqual(self.manifest.missing('Finnhub', 1, 'AAPL', '2020-09-06', '2020-09-09'), [])
+        self.assertEqual(self.manifest.missing('Finnhub', 1, 'AAPL', '2020-10-05', '2020-10-12'),
+                         [('2020-10-11', '2020-10-12')])
+
+    def test_missing_is_per_key(self):
+        self.manifest.add('Finnhub', 1, 'AAPL', '2020-09-01', '2020-09-30')
+        self.assertEqual(self.manifest.missing('Finnhub', 5, 'AAPL', '2020-09-01', '2020-09-02'),
+                         [('2020-09-01', '2020-09-02')])
+        self.assertEqual(self.manifest.missing('TDAmeritrade', 1, 'AAPL', '2020-09-01', '2020-09-02'),
+                         [('2020-09-01', '2020-09-02')])
+
+    def test_add_merges_overlapping_and_touching_ranges(self):
+        self.manifest.add('Finnhub', 1, 'AAPL', '2020-09-10', '2020-09-15')
+        self.manifest.add('Finnhub', 1, 'AAPL', '2020-09-01', '2020-09-09')
+        self.manifest.add('Finnhub', 1, 'AAPL', '2020-09-12', '2020-09-20')
+        self.manifest.add('Finnhub', 1, 'AAPL', '2020-09-25', '2020-09-26')
+        self.assertEqual(self.manifest.ranges('Finnhub', 1, 'AAPL'),
+                         [('2020-09-01', '2020-09-20'), ('2020-09-25', '2020-09-26')])
+        self.assertTrue(self.manifest.contains('Finnhub', 1, 'AAPL', '2020-09-03', '2020-09-20'))
+        self.assertFalse(self.manifest.contains('Finnhub', 1, 'AAPL', '2020-09-20', '2020-09-25'))
+
+    def test_reload(self):
+        self.manifest.add('Finnhub', 1, 'AAPL', '2020-09-01', '2020-09-09')
+        reloaded = Manifest(self.filename)
+        self.assertEqual(reloaded.ranges('Finnhub', 1, 'AAPL'), [('2020-09-01', '2020-09-09')])
+        self.assertEqual(reloaded.missing('Finnhub', 1, 'AAPL', '2020-09-01', '2020-09-10'),
+                         [('2020-09-10', '2020-09-10')])
+
+
+if __name__ == '__main__':
+    unittest.main()
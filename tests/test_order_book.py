@@ -0,0 +1,70 @@
+import unittest
+
+import numpy as np
+
+from Brokers.OrderBook import OrderBook, MARKET, LIMIT, STOP, OPEN, FILLED, CANCELED
+
+
+class TestOrderBook(unittest.TestCase):
+
+    def setUp(self):
+        self.book = OrderBook(capacity=2)
+
+    def match(self, open_, high, low):
+        return self.book.match(np.array([open_]), np.array([high]), np.array([low]))
+
+    def test_market_fills_at_the_open(self):
+        self.book.add(0, 10, type=MARKET)
+        rows, prices = self.match(100.0, 101.0, 99.0)
+        self.assertEqual(list(rows), [0])
+        self.assertEqual(list(prices), [100.0])
+
+    def test_limit_fills_at_the_limit_or_a_better_open(self):
+        self.book.add(0, 10, type=LIMIT, limit=99.5)
+        self.book.add(0, -10, type=LIMIT, limit=98.0)
+        rows, prices = self.match(97.0, 100.0, 96.0)
+        self.assertEqual(dict(zip(rows.tolist(), prices.tolist())), {0: 97.0, 1: 98.0})
+
+    def test_limit_not_reached(self):
+        self.book.add(0, 10, type=LIMIT, limit=95.0)
+        rows, prices = self.match(100.0, 101.0, 99.0)
+        self.assertEqual(len(rows), 0)
+
+    def test_stop_fills_at_the_stop_or_a_worse_open(self):
+        self.book.add(0, -10, type=STOP, stop=95.0)
+        self.book.add(0, -10, type=STOP, stop=99.5)
+        rows, prices = self.match(93.0, 94.0, 92.0)
+        self.assertEqual(prices.tolist(), [93.0, 93.0])
+        rows, prices = self.match(100.0, 101.0, 99.0)
+        self.assertEqual(rows.tolist(), [1])
+        self.assertEqual(prices.tolist(), [99.5])
+
+    def test_stop_first_if_both_oco_legs_are_hit(self):
+        limit_id = self.book.add(0, -10, type=LIMIT, limit=105.0, oco=1)
+        stop_id = self.book.add(0, -10, type=STOP, stop=95.0, oco=1)
+        rows, prices = self.match(100.0, 106.0, 94.0)
+        ids = self.book.orders['id'][rows].tolist()
+        self.assertEqual(ids, [stop_id, limit_id])
+        self.assertEqual(prices.tolist(), [95.0, 105.0])
+
+    def test_nan_candle_does_not_fill(self):
+        self.book.add(0, 10, type=MARKET)
+        rows, prices = self.match(np.nan, np.nan, np.nan)
+        self.assertEqual(len(rows), 0)
+
+    def test_cancel_and_compact(self):
+        ids = [self.book.add(0, 10) for _ in range(5)]
+        self.book.set_status(self.book.row(ids[0]), FILLED)
+        self.book.cancel(self.book.live()['id'] == ids[1])
+        self.assertEqual(self.book.open, 3)
+        self.book.compact()
+        self.assertEqual(self.book.size, 3)
+        self.assertIsNone(self.book.row(ids[0]))
+        self.assertEqual(self.book.get(ids[0])['status'], FILLED)
+        self.assertEqual(self.book.get(ids[1])['status'], CANCELED)
+        self.assertEqual(self.book.get(ids[4])['status'], OPEN)
+        self.assertIsNone(self.book.get(99))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import date
+
+from Data_Export.RangePlanner import RangePlanner, TradingCalendar, market_holidays
+from Data_Store.Manifest import Manifest
+
+
+def dates(*days):
+    return {date(*map(int, day.split('-'))) for day in days}
+
+
+class TestMarketHolidays(unittest.TestCase):
+
+    def test_2020(self):
+        # Independence Day on a saturday is observed on the friday
+        self.assertEqual(market_holidays(2020), dates('2020-01-01', '2020-01-20', '2020-02-17', '2020-04-10',
+                                                      '2020-05-25', '2020-07-03', '2020-09-07', '2020-11-26',
+                                                      '2020-12-25'))
+
+    def test_2021(self):
+        # Christmas on a saturday is observed on the friday, New Year's Day 2022 is not observed in 2021
+        self.assertEqual(market_holidays(2021), dates('2021-01-01', '2021-01-18', '2021-02-15', '2021-04-02',
+                                                      '2021-05-31', '2021-07-05', '2021-09-06', '2021-11-25',
+                                                      '2021-12-24'))
+
+    def test_2022(self):
+        # no New Year's Day, Juneteenth on a sunday is observed on the monday
+        self.assertEqual(market_holidays(2022), dates('2022-01-17', '2022-02-21', '2022-04-15', '2022-05-30',
+                                                      '2022-06-20', '2022-07-04', '2022-09-05', '2022-11-24',
+                                                      '2022-12-26'))
+
+    def test_2023(self):
+        self.assertEqual(market_holidays(2023), dates('2023-01-02', '2023-01-16', '2023-02-20', '2023-04-07',
+                                                      '2023-05-29', '2023-06-19', '2023-07-04', '2023-09-04',
+                                                      '2023-11-23', '2023-12-25'))
+
+
+class TestTradingCalendar(unittest.TestCase):
+
+    def test_trading_days(self):
+        calendar = TradingCalendar()
+        days = calendar.trading_days(date(2020, 1, 1), date(2020, 1, 31))
+        self.assertEqual(len(days), 21)
+        self.assertEqual((days[0], days[-1]), (date(2020, 1, 2), date(2020, 1, 31)))
+        self.assertNotIn(date(2020, 1, 20), days)
+        self.assertFalse(calendar.is_trading_day(date(2020, 1, 4)))
+
+    def test_extra_holidays(self):
+        # national day of mourning
+        calendar = TradingCalendar(extra_holidays=['2018-12-05'])
+        self.assertFalse(calendar.is_trading_day(date(2018, 12, 5)))
+        self.assertTrue(TradingCalendar().is_trading_day(date(2018, 12, 5)))
+
+
+class TestRangePlanner(unittest.TestCase):
+
+    def setUp(self):
+        self.planner = RangePlanner()
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_chunks(self):
+        self.assertEqual(self.planner.chunks('TDAmeritrade', 1, date(2020, 1, 1), date(2020, 1, 31)),
+                         [(date(2020, 1, 2), date(2020, 1, 15)), (date(2020, 1, 16), date(2020, 1, 30)),
+                          (date(2020, 1, 31), date(2020, 1, 31))])
+        self.assertEqual(self.planner.chunks('Finnhub', 1, date(2020, 1, 1), date(2020, 1, 31)),
+                         [(date(2020, 1, 2), date(2020, 1, 30)), (date(2020, 1, 31), date(2020, 1, 31))])
+
+    def test_no_request_without_trading_days(self):
+        self.assertEqual(self.planner.chunks('TDAmeritrade', 1, date(2020, 1, 18), date(2020, 1, 20)), [])
+
+    def test_unknown_frequency_one_day_per_request(self):
+        self.assertEqual(self.planner.chunks('TDAmeritrade', 60, date(2020, 1, 2), date(2020, 1, 6)),
+                         [(date(2020, 1, 2), date(2020, 1, 2)), (date(2020, 1, 3), date(2020, 1, 3)),
+                          (date(2020, 1, 6), date(2020, 1, 6))])
+
+    def test_tasks_skip_the_manifest(self):
+        manifest = Manifest(os.path.join(self.path, 'manifest.json'))
+        manifest.add('TDAmeritrade', 1, 'AAPL', '2020-01-02', '2020-01-10')
+        tasks = self.planner.tasks('TDAmeritrade', ['AAPL', 'MSFT'], [1], date(2020, 1, 1), date(2020, 1, 31),
+                                   lambda first, last: (first, last), manifest)
+        self.assertEqual([(task.symbol, task.first_day, task.last_day) for task in tasks],
+                         [('AAPL', '2020-01-13', '2020-01-27'), ('AAPL', '2020-01-28', '2020-01-31'),
+                          ('MSFT', '2020-01-02', '2020-01-15'), ('MSFT', '2020-01-16', '2020-01-30'),
+                          ('MSFT', '2020-01-31', '2020-01-31')])
+        self.assertEqual((tasks[0].start, tasks[0].end), (date(2020, 1, 13), date(2020, 1, 27)))
+
+
+if __name__ == '__main__':
+    unittest.main()
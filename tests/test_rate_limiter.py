@@ -0,0 +1,76 @@
+import unittest
+from unittest import mock
+
+from Data_Providers.RateLimiter import RateLimiter, TokenBucket
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestRateLimiter(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        patcher = mock.patch('Data_Providers.RateLimiter.time.monotonic', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_token_bucket(self):
+        bucket = TokenBucket(10, 2)
+        self.assertEqual((bucket.rate, bucket.capacity, bucket.tokens), (5.0, 10.0, 10.0))
+        bucket.tokens = 0.0
+        self.assertAlmostEqual(bucket.wait_time(), 0.2)
+        self.clock.now += 0.1
+        bucket.refill(self.clock.now)
+        self.assertAlmostEqual(bucket.tokens, 0.5)
+        self.clock.now += 100
+        bucket.refill(self.clock.now)
+        self.assertEqual(bucket.tokens, 10.0)
+        self.assertEqual(bucket.wait_time(), 0.0)
+
+    def test_burst_of_the_longer_window_is_capped(self):
+        limiter = RateLimiter([(60, 60), (30, 1)], headroom=1.0)
+        minute, second = limiter.buckets
+        self.assertEqual((minute.rate, minute.capacity), (1.0, 1.0))
+        self.assertEqual((second.rate, second.capacity), (30.0, 30.0))
+        self.assertEqual(limiter.try_acquire(), 0.0)
+        self.assertAlmostEqual(limiter.try_acquire(), 1.0)
+        self.clock.now += 1.0
+        self.assertEqual(limiter.try_acquire(), 0.0)
+
+    def test_headroom(self):
+        limiter = RateLimiter([(10, 1)], headroom=0.5)
+        self.assertEqual([limiter.try_acquire() for _ in range(5)], [0.0] * 5)
+        self.assertAlmostEqual(limiter.try_acquire(), 0.2)
+        self.assertEqual(limiter.total_requests, 5)
+
+    def test_calls_within_one_minute(self):
+        limiter = RateLimiter([(600, 60)], headroom=1.0)
+        calls = 0
+        for _ in range(6000):
+            self.clock.now += 0.01
+            if limiter.try_acquire() == 0.0:
+                calls += 1
+        # the initial burst plus 60 seconds at 10 calls per second
+        self.assertIn(calls, (1199, 1200))
+
+    def test_recent_is_pruned_without_reading_the_rate(self):
+        limiter = RateLimiter([(1000, 1)])
+        for _ in range(100):
+            self.clock.now += 1.0
+            limiter.try_acquire()
+        self.assertLessEqual(len(limiter.recent), 61)
+        self.assertEqual(limiter.request_rate, float(len(limiter.recent)))
+        self.clock.now += 120.0
+        self.assertEqual(limiter.request_rate, 0.0)
+        self.assertEqual(limiter.total_requests, 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
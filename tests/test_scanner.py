@@ -0,0 +1,186 @@
+import shutil
+import tempfile
+import unittest
+from collections import namedtuple
+
+import numpy as np
+
+from Data_Store.SnapshotStore import SnapshotStore, SNAPSHOT_DTYPE
+from Strategies.Scanner import Scanner
+
+try:
+    from Strategies.Market_Movers import Market_Movers
+except ImportError:  # the async data provider needs config.py with the api keys and aiohttp
+    Market_Movers = None
+
+# same fields as FinnhubStream.Trade, which needs websocket-client
+Trade = namedtuple('Trade', ['symbol', 'price', 'volume', 'ts'])
+
+SYMBOLS = ['AAPL', 'AMZN', 'MSFT', 'TSLA']
+
+
+def snapshot(rows):
+    """
+    Args:
+        rows (list): (symbol, close, volume)
+    """
+    return np.array([(symbol.encode(), 0, close, close, close, close, volume, close, 1)
+                     for symbol, close, volume in rows], dtype=SNAPSHOT_DTYPE)
+
+
+class RankingTestCase(unittest.TestCase):
+
+    def assertRanking(self, ranking, expected):
+        self.assertEqual([symbol for symbol, value in ranking], [symbol for symbol, value in expected])
+        np.testing.assert_allclose([value for symbol, value in ranking], [value for symbol, value in expected])
+
+
+class TestScanner(RankingTestCase):
+
+    def setUp(self):
+        self.scanner = Scanner(SYMBOLS, previous_close={symbol: 100.0 for symbol in SYMBOLS},
+                               average_volume={symbol: 1000.0 for symbol in SYMBOLS})
+
+    def test_change_and_gap(self):
+        for symbol, price in zip(SYMBOLS, (101.0, 95.0, 103.0, 99.0)):
+            self.scanner.update(symbol, price)
+        self.assertRanking(self.scanner.top('change_pct', 2), [('MSFT', 3.0), ('AAPL', 1.0)])
+        self.assertRanking(self.scanner.top('change_pct', 2, ascending=True), [('AMZN', -5.0), ('TSLA', -1.0)])
+        # the first price of the session is the open
+        self.scanner.update('AMZN', 110.0)
+        self.assertRanking(self.scanner.top('change_pct', 1), [('AMZN', 10.0)])
+        self.assertRanking(self.scanner.top('gap_pct', 1), [('MSFT', 3.0)])
+
+    def test_outdated_entries_are_skipped(self):
+        for price in (101.0, 120.0, 90.0):
+            self.scanner.update('AAPL', price)
+        self.scanner.update('MSFT', 102.0)
+        self.assertRanking(self.scanner.top('change_pct', 10), [('MSFT', 2.0), ('AAPL', -10.0)])
+        # reading a ranking does not drop the valid entries
+        self.assertRanking(self.scanner.top('change_pct', 10), [('MSFT', 2.0), ('AAPL', -10.0)])
+
+    def test_heaps_are_rebuilt(self):
+        for i in range(2000):
+            self.scanner.update('AAPL', 100.0 + i % 7)
+        self.assertLessEqual(len(self.scanner.heaps['change_pct'][0]), 4 * len(SYMBOLS) + 1025)
+        self.assertRanking(self.scanner.top('change_pct', 1), [('AAPL', float(1999 % 7))])
+
+    def test_same_as_sorting(self):
+        random = np.random.RandomState(0)
+        symbols = ['S%d' % j for j in range(200)]
+        scanner = Scanner(symbols, previous_close={symbol: 100.0 for symbol in symbols})
+        for _ in range(5000):
+            scanner.update(symbols[random.randint(len(symbols))], 100.0 * (1 + random.normal(0, 0.05)))
+        changes = sorted(((scanner.price[j] / 100.0 - 1) * 100, symbol) for j, symbol in enumerate(symbols)
+                         if not np.isnan(scanner.price[j]))
+        top = scanner.top('change_pct', 10)
+        self.assertRanking(top, [(symbol, value) for value, symbol in changes[::-1][:10]])
+
+    def test_relative_volume_and_on_trade(self):
+        self.scanner.on_trade(Trade('AAPL', 100.0, 500.0, 1000.0))
+        self.scanner.on_trade(Trade('AAPL', 100.0, 1500.0, 1001.0))
+        self.scanner.on_trade(Trade('MSFT', 100.0, 100.0, 1000.0))
+        self.assertRanking(self.scanner.top('relative_volume', 2), [('AAPL', 2.0), ('MSFT', 0.1)])
+
+    def test_momentum(self):
+        scanner = Scanner(['AAPL'], momentum_half_life=60)
+        scanner.update('AAPL', 100.0, ts=0.0)
+        scanner.update('AAPL', 110.0, ts=60.0)
+        # the average moved half way to the new price
+        self.assertAlmostEqual(scanner.average_price[0], 105.0)
+        self.assertAlmostEqual(scanner.top('momentum_pct', 1)[0][1], (110.0 / 105.0 - 1) * 100)
+
+    def test_invalid_updates_are_ignored(self):
+        for symbol, price in (('IBM', 100.0), ('AAPL', None), ('AAPL', 0.0), ('AAPL', float('nan'))):
+            self.scanner.update(symbol, price)
+        self.assertEqual(self.scanner.top('change_pct'), [])
+        self.assertEqual(int(self.scanner.version.sum()), 0)
+
+    def test_update_quote(self):
+        scanner = Scanner(['AAPL'])
+        scanner.update_quote('AAPL', {'c': 105.0, 'o': 102.0, 'pc': 100.0, 't': 1000})
+        self.assertRanking(scanner.top('gap_pct'), [('AAPL', 2.0)])
+        self.assertRanking(scanner.top('change_pct'), [('AAPL', 5.0)])
+        scanner.update_quote('AAPL', None)
+
+    def test_set_reference(self):
+        self.scanner.update('AAPL', 110.0)
+        self.scanner.set_reference('AAPL', previous_close=50.0)
+        # the rankings change with the next update of the symbol
+        self.scanner.update('AAPL', 110.0)
+        self.assertRanking(self.scanner.top('change_pct', 1), [('AAPL', 120.0)])
+
+    def test_start_session(self):
+        self.scanner.update('AAPL', 110.0, volume=10.0)
+        self.scanner.start_session()
+        self.assertEqual(self.scanner.previous_close[0], 110.0)
+        self.assertEqual(self.scanner.previous_close[1], 100.0)
+        self.assertEqual(self.scanner.volume[0], 0.0)
+        self.scanner.update('AAPL', 99.0)
+        self.assertRanking(self.scanner.top('gap_pct', 1), [('AAPL', -10.0)])
+
+    def test_movers(self):
+        self.scanner.update('AAPL', 101.0)
+        self.scanner.update('MSFT', 99.0)
+        movers = self.scanner.movers(1)
+        self.assertEqual(sorted(movers), sorted(Scanner.METRICS + ('losers',)))
+        self.assertRanking(movers['change_pct'], [('AAPL', 1.0)])
+        self.assertRanking(movers['losers'], [('MSFT', -1.0)])
+
+
+class TestFromSnapshots(RankingTestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.store = SnapshotStore(self.path)
+        self.store.write('2020-01-09', snapshot([('AAPL', 90.0, 100.0), ('MSFT', 50.0, 400.0)]))
+        self.store.write('2020-01-10', snapshot([('AAPL', 95.0, 300.0), ('MSFT', 55.0, 200.0),
+                                                 ('TSLA', 400.0, 1000.0)]))
+        self.store.write('2020-01-13', snapshot([('AAPL', 1.0, 1.0)]))
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_references_before_the_day(self):
+        scanner = Scanner.from_snapshots(self.store, '2020-01-13', 20)
+        self.assertEqual(scanner.symbols, ['AAPL', 'MSFT', 'TSLA'])
+        self.assertEqual(scanner.previous_close.tolist(), [95.0, 55.0, 400.0])
+        self.assertEqual(scanner.average_volume.tolist(), [200.0, 300.0, 1000.0])
+        scanner.update('MSFT', 60.5)
+        self.assertRanking(scanner.top('change_pct', 1), [('MSFT', 10.0)])
+
+    def test_previous_days(self):
+        scanner = Scanner.from_snapshots(self.store, '2020-01-13', 1, symbols=['MSFT'])
+        self.assertEqual(scanner.symbols, ['MSFT'])
+        self.assertEqual(scanner.average_volume.tolist(), [200.0])
+
+    def test_no_snapshot_before_the_day(self):
+        scanner = Scanner.from_snapshots(self.store, '2020-01-09', 20, symbols=['AAPL'])
+        self.assertEqual(scanner.symbols, ['AAPL'])
+        self.assertTrue(np.isnan(scanner.previous_close[0]))
+
+
+@unittest.skipIf(Market_Movers is None, 'config.py not found')
+class TestMarketMovers(unittest.TestCase):
+
+    def test_universe_needed(self):
+        with self.assertRaises(Exception):
+            Market_Movers()
+
+    def test_nothing_requested_before_the_first_scan(self):
+        class DataProvider:
+            requests = 0
+
+            def finnhub_get_index_symbols(self, index_symbol):
+                DataProvider.requests += 1
+                return ['AAPL', 'MSFT']
+
+        market_movers = Market_Movers(data_provider=DataProvider())
+        self.assertEqual(DataProvider.requests, 0)
+        self.assertEqual(market_movers.scanner.symbols, ['AAPL', 'MSFT'])
+        self.assertEqual(market_movers.scan()['change_pct'], [])
+        self.assertEqual(DataProvider.requests, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
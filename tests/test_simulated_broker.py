@@ -0,0 +1,99 @@
+import unittest
+
+import numpy as np
+
+from Backtesting.Panel import Panel
+
+try:
+    from Brokers.SimulatedBroker import SimulatedBroker
+except ImportError:  # Brokers.Broker needs config.py with the api keys, which is not part of the repository
+    SimulatedBroker = None
+
+# 2020-01-13 09:30 New York
+OPEN_TS = 1578925800
+
+
+def panel(candles, days=1):
+    """
+    Args:
+        candles (list): (open, high, low, close) per minute of symbol 'A', repeated on every day
+
+    Returns:
+        panel (Panel): 1 minute candles of 'A' from 09:30 of 2020-01-13 on
+    """
+    ts = np.concatenate([OPEN_TS + day * 86400 + 60 * np.arange(len(candles)) for day in range(days)])
+    prices = np.array(candles * days, dtype=float)
+    fields = {field: prices[:, [i]] for i, field in enumerate(('open', 'high', 'low', 'close'))}
+    fields['volume'] = np.ones((len(ts), 1))
+    return Panel(['A'], ts, fields, frequency=1)
+
+
+@unittest.skipIf(SimulatedBroker is None, 'config.py not found')
+class TestSimulatedBroker(unittest.TestCase):
+
+    def replay(self, panel, orders, t_order=0):
+        broker = SimulatedBroker(cash=10000.0)
+        ids = []
+        for t in range(len(panel)):
+            broker.on_bar(panel, t)
+            if t == t_order:
+                ids = [broker.order_asset('A', **order) for order in orders]
+        return broker, ids
+
+    def test_bracket_take_profit(self):
+        broker, [entry] = self.replay(panel([(100, 100, 100, 100), (100, 101, 99, 100), (102, 106, 101, 104)]),
+                                      [dict(qty=10, take_profit_pct=1.05, stop_loss_pct=0.95)])
+        self.assertEqual([(qty, price, reason) for ts, symbol, qty, price, reason in broker.trades],
+                         [(10, 100.0, 'entry'), (-10, 105.0, 'take_profit')])
+        self.assertEqual(broker.get_position('A'), 0)
+        self.assertAlmostEqual(broker.cash, 10050.0)
+        self.assertEqual(broker.get_order(entry)['status'], 'filled')
+        self.assertEqual(broker.get_order(entry + 1)['status'], 'filled')
+        self.assertEqual(broker.get_order(entry + 2)['status'], 'canceled')
+
+    def test_bracket_both_legs_in_one_candle_fills_the_stop(self):
+        broker, [entry] = self.replay(panel([(100, 100, 100, 100), (100, 101, 99, 100), (100, 106, 94, 100)]),
+                                      [dict(qty=10, take_profit_pct=1.05, stop_loss_pct=0.95)])
+        self.assertEqual([(qty, price, reason) for ts, symbol, qty, price, reason in broker.trades],
+                         [(10, 100.0, 'entry'), (-10, 95.0, 'stop_loss')])
+        self.assertEqual(broker.get_order(entry + 1)['status'], 'canceled')
+        self.assertEqual(broker.get_order(entry + 2)['status'], 'filled')
+
+    def test_bracket_legs_hit_by_the_entry_candle(self):
+        broker, ids = self.replay(panel([(100, 100, 100, 100), (100, 106, 99, 105)]),
+                                  [dict(qty=10, take_profit_pct=1.05, stop_loss_pct=0.95)])
+        self.assertEqual([reason for ts, symbol, qty, price, reason in broker.trades], ['entry', 'take_profit'])
+
+    def test_stop_loss_after_a_gap_fills_at_the_open(self):
+        broker, ids = self.replay(panel([(100, 100, 100, 100), (100, 101, 99, 100), (90, 91, 89, 90)]),
+                                  [dict(qty=10, stop_loss_pct=0.95)])
+        self.assertEqual(broker.trades[-1][2:], (-10, 90.0, 'stop_loss'))
+
+    def test_short_bracket_legs_are_mirrored(self):
+        broker, ids = self.replay(panel([(100, 100, 100, 100), (100, 101, 99, 100), (99, 99, 94, 95)]),
+                                  [dict(qty=10, side='sell', take_profit_pct=1.05, stop_loss_pct=0.95)])
+        self.assertEqual([(qty, price, reason) for ts, symbol, qty, price, reason in broker.trades],
+                         [(-10, 100.0, 'entry'), (10, 95.0, 'take_profit')])
+
+    def test_oco_exit(self):
+        candles = panel([(100, 100, 100, 100), (100, 101, 99, 100), (100, 100, 97, 98), (98, 99, 96, 97)])
+        broker = SimulatedBroker(cash=10000.0)
+        broker.on_bar(candles, 0)
+        broker.order_asset('A', 10)
+        broker.on_bar(candles, 1)
+        limit_id, stop_id = broker.order_oco('A', 10, 'sell', limit_price=110.0, stop_price=97.5)
+        broker.on_bar(candles, 2)
+        broker.on_bar(candles, 3)
+        self.assertEqual(broker.trades[-1][2:], (-10, 97.5, 'stop_loss'))
+        self.assertEqual(broker.get_order(limit_id)['status'], 'canceled')
+        self.assertEqual(broker.get_position('A'), 0)
+
+    def test_day_orders_expire(self):
+        broker, [order_id] = self.replay(panel([(100, 100, 100, 100), (100, 101, 99, 100)], days=2),
+                                         [dict(qty=10, type='limit', limit_price=90.0)])
+        self.assertEqual(broker.get_order(order_id)['status'], 'canceled')
+        self.assertEqual(broker.trades, [])
+
+
+if __name__ == '__main__':
+    unittest.main()